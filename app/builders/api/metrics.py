@@ -0,0 +1,108 @@
+from pydantic import BaseModel
+
+from app.builders.api.statistics import StatisticsResponseBuilder, get_percentile
+from app.builders.base import BaseBuilder
+from app.models.services.rate_limit import DeniedIpCacheMetrics
+from app.models.services.response_cache import ResponseCacheMetrics
+from app.models.services.statistics import (
+    LATENCY_BUCKETS_MS,
+    StatisticsResult,
+    StatisticsStreamMetrics,
+    StatisticsWriterMetrics,
+)
+
+PERCENTILES = (50, 90, 99)
+
+# fields of the component metrics that are current values, the others are counters since startup
+WRITER_GAUGES = {"queue_size", "max_queue_size"}
+RESPONSE_CACHE_GAUGES = {"entries"}
+STREAM_GAUGES = {"subscribers"}
+DENIED_IP_CACHE_GAUGES = {"entries", "max_entries"}
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_component_metrics(prefix: str, metrics: BaseModel, gauges: set[str]) -> list[str]:
+    """One metric per field of a component's metrics model, its description as the help text."""
+    lines = []
+    for field, info in type(metrics).model_fields.items():
+        if field in gauges:
+            name, metric_type = f"{prefix}_{field}", "gauge"
+        else:
+            name, metric_type = f"{prefix}_{field}_total", "counter"
+        lines += [
+            f"# HELP {name} {info.description}",
+            f"# TYPE {name} {metric_type}",
+            f"{name} {getattr(metrics, field)}",
+        ]
+    return lines
+
+
+class MetricsResponseBuilder(BaseBuilder):
+    """
+    Renders the bidder latency histograms in the Prometheus text exposition format.
+
+    Metrics of in-process components (statistics writer, /stat cache, ...) are the worker's own and
+    only added when given.
+    """
+
+    @classmethod
+    def build(
+        cls,
+        statistics_result: StatisticsResult | None = None,
+        writer_metrics: StatisticsWriterMetrics | None = None,
+        response_cache_metrics: ResponseCacheMetrics | None = None,
+        stream_metrics: StatisticsStreamMetrics | None = None,
+        denied_ip_cache_metrics: DeniedIpCacheMetrics | None = None,
+        *args,
+        **kwargs,
+    ) -> str:
+        histogram_lines = [
+            "# HELP bidder_latency_ms Bidder response latency per supply, timeouts counted when cut off",
+            "# TYPE bidder_latency_ms histogram",
+        ]
+        percentile_lines = [
+            "# HELP bidder_latency_percentile_ms Upper bound of the latency bucket holding the percentile",
+            "# TYPE bidder_latency_percentile_ms gauge",
+        ]
+
+        for supply_id, redis_data in (statistics_result.supplies if statistics_result else {}).items():
+            supply_data = StatisticsResponseBuilder.decode_supply_data(redis_data, statistics_result.names)
+
+            for bidder_id, histogram in sorted(supply_data.histograms["latency"].items()):
+                labels = f'supply="{_escape_label(supply_id)}",bidder="{_escape_label(bidder_id)}"'
+
+                cumulative = 0
+                # the overflow bucket has no bound, it is only in le="+Inf"
+                for bound, count in zip(LATENCY_BUCKETS_MS, histogram, strict=False):
+                    cumulative += count
+                    histogram_lines.append(f'bidder_latency_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+                histogram_lines.append(f'bidder_latency_ms_bucket{{{labels},le="+Inf"}} {sum(histogram)}')
+                latency_sum_ms = supply_data.bidders[bidder_id]["latency_sum_us"] / 1000
+                histogram_lines.append(f"bidder_latency_ms_sum{{{labels}}} {latency_sum_ms}")
+                histogram_lines.append(f"bidder_latency_ms_count{{{labels}}} {sum(histogram)}")
+
+                for percentile in PERCENTILES:
+                    value = get_percentile(histogram, LATENCY_BUCKETS_MS, percentile)
+                    percentile_lines.append(
+                        f'bidder_latency_percentile_ms{{{labels},percentile="{percentile}"}} '
+                        f"{'+Inf' if value is None else value}"
+                    )
+
+        component_lines = []
+        if writer_metrics is not None:
+            component_lines += _render_component_metrics("statistics_writer", writer_metrics, WRITER_GAUGES)
+        if response_cache_metrics is not None:
+            component_lines += _render_component_metrics(
+                "stat_response_cache", response_cache_metrics, RESPONSE_CACHE_GAUGES
+            )
+        if stream_metrics is not None:
+            component_lines += _render_component_metrics("statistics_stream", stream_metrics, STREAM_GAUGES)
+        if denied_ip_cache_metrics is not None:
+            component_lines += _render_component_metrics(
+                "rate_limit_denied_ip_cache", denied_ip_cache_metrics, DENIED_IP_CACHE_GAUGES
+            )
+
+        return "\n".join(histogram_lines + percentile_lines + component_lines) + "\n"
@@ -1,56 +1,242 @@
+import math
 from collections import defaultdict
 
 from app.builders.base import BaseBuilder
-from app.models.api.response.statistics import BidderStats, StatisticsResponse
-from app.models.services.statistics import StatisticsResult
+from app.models.api.response.statistics import (
+    BidderStats,
+    LatencyStats,
+    PriceBucket,
+    PriceStats,
+    StatisticsChangesResponse,
+    StatisticsRangeResponse,
+    StatisticsResponse,
+    UniqueIpStats,
+)
+from app.models.services.statistics import (
+    BIDDER_FIELD_CODES,
+    BIDDER_NAME_PREFIX,
+    COMPACT_FIELD_PATTERN,
+    COUNTRY_FIELD_CODE,
+    COUNTRY_NAME_PREFIX,
+    HISTOGRAM_BUCKETS,
+    HISTOGRAM_FIELD_CODES,
+    REVENUE_SCALE,
+    TOTAL_REQS_FIELD,
+    StatisticsField,
+    StatisticsRangeResult,
+    StatisticsResult,
+)
+
+BIDDER_METRICS = {code: metric for metric, code in BIDDER_FIELD_CODES.items()}
+HISTOGRAMS = {code: histogram for histogram, code in HISTOGRAM_FIELD_CODES.items()}
+SUPPLY_FIELDS = {"total_reqs", "reqs_per_country", "unique_ips"}
+
+
+def get_percentile(histogram: list[int], bounds: tuple[float, ...], percentile: float) -> float | None:
+    """Upper bound of the bucket holding the percentile; None if it's in the overflow bucket."""
+    rank = math.ceil(sum(histogram) * percentile / 100)
+    seen = 0
+    for bucket, count in enumerate(histogram):
+        seen += count
+        if seen >= rank:
+            return bounds[bucket] if bucket < len(bounds) else None
+    return None
+
+
+class SupplyData:
+    """Counters of one supply decoded from its stats hash, revenue in micro-units."""
+
+    def __init__(self) -> None:
+        self.total_reqs = 0
+        self.reqs_per_country: dict[str, int] = defaultdict(int)
+        self.bidders: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        # histogram -> bidder_id -> count per bucket, the last one for anything above HISTOGRAM_BUCKETS[histogram]
+        self.histograms: dict[str, dict[str, list[int]]] = {
+            histogram: defaultdict(lambda bounds=bounds: [0] * (len(bounds) + 1))
+            for histogram, bounds in HISTOGRAM_BUCKETS.items()
+        }
+
+    def get_supply_histogram(self, histogram: str) -> list[int]:
+        """Bucket counts summed over all bidders."""
+        return [sum(counts) for counts in zip(*self.histograms[histogram].values(), strict=True)]
 
 
 class StatisticsResponseBuilder(BaseBuilder):
     @classmethod
-    def build(cls, statistics_result: StatisticsResult | None = None, *args, **kwargs) -> dict[str, StatisticsResponse]:
+    def build(
+        cls,
+        statistics_result: StatisticsResult | None = None,
+        fields: set[StatisticsField] | None = None,
+        *args,
+        **kwargs,
+    ) -> dict[str, StatisticsResponse]:
+        """
+        Responses per supply. With fields only those (and the bidders holding them) are set,
+        so dumping with exclude_unset leaves the others out.
+        """
         response: dict[str, StatisticsResponse] = {}
 
         if not statistics_result:
             return {}
 
         for supply_id, redis_data in statistics_result.supplies.items():
-            response[supply_id] = cls._parse_supply_data(redis_data)
+            unique_ips = cls._get_unique_ip_stats(statistics_result, supply_id)
+            response[supply_id] = cls._parse_supply_data(redis_data, statistics_result.names, fields, unique_ips)
 
         return response
 
     @classmethod
-    def _parse_supply_data(cls, redis_data: dict[str, str]) -> StatisticsResponse:
-        total_reqs = int(redis_data.get("total_reqs", 0))
-
-        reqs_per_country: dict[str, int] = {}
-        bidders_data: dict[str, dict[str, float | int]] = defaultdict(dict)
+    def decode_supply_data(cls, redis_data: dict[str, str], names: dict[str, str] | None = None) -> SupplyData:
+        """Decode compact fields through the dictionary names; legacy verbose fields are added on top."""
+        names = names or {}
+        supply_data = SupplyData()
+        bidders_data = supply_data.bidders
 
         for field, value in redis_data.items():
-            if field.startswith("country:"):
+            if field == TOTAL_REQS_FIELD:
+                supply_data.total_reqs += int(value)
+
+            elif match := COMPACT_FIELD_PATTERN.fullmatch(field):
+                code, entry_id, bucket = match.groups()
+                # no name if the dictionary entry is gone
+                if (name := names.get(entry_id)) is None:
+                    continue
+
+                if code == COUNTRY_FIELD_CODE:
+                    supply_data.reqs_per_country[name.removeprefix(COUNTRY_NAME_PREFIX)] += int(value)
+                elif histogram := HISTOGRAMS.get(code):
+                    bidder_id = name.removeprefix(BIDDER_NAME_PREFIX)
+                    supply_data.histograms[histogram][bidder_id][int(bucket)] += int(value)
+                elif metric := BIDDER_METRICS.get(code):
+                    bidders_data[name.removeprefix(BIDDER_NAME_PREFIX)][metric] += int(value)
+
+            elif field == "total_reqs":
+                supply_data.total_reqs += int(value)
+
+            elif field.startswith("country:"):
                 country = field.split(":", 1)[1]
-                reqs_per_country[country] = int(value)
+                supply_data.reqs_per_country[country] += int(value)
 
             elif field.startswith("bidder:"):
-                parts = field.split(":")
-                bidder_id = parts[1]
-                metric = parts[2]
+                # bidder ids may contain ':'
+                bidder_id, _, metric = field.removeprefix("bidder:").rpartition(":")
 
                 if metric == "revenue":
-                    bidders_data[bidder_id][metric] = float(value)
+                    bidders_data[bidder_id][metric] += round(float(value) * REVENUE_SCALE)
                 else:
-                    bidders_data[bidder_id][metric] = int(value)
+                    bidders_data[bidder_id][metric] += int(value)
+
+        return supply_data
+
+    @classmethod
+    def _parse_supply_data(
+        cls,
+        redis_data: dict[str, str],
+        names: dict[str, str] | None = None,
+        fields: set[StatisticsField] | None = None,
+        unique_ips: UniqueIpStats | None = None,
+    ) -> StatisticsResponse:
+        supply_data = cls.decode_supply_data(redis_data, names)
+
+        latency_histograms = supply_data.histograms["latency"]
+        price_histograms = supply_data.histograms["price"]
 
         bidders: dict[str, BidderStats] = {}
-        for bidder_id, metrics in bidders_data.items():
-            bidders[bidder_id] = BidderStats(
-                wins=int(metrics.get("wins", 0)),
-                total_revenue=round(float(metrics.get("revenue", 0.0)), 2),
-                no_bids=int(metrics.get("no_bids", 0)),
-                timeouts=int(metrics.get("timeouts", 0)),
-            )
-
-        return StatisticsResponse(
-            total_reqs=total_reqs,
-            reqs_per_country=reqs_per_country,
-            bidders=bidders,
+        for bidder_id in supply_data.bidders.keys() | latency_histograms.keys() | price_histograms.keys():
+            metrics = supply_data.bidders[bidder_id]
+            bidder_stats = {
+                "wins": metrics["wins"],
+                "total_revenue": round(metrics["revenue"] / REVENUE_SCALE, 2),
+                "no_bids": metrics["no_bids"],
+                "timeouts": metrics["timeouts"],
+                "latency": cls._get_latency_stats(latency_histograms.get(bidder_id)),
+                "price": cls._get_price_stats(price_histograms.get(bidder_id)),
+            }
+            bidders[bidder_id] = BidderStats(**cls._select(bidder_stats, fields))
+
+        supply_stats = {
+            "total_reqs": supply_data.total_reqs,
+            "reqs_per_country": dict(supply_data.reqs_per_country),
+            "unique_ips": unique_ips,
+            "bidders": dict(sorted(bidders.items())),
+            "price": cls._get_price_stats(supply_data.get_supply_histogram("price")),
+        }
+        if fields is not None and fields - SUPPLY_FIELDS:
+            fields = fields | {"bidders"}
+        return StatisticsResponse(**cls._select(supply_stats, fields))
+
+    @staticmethod
+    def _select(values: dict, fields: set[str] | None) -> dict:
+        # stats without data (None) are left unset, bodies dumped with exclude_unset omit them instead of sending null
+        return {key: value for key, value in values.items() if value is not None and (fields is None or key in fields)}
+
+    @staticmethod
+    def _get_unique_ip_stats(statistics_result: StatisticsResult, supply_id: str) -> UniqueIpStats | None:
+        if supply_id not in statistics_result.unique_ips:
+            return None
+
+        return UniqueIpStats(
+            total=statistics_result.unique_ips[supply_id],
+            per_country=statistics_result.unique_ips_per_country.get(supply_id, {}),
+        )
+
+    @staticmethod
+    def _get_latency_stats(histogram: list[int] | None) -> LatencyStats | None:
+        if not histogram:
+            return None
+
+        bounds = HISTOGRAM_BUCKETS["latency"]
+        return LatencyStats(
+            count=sum(histogram),
+            p50_ms=get_percentile(histogram, bounds, 50),
+            p90_ms=get_percentile(histogram, bounds, 90),
+            p99_ms=get_percentile(histogram, bounds, 99),
+        )
+
+    @staticmethod
+    def _get_price_stats(histogram: list[int] | None) -> PriceStats | None:
+        if not histogram or not any(histogram):
+            return None
+
+        bounds = HISTOGRAM_BUCKETS["price"]
+        return PriceStats(
+            count=sum(histogram),
+            median=get_percentile(histogram, bounds, 50),
+            p95=get_percentile(histogram, bounds, 95),
+            buckets=[
+                PriceBucket(le=bounds[bucket] if bucket < len(bounds) else None, count=count)
+                for bucket, count in enumerate(histogram)
+                if count
+            ],
+        )
+
+
+class StatisticsRangeResponseBuilder(BaseBuilder):
+    @classmethod
+    def build(cls, statistics_result: StatisticsRangeResult, *args, **kwargs) -> StatisticsRangeResponse:
+        return StatisticsRangeResponse(
+            start=statistics_result.start,
+            end=statistics_result.end,
+            granularity=statistics_result.granularity,
+            supplies=StatisticsResponseBuilder.build(statistics_result),
+        )
+
+
+class StatisticsChangesResponseBuilder(BaseBuilder):
+    @classmethod
+    def build(
+        cls,
+        statistics_result: StatisticsResult | None,
+        since: int,
+        fields: set[StatisticsField] | None = None,
+        *args,
+        **kwargs,
+    ) -> StatisticsChangesResponse:
+        # without a result (Redis error) the client keeps its cursor and simply asks again
+        if statistics_result is None or statistics_result.version is None:
+            return StatisticsChangesResponse(version=since, supplies={})
+
+        return StatisticsChangesResponse(
+            version=statistics_result.version,
+            supplies=StatisticsResponseBuilder.build(statistics_result, fields),
         )
@@ -2,8 +2,14 @@ import asyncio
 import typer
 from pathlib import Path
 
+from app.commands.benchmark_rate_limiter import benchmark_rate_limiters
 from app.commands.generate_auction_data import generate_auction_data
 from app.commands.load_data import load_json_to_db
+from app.commands.stub_bidders import run_stub_bidders, write_stub_fleet_data
+from app.models.commands.stub_bidders import StubBidderConfig
+from app.redis_db.client import redis_client
+from app.services.rate_limiter import RATE_LIMITERS
+from app.services.statistics import statistics_service
 
 app = typer.Typer(
     name="auction-cli",
@@ -85,5 +91,146 @@ def load_data(
         raise typer.Exit(code=1)
 
 
+@app.command()
+def stub_bidders(
+    bidders: int = typer.Option(10, "--bidders", "-b", help="Number of stub bidder servers to start"),
+    supplies: int = typer.Option(10, "--supplies", "-s", help="Number of supplies to generate"),
+    host: str = typer.Option("127.0.0.1", "--host", help="Interface the stub bidders listen on"),
+    base_port: int = typer.Option(9001, "--base-port", help="Port of the first stub bidder, the rest follow"),
+    processes: int = typer.Option(1, "--processes", "-p", help="Number of processes to spread the servers over"),
+    latency_distribution: str = typer.Option(
+        "lognormal",
+        "--latency-dist",
+        help="Latency distribution: fixed, uniform, normal, exponential or lognormal",
+    ),
+    latency_mean_ms: float = typer.Option(60.0, "--latency-mean-ms", help="Mean response latency"),
+    latency_stddev_ms: float = typer.Option(30.0, "--latency-stddev-ms", help="Latency standard deviation"),
+    latency_max_ms: float = typer.Option(1000.0, "--latency-max-ms", help="Hard cap on the sampled latency"),
+    no_bid_rate: float = typer.Option(0.3, "--no-bid-rate", help="Probability of a no-bid answer"),
+    min_price: float = typer.Option(0.01, "--min-price", help="Lowest bid price"),
+    max_price: float = typer.Option(1.00, "--max-price", help="Highest bid price"),
+    timeout_ms: int | None = typer.Option(None, "--timeout-ms", help="Per-bidder timeout written to the data file"),
+    countries: list[str] | None = typer.Option(
+        None,
+        "--country",
+        "-c",
+        help="Restrict bidder countries (repeatable), e.g. -c US to make every bidder eligible for US traffic",
+    ),
+    output: Path = typer.Option(
+        Path("data.json"),
+        "--output",
+        "-o",
+        help="Output path for the generated JSON file pointing at the stub bidders",
+    ),
+) -> None:
+    """
+    Start a fleet of local stub bidder HTTP servers for load testing.
+
+    Writes a matching data file; load it with `load-data` and run the service with
+    BIDDER_CLIENT__TRANSPORT=http to fan out to the stubs over real connections.
+    """
+
+    try:
+        config = StubBidderConfig(
+            latency_distribution=latency_distribution,
+            latency_mean_ms=latency_mean_ms,
+            latency_stddev_ms=latency_stddev_ms,
+            latency_max_ms=latency_max_ms,
+            no_bid_rate=no_bid_rate,
+            min_price=min_price,
+            max_price=max_price,
+        )
+        ports = list(range(base_port, base_port + bidders))
+
+        result = write_stub_fleet_data(
+            output_path=output,
+            host=host,
+            ports=ports,
+            num_supplies=supplies,
+            timeout_ms=timeout_ms,
+            countries=countries,
+        )
+
+        typer.secho(f"[OK] Successfully generated {output}", fg=typer.colors.GREEN)
+        typer.echo(f"  Supplies: {result['supplies_count']}")
+        typer.echo(f"  Bidders: {result['bidders_count']}")
+
+    except Exception as e:
+        typer.secho(f"[ERROR] Error generating stub fleet: {e}", fg=typer.colors.RED, err=True)
+        raise typer.Exit(code=1) from e
+
+    typer.secho(
+        f"[OK] Serving {bidders} stub bidders on http://{host}:{ports[0]}-{ports[-1]}/bid "
+        f"({processes} process(es)), press Ctrl+C to stop",
+        fg=typer.colors.GREEN,
+    )
+    run_stub_bidders(host=host, ports=ports, config=config, processes=processes)
+
+
+@app.command()
+def benchmark_rate_limiter(
+    algorithms: list[str] | None = typer.Option(
+        None,
+        "--algorithm",
+        "-a",
+        help="Algorithm to benchmark (repeatable): sliding_log, sliding_window_counter or gcra. Defaults to all",
+    ),
+    keys: int = typer.Option(10000, "--keys", "-k", help="Number of distinct IPs"),
+    requests_per_key: int | None = typer.Option(
+        None,
+        "--requests-per-key",
+        "-r",
+        help="Checks per IP, defaults to the rate limit itself",
+    ),
+    concurrency: int = typer.Option(100, "--concurrency", "-c", help="Number of concurrent checks in flight"),
+    max_requests: int = typer.Option(3, "--max-requests", help="Rate limit per window"),
+    window_seconds: int = typer.Option(60, "--window-seconds", help="Rate limit window"),
+) -> None:
+    """
+    Compare memory per key and throughput of the rate limiting algorithms.
+
+    Runs against the configured Redis; the benchmark keys are deleted afterwards.
+    """
+    try:
+        results = asyncio.run(
+            benchmark_rate_limiters(
+                redis_client=redis_client,
+                algorithms=algorithms or list(RATE_LIMITERS),
+                num_keys=keys,
+                requests_per_key=requests_per_key,
+                concurrency=concurrency,
+                max_requests=max_requests,
+                window_seconds=window_seconds,
+            )
+        )
+    except Exception as e:
+        typer.secho(f"[ERROR] Error running benchmark: {e}", fg=typer.colors.RED, err=True)
+        raise typer.Exit(code=1) from e
+
+    typer.echo(f"{'algorithm':<24}{'ops/sec':>12}{'bytes/key':>12}{'allowed':>10}{'denied':>10}")
+    for result in results:
+        typer.echo(
+            f"{result.algorithm:<24}{result.ops_per_second:>12.0f}{result.memory_per_key_bytes:>12.0f}"
+            f"{result.allowed:>10}{result.denied:>10}"
+        )
+
+
+@app.command()
+def migrate_statistics() -> None:
+    """
+    Migrate statistics keys and fields of earlier layouts into the current one.
+
+    Workers only migrate on startup when the layout changed; run this after a rolling
+    deploy to pick up counters written by the old workers meanwhile.
+    """
+    try:
+        asyncio.run(statistics_service.migrate(force=True))
+    except Exception as e:
+        typer.secho(f"[ERROR] Error migrating statistics: {e}", fg=typer.colors.RED, err=True)
+        raise typer.Exit(code=1) from e
+
+    typer.secho("[OK] Statistics migrated", fg=typer.colors.GREEN)
+
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,29 @@
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+
+from app.models.clients.bidder import BidderRequest
+from app.models.services.catalog import BidderInfo
+
+
+class BidderTimeoutError(Exception):
+    pass
+
+
+class BidderClient(ABC):
+    @abstractmethod
+    async def request_bid(self, bidder: BidderInfo, bid_request: BidderRequest, timeout: float) -> float | None:
+        """
+        Request a bid from a single bidder.
+
+        Returns the bid price or None for a no-bid. Raises BidderTimeoutError when the bidder
+        doesn't answer within timeout seconds; any other exception is treated as a failed bid.
+        """
+        raise NotImplementedError
+
+    def retain_bidders(self, bidders: Mapping[str, BidderInfo]) -> None:
+        """Release what the client holds for bidders not in bidders (the current catalog); a no-op by default."""
+        return None
+
+    async def aclose(self) -> None:
+        """Release the client's connections; a no-op for clients that hold none."""
+        return None
@@ -0,0 +1,19 @@
+from app.clients.bidder.base import BidderClient
+from app.clients.bidder.http import HttpBidderClient
+from app.clients.bidder.simulated import SimulatedBidderClient
+from app.config.settings import settings
+
+
+def create_bidder_client() -> BidderClient:
+    if settings.bidder_client.transport == "http":
+        return HttpBidderClient(
+            max_connections=settings.bidder_client.max_connections_per_bidder,
+            max_keepalive_connections=settings.bidder_client.max_keepalive_connections_per_bidder,
+            keepalive_expiry=settings.bidder_client.keepalive_expiry_seconds,
+            connect_timeout=settings.bidder_client.connect_timeout_ms / 1000,
+        )
+
+    return SimulatedBidderClient()
+
+
+bidder_client = create_bidder_client()
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from collections.abc import Mapping
+
+import httpx
+
+from app.clients.bidder.base import BidderClient, BidderTimeoutError
+from app.models.clients.bidder import BidderRequest, BidderResponse
+from app.models.services.catalog import BidderInfo
+
+logger = logging.getLogger(__name__)
+
+
+class HttpBidderClient(BidderClient):
+    """
+    Sends bid requests to real bidders over HTTP.
+
+    Every bidder gets its own keep-alive connection pool, so a slow or saturated bidder
+    can't starve connections of the others and steady-state requests never pay for a
+    TCP handshake. Requests are POSTed as JSON; a 204 or {"price": null} is a no-bid.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 0.05,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.connect_timeout = connect_timeout
+        self.transport = transport
+        # bidder_id -> (endpoint, pooled client)
+        self._clients: dict[str, tuple[str, httpx.AsyncClient]] = {}
+        self._closing: set[asyncio.Task] = set()
+
+    def _get_client(self, bidder: BidderInfo) -> httpx.AsyncClient:
+        if (entry := self._clients.get(bidder.id)) is not None:
+            endpoint, client = entry
+            if endpoint == bidder.endpoint:
+                return client
+
+            # endpoint changed in the catalog, retire the old pool in the background
+            self._retire(client)
+
+        client = httpx.AsyncClient(limits=self.limits, transport=self.transport, trust_env=False)
+        self._clients[bidder.id] = (bidder.endpoint, client)
+        return client
+
+    def _retire(self, client: httpx.AsyncClient) -> None:
+        task = asyncio.create_task(client.aclose())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def retain_bidders(self, bidders: Mapping[str, BidderInfo]) -> None:
+        """Close the pools of bidders removed from the catalog or moved to another endpoint."""
+        for bidder_id, (endpoint, client) in list(self._clients.items()):
+            if (bidder := bidders.get(bidder_id)) is None or bidder.endpoint != endpoint:
+                del self._clients[bidder_id]
+                self._retire(client)
+
+    async def request_bid(self, bidder: BidderInfo, bid_request: BidderRequest, timeout: float) -> float | None:
+        if not bidder.endpoint:
+            raise ValueError(f"Bidder {bidder.id} has no endpoint configured")
+
+        if timeout <= 0:
+            raise BidderTimeoutError(bidder.id)
+
+        client = self._get_client(bidder)
+
+        try:
+            response = await client.post(
+                bidder.endpoint,
+                json=bid_request.model_dump(),
+                timeout=httpx.Timeout(timeout, connect=min(self.connect_timeout, timeout)),
+            )
+        except httpx.TimeoutException as e:
+            logger.info(f"{bidder.id} - timeout (no response within {timeout * 1000:.0f}ms)")
+            raise BidderTimeoutError(bidder.id) from e
+
+        if response.status_code == httpx.codes.NO_CONTENT:
+            return None
+
+        response.raise_for_status()
+        return BidderResponse.model_validate_json(response.content).price
+
+    async def aclose(self) -> None:
+        clients = [client for _, client in self._clients.values()]
+        self._clients.clear()
+
+        await asyncio.gather(*(client.aclose() for client in clients), *self._closing, return_exceptions=True)
@@ -0,0 +1,37 @@
+import asyncio
+import logging
+import random
+
+from app.clients.bidder.base import BidderClient, BidderTimeoutError
+from app.models.clients.bidder import BidderRequest
+from app.models.services.catalog import BidderInfo
+
+logger = logging.getLogger(__name__)
+
+
+class SimulatedBidderClient(BidderClient):
+    NO_BID_PROBABILITY = 0.3
+    MIN_BID_PRICE = 0.01
+    MAX_BID_PRICE = 1.00
+
+    async def request_bid(self, bidder: BidderInfo, bid_request: BidderRequest, timeout: float) -> float | None:
+        tmax = bid_request.tmax
+        limit_ms = min(tmax, bidder.timeout_ms) if bidder.timeout_ms is not None else tmax
+
+        # simulate latency (0 to 1.5x tmax)
+        latency_ms = random.randint(0, int(tmax * 1.5))
+
+        # the answer would arrive after the deadline, no need to actually wait for it
+        if latency_ms > limit_ms:
+            logger.info(f"{bidder.id} - timeout (latency: {latency_ms}ms > limit: {limit_ms}ms)")
+            raise BidderTimeoutError(bidder.id)
+
+        # decide the answer upfront so the result doesn't depend on wake-up order
+        no_bid = random.random() < self.NO_BID_PROBABILITY
+        bid_price = None if no_bid else round(random.uniform(self.MIN_BID_PRICE, self.MAX_BID_PRICE), 2)
+
+        # simulate delay
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000)
+
+        return bid_price
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+
+import redis.asyncio as redis
+
+from app.models.commands.rate_limiter import RateLimiterBenchmarkResult
+from app.redis_db.cluster import pipeline_by_node
+from app.services.rate_limiter import RATE_LIMITERS, RedisRateLimiter
+
+logger = logging.getLogger(__name__)
+
+MEMORY_SAMPLE_KEYS = 1000
+CLEANUP_BATCH_SIZE = 1000
+
+
+async def _benchmark_rate_limiter(
+    algorithm: str,
+    limiter: RedisRateLimiter,
+    num_keys: int,
+    requests_per_key: int,
+    concurrency: int,
+) -> RateLimiterBenchmarkResult:
+    ips = [f"bench-{algorithm}-{i}" for i in range(num_keys)]
+    # round-robin over the keys, like interleaved traffic from many clients
+    checks = iter([ip for _ in range(requests_per_key) for ip in ips])
+    allowed = denied = 0
+
+    async def worker() -> None:
+        nonlocal allowed, denied
+        for ip in checks:
+            if await limiter.is_allowed(ip):
+                allowed += 1
+            else:
+                denied += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    keys = [limiter._get_key(ip) for ip in ips]
+
+    usages = await pipeline_by_node(
+        limiter.redis,
+        keys[:MEMORY_SAMPLE_KEYS],
+        lambda pipe, key: pipe.memory_usage(key, samples=0),
+    )
+    usages = [usage for usage in usages.values() if usage is not None]
+
+    await pipeline_by_node(limiter.redis, keys, lambda pipe, key: pipe.unlink(key), batch_size=CLEANUP_BATCH_SIZE)
+
+    total = num_keys * requests_per_key
+    return RateLimiterBenchmarkResult(
+        algorithm=algorithm,
+        keys=num_keys,
+        requests=total,
+        allowed=allowed,
+        denied=denied,
+        elapsed_seconds=elapsed,
+        ops_per_second=total / elapsed if elapsed > 0 else 0.0,
+        memory_per_key_bytes=sum(usages) / len(usages) if usages else 0.0,
+    )
+
+
+async def benchmark_rate_limiters(
+    redis_client: redis.Redis,
+    algorithms: list[str],
+    num_keys: int = 10000,
+    requests_per_key: int | None = None,
+    concurrency: int = 100,
+    max_requests: int = 3,
+    window_seconds: int = 60,
+) -> list[RateLimiterBenchmarkResult]:
+    """
+    Run the same workload through each rate limiting algorithm against a live Redis.
+
+    By default every IP makes max_requests checks, which is the worst case for the
+    sliding log's memory (a full window) and the steady state for the others.
+    Benchmark keys are removed afterwards.
+    """
+    if unknown := set(algorithms) - RATE_LIMITERS.keys():
+        raise ValueError(f"Unknown rate limiting algorithm(s): {', '.join(sorted(unknown))}")
+
+    results = []
+    for algorithm in algorithms:
+        limiter = RATE_LIMITERS[algorithm](
+            redis_client=redis_client,
+            max_requests=max_requests,
+            window_seconds=window_seconds,
+        )
+        logger.info(f"Benchmarking {algorithm} rate limiter...")
+        results.append(
+            await _benchmark_rate_limiter(
+                algorithm=algorithm,
+                limiter=limiter,
+                num_keys=num_keys,
+                requests_per_key=requests_per_key or max_requests,
+                concurrency=concurrency,
+            )
+        )
+
+    return results
@@ -56,12 +56,26 @@ def generate_auction_data(
     output_path: Path,
     num_supplies: int = 10,
     num_bidders: int = 12,
+    endpoints: list[str] | None = None,
+    timeout_ms: int | None = None,
+    countries: list[str] | None = None,
 ) -> dict[str, int]:
-    bidders: dict[str, dict[str, str]] = {}
+    # with endpoints every bidder must get one, so the list dictates the number of bidders
+    if endpoints is not None:
+        num_bidders = len(endpoints)
+
+    bidders: dict[str, dict[str, str | int]] = {}
     selected_bidder_names = random.sample(BIDDER_NAMES, min(num_bidders, len(BIDDER_NAMES)))
+    if endpoints is not None:
+        selected_bidder_names += [f"stub_bidder_{i}" for i in range(len(selected_bidder_names), num_bidders)]
+
+    for i, bidder_name in enumerate(selected_bidder_names):
+        bidders[bidder_name] = {"country": random.choice(countries or COUNTRIES)}
 
-    for bidder_name in selected_bidder_names:
-        bidders[bidder_name] = {"country": random.choice(COUNTRIES)}
+        if endpoints is not None:
+            bidders[bidder_name]["endpoint"] = endpoints[i]
+        if timeout_ms is not None:
+            bidders[bidder_name]["timeout_ms"] = timeout_ms
 
     supplies: dict[str, list[str]] = {}
     selected_supply_names = random.sample(SUPPLY_NAMES, min(num_supplies, len(SUPPLY_NAMES)))
@@ -5,8 +5,8 @@ from pathlib import Path
 from app.db.dao.bidder import bidder_dao
 from app.db.dao.supply import supply_dao
 from app.db.session import session_factory
-from app.models.dao.bidder import BidderCreate
-from app.models.dao.supply import SupplyCreate
+from app.models.dao.bidder import BidderCreate, BidderUpdate
+from app.models.dao.supply import SupplyCreate, SupplyUpdate
 
 logger = logging.getLogger(__name__)
 
@@ -31,12 +31,30 @@ async def load_json_to_db(json_path: Path) -> dict[str, int]:
 
             if existing_bidder:
                 bidder_objects[bidder_id] = existing_bidder
-                logger.info(f"Bidder {bidder_id} already exists, skipping")
+                bidder_update = BidderUpdate(
+                    country=bidder_info["country"],
+                    endpoint=bidder_info.get("endpoint"),
+                    timeout_ms=bidder_info.get("timeout_ms"),
+                )
+                if (existing_bidder.country, existing_bidder.endpoint, existing_bidder.timeout_ms) == (
+                    bidder_update.country,
+                    bidder_update.endpoint,
+                    bidder_update.timeout_ms,
+                ):
+                    logger.info(f"Bidder {bidder_id} already exists, skipping")
+                else:
+                    await bidder_dao.update(session, existing_bidder, obj_in=bidder_update, autocommit=False)
+                    logger.info(f"Bidder {bidder_id} already exists, updated config")
             else:
                 # not saved yet!!!
                 bidder = await bidder_dao.create(
                     session,
-                    obj_in=BidderCreate(id=bidder_id, country=bidder_info["country"]),
+                    obj_in=BidderCreate(
+                        id=bidder_id,
+                        country=bidder_info["country"],
+                        endpoint=bidder_info.get("endpoint"),
+                        timeout_ms=bidder_info.get("timeout_ms"),
+                    ),
                     autocommit=False,
                 )
                 bidder_objects[bidder_id] = bidder
@@ -46,15 +64,30 @@ async def load_json_to_db(json_path: Path) -> dict[str, int]:
         await session.flush()
 
         added_supplies_count = 0
-        for supply_id, bidder_ids in supplies_data.items():
+        for supply_id, supply_info in supplies_data.items():
+            # either a plain list of bidder ids or {"bidders": [...], "qps_limit": ..., "qps_burst": ...}
+            if isinstance(supply_info, list):
+                supply_info = {"bidders": supply_info}
+
+            supply_update = SupplyUpdate.model_validate(supply_info)
             existing_supply = await supply_dao.get(session, supply_id)
-            bidders = [bidder_objects[bid_id] for bid_id in bidder_ids if bid_id in bidder_objects]
+            bidders = [bidder_objects[bid_id] for bid_id in supply_update.bidders if bid_id in bidder_objects]
 
             if existing_supply:
-                logger.info(f"Supply {supply_id} already exists, updating bidders")
+                logger.info(f"Supply {supply_id} already exists, updating bidders and limits")
+                existing_supply.qps_limit = supply_update.qps_limit
+                existing_supply.qps_burst = supply_update.qps_burst
                 await supply_dao.update_with_bidders(session, existing_supply, bidders=bidders, autocommit=False)
             else:
-                supply = await supply_dao.create(session, obj_in=SupplyCreate(id=supply_id), autocommit=False)
+                supply = await supply_dao.create(
+                    session,
+                    obj_in=SupplyCreate(
+                        id=supply_id,
+                        qps_limit=supply_update.qps_limit,
+                        qps_burst=supply_update.qps_burst,
+                    ),
+                    autocommit=False,
+                )
                 await supply_dao.update_with_bidders(session, supply, bidders=bidders, autocommit=False)
                 added_supplies_count += 1
                 logger.info(f"Added supply {supply_id}")
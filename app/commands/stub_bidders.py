@@ -0,0 +1,133 @@
+import asyncio
+import contextlib
+import json
+import logging
+import multiprocessing
+import random
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+import uvicorn
+
+from app.commands.generate_auction_data import generate_auction_data
+from app.models.commands.stub_bidders import StubBidderConfig
+
+logger = logging.getLogger(__name__)
+
+ASGIReceive = Callable[[], Awaitable[dict[str, Any]]]
+ASGISend = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+def create_stub_bidder_app(config: StubBidderConfig, seed: int | None = None) -> Callable:
+    """
+    Minimal ASGI bidder speaking the HttpBidderClient protocol.
+
+    Kept framework-free on purpose, so the stub itself adds as little overhead
+    as possible to the latency being measured.
+    """
+    rng = random.Random(seed)
+
+    async def app(scope: dict[str, Any], receive: ASGIReceive, send: ASGISend) -> None:
+        if scope["type"] == "lifespan":
+            while (message := await receive())["type"] != "lifespan.shutdown":
+                await send({"type": "lifespan.startup.complete"})
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+        # drain the request body, its content doesn't influence the stub's answer
+        more_body = True
+        while more_body:
+            message = await receive()
+            more_body = message.get("more_body", False)
+
+        if (latency_ms := config.sample_latency_ms(rng)) > 0:
+            await asyncio.sleep(latency_ms / 1000)
+
+        if rng.random() < config.no_bid_rate:
+            await send({"type": "http.response.start", "status": 204, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        body = json.dumps({"price": round(rng.uniform(config.min_price, config.max_price), 2)}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+async def _serve(host: str, ports: list[int], config: StubBidderConfig) -> None:
+    servers = [
+        uvicorn.Server(
+            uvicorn.Config(
+                create_stub_bidder_app(config, seed=port),
+                host=host,
+                port=port,
+                log_level="warning",
+                access_log=False,
+            )
+        )
+        for port in ports
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def _serve_process(host: str, ports: list[int], config: StubBidderConfig) -> None:
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(_serve(host, ports, config))
+
+
+def run_stub_bidders(
+    host: str,
+    ports: list[int],
+    config: StubBidderConfig,
+    processes: int = 1,
+) -> None:
+    """Serve one stub bidder per port, spread round-robin over the given number of processes. Blocks."""
+    processes = max(1, min(processes, len(ports)))
+
+    if processes == 1:
+        _serve_process(host, ports, config)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=_serve_process, args=(host, ports[i::processes], config), daemon=True)
+        for i in range(processes)
+    ]
+
+    for worker in workers:
+        worker.start()
+
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+
+
+def write_stub_fleet_data(
+    output_path: Path,
+    host: str,
+    ports: list[int],
+    num_supplies: int = 10,
+    timeout_ms: int | None = None,
+    countries: list[str] | None = None,
+) -> dict[str, int]:
+    return generate_auction_data(
+        output_path=output_path,
+        num_supplies=num_supplies,
+        num_bidders=len(ports),
+        endpoints=[f"http://{host}:{port}/bid" for port in ports],
+        timeout_ms=timeout_ms,
+        countries=countries,
+    )
@@ -19,5 +19,10 @@ class BidderDAO(CommonDAO[Bidder, BidderCreate, BidderUpdate]):
         result = await session.execute(stmt)
         return list(result.scalars().all())
 
+    @staticmethod
+    async def get_catalog_rows(session: AsyncSession) -> list[tuple[str, str, str | None, int | None]]:
+        result = await session.execute(select(Bidder.id, Bidder.country, Bidder.endpoint, Bidder.timeout_ms))
+        return [tuple(row) for row in result.all()]
+
 
 bidder_dao = BidderDAO(Bidder)
@@ -5,7 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.db.dao.common import CommonDAO
-from app.db.models.supply import Supply
+from app.db.models.supply import Supply, supply_bidder_table
 from app.models.dao.supply import SupplyCreate, SupplyUpdate
 
 
@@ -14,6 +14,22 @@ class SupplyDAO(CommonDAO[Supply, SupplyCreate, SupplyUpdate]):
         result = await session.execute(select(Supply).where(Supply.id == supply_id).options(selectinload(Supply.bidders)))
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def get_bidder_links(session: AsyncSession) -> list[tuple[str, str | None]]:
+        # outer join keeps supplies without any bidders (bidder_id is None for them)
+        stmt = select(Supply.id, supply_bidder_table.c.bidder_id).outerjoin(
+            supply_bidder_table, supply_bidder_table.c.supply_id == Supply.id
+        )
+        result = await session.execute(stmt)
+        return [(supply_id, bidder_id) for supply_id, bidder_id in result.all()]
+
+    @staticmethod
+    async def get_qps_limits(session: AsyncSession) -> list[tuple[str, float, int | None]]:
+        # only capped supplies
+        stmt = select(Supply.id, Supply.qps_limit, Supply.qps_burst).where(Supply.qps_limit.is_not(None))
+        result = await session.execute(stmt)
+        return [(supply_id, qps_limit, qps_burst) for supply_id, qps_limit, qps_burst in result.all()]
+
     @staticmethod
     async def update_with_bidders(
         session: AsyncSession,
@@ -0,0 +1,80 @@
+"""add_catalog_notify_triggers
+
+Revision ID: 5b1e2c7a9f30
+Revises: d737f97f479f
+Create Date: 2026-10-17 10:12:08.417293
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5b1e2c7a9f30"
+down_revision: str | None = "d737f97f479f"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+CATALOG_TABLES = ("supplies", "bidders", "supply_bidder")
+
+
+def upgrade() -> None:
+    """Upgrade schema - Emit NOTIFY on catalog changes so workers can refresh their in-process catalog."""
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_catalog_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                PERFORM pg_notify(
+                    'catalog_changes',
+                    json_build_object('table', TG_TABLE_NAME, 'op', TG_OP)::text
+                );
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify(
+                    'catalog_changes',
+                    json_build_object('table', TG_TABLE_NAME, 'op', TG_OP, 'old', row_to_json(OLD))::text
+                );
+            ELSIF TG_OP = 'UPDATE' THEN
+                PERFORM pg_notify(
+                    'catalog_changes',
+                    json_build_object(
+                        'table', TG_TABLE_NAME, 'op', TG_OP, 'old', row_to_json(OLD), 'new', row_to_json(NEW)
+                    )::text
+                );
+            ELSE
+                PERFORM pg_notify(
+                    'catalog_changes',
+                    json_build_object('table', TG_TABLE_NAME, 'op', TG_OP, 'new', row_to_json(NEW))::text
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+    for table in CATALOG_TABLES:
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_catalog_notify
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION notify_catalog_change();
+            """
+        )
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_catalog_notify_truncate
+            AFTER TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_change();
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema - Remove catalog NOTIFY triggers."""
+    for table in CATALOG_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_catalog_notify_truncate ON {table};")
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_catalog_notify ON {table};")
+
+    op.execute("DROP FUNCTION IF EXISTS notify_catalog_change();")
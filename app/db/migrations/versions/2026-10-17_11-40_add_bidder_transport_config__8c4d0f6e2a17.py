@@ -0,0 +1,30 @@
+"""add_bidder_transport_config
+
+Revision ID: 8c4d0f6e2a17
+Revises: 5b1e2c7a9f30
+Create Date: 2026-10-17 11:40:52.093114
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8c4d0f6e2a17"
+down_revision: str | None = "5b1e2c7a9f30"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add per-bidder endpoint and timeout."""
+    op.add_column("bidders", sa.Column("endpoint", sa.String(), nullable=True))
+    op.add_column("bidders", sa.Column("timeout_ms", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema - Remove per-bidder endpoint and timeout."""
+    op.drop_column("bidders", "timeout_ms")
+    op.drop_column("bidders", "endpoint")
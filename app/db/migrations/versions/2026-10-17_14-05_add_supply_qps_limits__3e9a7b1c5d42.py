@@ -0,0 +1,30 @@
+"""add_supply_qps_limits
+
+Revision ID: 3e9a7b1c5d42
+Revises: 8c4d0f6e2a17
+Create Date: 2026-10-17 14:05:18.417203
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3e9a7b1c5d42"
+down_revision: str | None = "8c4d0f6e2a17"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add per-supply QPS token bucket config."""
+    op.add_column("supplies", sa.Column("qps_limit", sa.Float(), nullable=True))
+    op.add_column("supplies", sa.Column("qps_burst", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema - Remove per-supply QPS token bucket config."""
+    op.drop_column("supplies", "qps_burst")
+    op.drop_column("supplies", "qps_limit")
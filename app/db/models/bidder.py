@@ -1,4 +1,4 @@
-from sqlalchemy import String, Index
+from sqlalchemy import Integer, String, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
@@ -8,6 +8,8 @@ class Bidder(Base):
     __tablename__ = "bidders"
     id: Mapped[str] = mapped_column(String, primary_key=True, index=True)  # the bidder's name is its id
     country: Mapped[str] = mapped_column(String(2), index=True, nullable=False)
+    endpoint: Mapped[str | None] = mapped_column(String, nullable=True)  # bid request URL for the http transport
+    timeout_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)  # per-bidder cap on top of tmax
     supplies: Mapped[list["Supply"]] = relationship(
         "Supply",
         secondary="supply_bidder",
@@ -1,4 +1,4 @@
-from sqlalchemy import String, Table, Column, ForeignKey, Index
+from sqlalchemy import Float, Integer, String, Table, Column, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.meta import meta
@@ -19,6 +19,8 @@ class Supply(Base):
     __tablename__ = "supplies"
 
     id: Mapped[str] = mapped_column(String, primary_key=True, index=True)  # the supply's name is its id
+    qps_limit: Mapped[float | None] = mapped_column(Float, nullable=True)  # token refill rate, None is uncapped
+    qps_burst: Mapped[int | None] = mapped_column(Integer, nullable=True)  # bucket capacity, defaults to qps_limit
     bidders: Mapped[list["Bidder"]] = relationship(
         "Bidder",
         secondary=supply_bidder_table,
@@ -1,6 +1,7 @@
 import logging
+import math
 
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Response, status
 
 from app.models.api.request.bid import BidRequest
 from app.services.rate_limiter import rate_limiter
@@ -9,11 +10,24 @@ from app.services.rate_limiter import rate_limiter
 logger = logging.getLogger(__name__)
 
 
-async def check_rate_limit(request: BidRequest) -> BidRequest:
-    if not await rate_limiter.is_allowed(request.ip):
+async def check_rate_limit(request: BidRequest, response: Response) -> BidRequest:
+    result = await rate_limiter.check(request.ip, supply_id=request.supply_id)
+
+    headers = {
+        "X-RateLimit-Limit": str(result.limit),
+        "X-RateLimit-Remaining": str(result.remaining),
+    }
+
+    if not result.allowed:
+        headers["Retry-After"] = str(math.ceil(result.retry_after))
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded. Maximum 3 requests per minute per IP address.",
+            detail=(
+                f"Rate limit exceeded. Maximum {result.limit} requests per "
+                f"{result.window_seconds} seconds per IP address."
+            ),
+            headers=headers,
         )
 
+    response.headers.update(headers)
     return request
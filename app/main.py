@@ -4,13 +4,21 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.clients.bidder.factory import bidder_client
 from app.config.settings import settings
 from app.config.logging_config import configure_logging
-from app.routers import bid, root, stat, supply
+from app.routers import bid, metrics, root, stat, supply
+from app.services.catalog import catalog_service
+from app.services.catalog_listener import catalog_listener
+from app.services.statistics_stream import statistics_stream
+from app.services.statistics_writer import statistics_writer
 from app.startup import setup
 
 configure_logging()
 
+# pools of bidders dropped from the catalog are closed as soon as it changes
+catalog_service.subscribe(lambda snapshot: bidder_client.retain_bidders(snapshot.bidders))
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,11 +26,25 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     logger.info("Starting up application...")
     await setup()
+
+    if settings.statistics.writer_enabled:
+        statistics_writer.start()
+        statistics_stream.start()
+
+    if settings.catalog.listen and not settings.catalog.db_lookup:
+        catalog_listener.start()
+
     logger.info("Application startup complete")
 
     yield
 
     logger.info("Shutting down application...")
+    await catalog_listener.stop()
+    await bidder_client.aclose()
+    # final flush, nothing enqueues statistics anymore at this point
+    await statistics_writer.stop()
+    # after the final flush, so its increments are published too
+    await statistics_stream.stop()
 
 
 app = FastAPI(
@@ -44,5 +66,6 @@ app.add_middleware(
 
 app.include_router(bid.router)
 app.include_router(stat.router)
+app.include_router(metrics.router)
 app.include_router(supply.router)
 app.include_router(root.router)
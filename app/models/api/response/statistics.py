@@ -1,4 +1,32 @@
-from pydantic import BaseModel
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+from app.models.services.statistics import StatisticsGranularity
+
+
+class LatencyStats(BaseModel):
+    count: int = Field(description="Responses measured, timeouts included")
+    p50_ms: float | None = Field(description="Upper bound of the histogram bucket holding the median")
+    p90_ms: float | None
+    p99_ms: float | None = Field(description="None when the percentile is above the largest bucket")
+
+
+class PriceBucket(BaseModel):
+    le: float | None = Field(description="Upper bound of the bucket, None for prices above the largest one")
+    count: int
+
+
+class PriceStats(BaseModel):
+    count: int = Field(description="Auctions won")
+    median: float | None = Field(description="Upper bound of the price bucket holding the median clearing price")
+    p95: float | None
+    buckets: list[PriceBucket] = Field(description="Non-empty price buckets in ascending order")
+
+
+class UniqueIpStats(BaseModel):
+    total: int = Field(description="Approximate number of distinct requester IPs (HyperLogLog, ~0.8% error)")
+    per_country: dict[str, int] = Field(default={}, description="The same per request country")
 
 
 class BidderStats(BaseModel):
@@ -6,12 +34,16 @@ class BidderStats(BaseModel):
     total_revenue: float = 0.0
     no_bids: int = 0
     timeouts: int = 0
+    latency: LatencyStats | None = None
+    price: PriceStats | None = None
 
 
 class StatisticsResponse(BaseModel):
     total_reqs: int = 0
     reqs_per_country: dict[str, int] = {}
+    unique_ips: UniqueIpStats | None = None
     bidders: dict[str, BidderStats] = {}
+    price: PriceStats | None = Field(default=None, description="Clearing prices of all bidders' wins")
 
     class Config:
         json_schema_extra = {
@@ -20,10 +52,31 @@ class StatisticsResponse(BaseModel):
                     "total_reqs": 10,
                     "reqs_per_country": {"US": 5, "GB": 5},
                     "bidders": {
-                        "bidder1": {"wins": 2, "total_revenue": 0.4, "no_bids": 3, "timeouts": 1},
+                        "bidder1": {
+                            "wins": 2,
+                            "total_revenue": 0.4,
+                            "no_bids": 3,
+                            "timeouts": 1,
+                            "latency": {"count": 6, "p50_ms": 50, "p90_ms": 150, "p99_ms": 200},
+                        },
                         "bidder2": {"wins": 3, "total_revenue": 0.7, "no_bids": 1, "timeouts": 0},
                         "bidder3": {"wins": 0, "total_revenue": 0.0, "no_bids": 6, "timeouts": 2},
                     },
                 }
             }
         }
+
+
+class StatisticsRangeResponse(BaseModel):
+    start: datetime = Field(description="Start of the first bucket, the requested range widened to bucket boundaries")
+    end: datetime = Field(description="End of the last bucket, exclusive")
+    granularity: StatisticsGranularity
+    supplies: dict[str, StatisticsResponse] = {}
+
+
+class StatisticsChangesResponse(BaseModel):
+    version: int = Field(description="Pass as since on the next request to get what changed after this response")
+    supplies: dict[str, StatisticsResponse] = Field(
+        default={},
+        description="Full statistics of the supplies changed since the requested version",
+    )
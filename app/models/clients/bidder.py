@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+
+
+class BidderRequest(BaseModel):
+    supply_id: str = Field(description="Supply ID for the auction")
+    country: str = Field(description="Country code (e.g., US, GB)")
+    tmax: int = Field(description="Maximum time in milliseconds the exchange waits for the bid")
+
+
+class BidderResponse(BaseModel):
+    price: float | None = Field(default=None, description="Bid price, null for a no-bid")
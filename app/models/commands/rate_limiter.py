@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+
+
+class RateLimiterBenchmarkResult(BaseModel):
+    algorithm: str
+    keys: int = Field(description="Distinct IPs exercised")
+    requests: int = Field(description="Total checks performed")
+    allowed: int
+    denied: int
+    elapsed_seconds: float
+    ops_per_second: float
+    memory_per_key_bytes: float = Field(description="Average MEMORY USAGE of a sampled rate limit key")
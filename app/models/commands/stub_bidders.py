@@ -0,0 +1,41 @@
+import math
+import random
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class StubBidderConfig(BaseModel):
+    latency_distribution: Literal["fixed", "uniform", "normal", "exponential", "lognormal"] = Field(
+        default="lognormal",
+        description="Shape of the simulated response latency",
+    )
+    latency_mean_ms: float = Field(default=60.0, ge=0, description="Mean response latency in milliseconds")
+    latency_stddev_ms: float = Field(default=30.0, ge=0, description="Latency standard deviation in milliseconds")
+    latency_max_ms: float = Field(default=1000.0, ge=0, description="Hard cap on the sampled latency")
+    no_bid_rate: float = Field(default=0.3, ge=0, le=1, description="Probability of answering with a no-bid")
+    min_price: float = Field(default=0.01, ge=0, description="Lowest bid price")
+    max_price: float = Field(default=1.00, ge=0, description="Highest bid price")
+
+    def sample_latency_ms(self, rng: random.Random) -> float:
+        mean, stddev = self.latency_mean_ms, self.latency_stddev_ms
+
+        match self.latency_distribution:
+            case "fixed":
+                latency = mean
+            case "uniform":
+                # same mean and stddev as the other distributions
+                half_width = stddev * math.sqrt(3)
+                latency = rng.uniform(mean - half_width, mean + half_width)
+            case "normal":
+                latency = rng.gauss(mean, stddev)
+            case "exponential":
+                latency = rng.expovariate(1 / mean) if mean > 0 else 0.0
+            case "lognormal":
+                if mean > 0:
+                    sigma = math.sqrt(math.log(1 + (stddev / mean) ** 2))
+                    latency = rng.lognormvariate(math.log(mean) - sigma**2 / 2, sigma)
+                else:
+                    latency = 0.0
+
+        return min(max(latency, 0.0), self.latency_max_ms)
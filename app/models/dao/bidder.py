@@ -4,7 +4,11 @@ from pydantic import BaseModel, Field
 class BidderCreate(BaseModel):
     id: str = Field(description="Unique string name of the Bidder.")
     country: str = Field(max_length=2, description="Two-letter country code.")
+    endpoint: str | None = Field(default=None, description="URL the bid requests are POSTed to.")
+    timeout_ms: int | None = Field(default=None, ge=1, description="Per-bidder response timeout in milliseconds.")
 
 
 class BidderUpdate(BaseModel):
     country: str = Field(max_length=2, description="Two-letter country code.")
+    endpoint: str | None = Field(default=None, description="URL the bid requests are POSTed to.")
+    timeout_ms: int | None = Field(default=None, ge=1, description="Per-bidder response timeout in milliseconds.")
@@ -4,8 +4,12 @@ from pydantic import BaseModel, Field
 class SupplyCreate(BaseModel):
     id: str = Field(description="Unique string name of the Supply.")
     bidders: list[str] = Field(default_factory=list, description="List of bidder IDs associated with this supply.")
+    qps_limit: float | None = Field(default=None, gt=0, description="Max sustained auctions per second.")
+    qps_burst: int | None = Field(default=None, ge=1, description="Max auctions admitted in a burst.")
 
 
 class SupplyUpdate(BaseModel):
     bidders: list[str] = Field(default_factory=list, description="List of bidder IDs to associate with this supply.")
+    qps_limit: float | None = Field(default=None, gt=0, description="Max sustained auctions per second.")
+    qps_burst: int | None = Field(default=None, ge=1, description="Max auctions admitted in a burst.")
 
@@ -0,0 +1,71 @@
+import math
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class BidderInfo(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    id: str = Field(description="Bidder ID")
+    country: str = Field(description="Two-letter country code")
+    endpoint: str | None = Field(default=None, description="URL the bid requests are POSTed to")
+    timeout_ms: int | None = Field(default=None, description="Per-bidder response timeout in milliseconds")
+
+
+class SupplyLimit(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    qps: float = Field(gt=0, description="Token refill rate, sustained auctions per second")
+    burst: int = Field(ge=1, description="Bucket capacity, auctions admitted at once after an idle period")
+
+    @classmethod
+    def from_config(cls, qps_limit: float | None, qps_burst: int | None) -> Optional["SupplyLimit"]:
+        """None for uncapped supplies; the burst defaults to one second worth of traffic."""
+        if qps_limit is None:
+            return None
+        return cls(qps=qps_limit, burst=qps_burst or max(1, math.ceil(qps_limit)))
+
+
+class CatalogSnapshot(BaseModel):
+    """
+    Immutable view of the supply/bidder catalog used on the auction hot path.
+
+    Example:
+        supplies: frozenset({"finance_hub", "tech_blog"})
+        bidders: {"pulsepoint": BidderInfo(id="pulsepoint", country="US"), "rubicon": BidderInfo(id="rubicon", ...)}
+        supply_bidders: {"finance_hub": ("pulsepoint", "rubicon"), "tech_blog": ()}
+        eligible_bidders: {("finance_hub", "US"): ("pulsepoint",), ("finance_hub", "GB"): ("rubicon",)}
+        supply_limits: {"finance_hub": SupplyLimit(qps=100.0, burst=200)}
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    supplies: frozenset[str] = Field(default_factory=frozenset, description="All known supply IDs")
+    bidders: dict[str, BidderInfo] = Field(default_factory=dict, description="Maps bidder_id to its config")
+    supply_bidders: dict[str, tuple[str, ...]] = Field(
+        default_factory=dict,
+        description="Maps supply_id to all bidder IDs linked to it",
+    )
+    eligible_bidders: dict[tuple[str, str], tuple[str, ...]] = Field(
+        default_factory=dict,
+        description="Maps (supply_id, country) to eligible bidder IDs",
+    )
+    supply_limits: dict[str, SupplyLimit] = Field(
+        default_factory=dict,
+        description="Maps supply_id to its QPS cap, uncapped supplies are absent",
+    )
+
+
+class CatalogChange(BaseModel):
+    """
+    Row-level change published by the catalog NOTIFY triggers.
+
+    Example payload:
+        {"table": "supply_bidder", "op": "INSERT", "new": {"supply_id": "finance_hub", "bidder_id": "rubicon"}}
+    """
+
+    table: Literal["supplies", "bidders", "supply_bidder"]
+    op: Literal["INSERT", "UPDATE", "DELETE", "TRUNCATE"]
+    old: dict[str, Any] | None = None
+    new: dict[str, Any] | None = None
@@ -0,0 +1,17 @@
+from pydantic import BaseModel, Field
+
+
+class RateLimitResult(BaseModel):
+    allowed: bool = Field(description="Whether the request may proceed")
+    limit: int = Field(description="Max requests per window, of the most constraining window")
+    window_seconds: int = Field(description="Length of the most constraining window")
+    remaining: int = Field(description="Requests left in the current window")
+    retry_after: float = Field(default=0.0, description="Seconds until the next request would be allowed")
+
+
+class DeniedIpCacheMetrics(BaseModel):
+    entries: int = Field(description="Clients currently cached as denied")
+    max_entries: int = Field(description="Cache capacity")
+    hits: int = Field(description="Checks answered locally with a denial")
+    misses: int = Field(description="Checks that had to go to Redis")
+    evictions: int = Field(description="Unexpired entries evicted because the cache was full")
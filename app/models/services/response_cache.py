@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+
+
+class CachedResponse(BaseModel):
+    body: bytes = Field(description="Serialized response body")
+    etag: str = Field(description="Strong ETag of the body, quoted")
+    expires_at: float = Field(description="Event loop time after which the body is refreshed")
+
+
+class ResponseCacheMetrics(BaseModel):
+    entries: int = Field(description="Responses currently cached")
+    hits: int = Field(description="Requests served from a fresh cached body")
+    refreshes: int = Field(description="Times a body was rebuilt")
+    coalesced: int = Field(description="Requests that waited for a refresh already in flight instead of starting one")
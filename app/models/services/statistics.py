@@ -1,26 +1,140 @@
+import bisect
+import re
+from datetime import datetime
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
+StatisticsGranularity = Literal["minute", "hour"]
+# response fields a /stat query can be projected onto
+StatisticsField = Literal[
+    "total_reqs", "reqs_per_country", "unique_ips",
+    "wins", "total_revenue", "no_bids", "timeouts", "latency", "price",
+]  # fmt: skip
+
+# compact stats hash layout: "r" counts requests, every other field is a code followed by a dictionary id,
+# e.g. "c3" requests from country #3, "v7" revenue of bidder #7; histogram fields add the bucket index,
+# e.g. "h7.12" responses of bidder #7 in latency bucket 12, "p7.20" wins of bidder #7 in price bucket 20
+TOTAL_REQS_FIELD = "r"
+COUNTRY_FIELD_CODE = "c"
+BIDDER_FIELD_CODES = {"wins": "w", "revenue": "v", "no_bids": "n", "timeouts": "t", "latency_sum_us": "s"}
+HISTOGRAM_FIELD_CODES = {"latency": "h", "price": "p"}
+COMPACT_FIELD_PATTERN = re.compile(r"([a-z])(\d+)(?:\.(\d+))?")
+# dictionary entries are namespaced, ids are shared by countries and bidders
+COUNTRY_NAME_PREFIX = "c:"
+BIDDER_NAME_PREFIX = "b:"
+# revenue is accumulated in integer micro-units
+REVENUE_SCALE = 1_000_000
+# upper bounds of the histogram buckets, all log-scale; one more bucket counts anything above the last bound
+LATENCY_BUCKETS_MS = (1, 2, 3, 5, 7, 10, 15, 20, 30, 50, 70, 100, 150, 200, 300, 500, 700, 1000, 1500, 2000, 3000, 5000)
+# clearing prices from 0.01 to 100 in 10 steps per decade
+PRICE_BUCKETS = (
+    0.01, 0.012, 0.015, 0.02, 0.025, 0.03, 0.04, 0.05, 0.06, 0.08,
+    0.1, 0.12, 0.15, 0.2, 0.25, 0.3, 0.4, 0.5, 0.6, 0.8,
+    1, 1.2, 1.5, 2, 2.5, 3, 4, 5, 6, 8,
+    10, 12, 15, 20, 25, 30, 40, 50, 60, 80,
+    100,
+)  # fmt: skip
+HISTOGRAM_BUCKETS = {"latency": LATENCY_BUCKETS_MS, "price": PRICE_BUCKETS}
+# bidder response field -> stored counter, the latency and price fields are read from the histograms
+BIDDER_RESPONSE_FIELDS = {"wins": "wins", "total_revenue": "revenue", "no_bids": "no_bids", "timeouts": "timeouts"}
+# increments field "ip:<country>:<ip>" carries a requester IP to the supply's unique IP HyperLogLogs, it isn't a counter
+UNIQUE_IP_FIELD_PREFIX = "ip:"
+# length of the time buckets of each granularity
+GRANULARITY_SECONDS: dict[StatisticsGranularity, int] = {"minute": 60, "hour": 3600}
+
+
+def get_histogram_bucket(bounds: tuple[float, ...], value: float) -> int:
+    """Index of the histogram bucket a value falls into, len(bounds) above the last bound."""
+    return bisect.bisect_left(bounds, value)
+
 
 class StatisticsResult(BaseModel):
     """
     Example return value:
         {
-            "finance_hub": {
-                "total_reqs": "15",
-                "country:US": "10",
-                "country:GB": "5",
-                "bidder:pulsepoint:wins": "3",
-                "bidder:pulsepoint:revenue": "1.25",
-                "bidder:pulsepoint:no_bids": "5",
-                "bidder:pulsepoint:timeouts": "2",
-                "bidder:rubicon:wins": "2",
-                "bidder:rubicon:revenue": "0.80",
-                "bidder:rubicon:no_bids": "8",
-                "bidder:rubicon:timeouts": "1"
-            }
+            "supplies": {
+                "finance_hub": {
+                    "r": "15",
+                    "c1": "10",
+                    "c2": "5",
+                    "w3": "3",
+                    "v3": "1250000",
+                    "n3": "5",
+                    "t3": "2",
+                    "s3": "412000",
+                    "h3.9": "4",
+                    "h3.10": "1",
+                    "p3.19": "2",
+                    "p3.20": "1",
+                }
+            },
+            "names": {"1": "c:US", "2": "c:GB", "3": "b:pulsepoint"}
         }
+
+    Hashes not yet migrated may still hold legacy verbose fields
+    ("total_reqs", "country:US", "bidder:pulsepoint:revenue" with a decimal value, ...).
     """
 
     supplies: dict[str, dict[str, str]] = Field(
         description="Maps supply_id to Redis hash data (field_name -> string_value)",
     )
+    names: dict[str, str] = Field(
+        default_factory=dict,
+        description="Dictionary id -> namespaced country or bidder name, for the ids used in supplies",
+    )
+    version: int | None = Field(
+        default=None,
+        description="Statistics version the data is at least as new as, set for reads of changed supplies",
+    )
+    unique_ips: dict[str, int] = Field(
+        default_factory=dict,
+        description="Maps supply_id to its approximate number of distinct requester IPs",
+    )
+    unique_ips_per_country: dict[str, dict[str, int]] = Field(
+        default_factory=dict,
+        description="Maps supply_id to country -> approximate number of distinct requester IPs",
+    )
+
+
+class StatisticsFilter(BaseModel):
+    """Narrows a statistics read, None means no restriction."""
+
+    supply_ids: list[str] | None = None
+    bidder_ids: list[str] | None = None
+    countries: list[str] | None = Field(default=None, description="Only restricts reqs_per_country")
+    fields: set[StatisticsField] | None = None
+    since: int | None = Field(default=None, description="Only supplies changed after this statistics version")
+
+    @property
+    def is_projected(self) -> bool:
+        """Whether only part of each supply's counters is needed, so the hashes are filtered."""
+        return self.bidder_ids is not None or self.countries is not None or self.fields is not None
+
+
+class StatisticsRangeResult(StatisticsResult):
+    """Counters of all time buckets overlapping the requested range, summed per supply."""
+
+    start: datetime = Field(description="Start of the first bucket")
+    end: datetime = Field(description="End of the last bucket, exclusive")
+    granularity: StatisticsGranularity
+
+
+class StatisticsWriterMetrics(BaseModel):
+    queue_size: int = Field(description="Events currently waiting to be flushed")
+    max_queue_size: int = Field(description="Queue capacity")
+    enqueued: int = Field(description="Events accepted since startup")
+    dropped: int = Field(description="Events dropped because the queue was full or closed")
+    blocked: int = Field(description="Enqueues that had to wait for free queue space")
+    flushed_events: int = Field(description="Events written to Redis")
+    flushes: int = Field(description="Successful flushes")
+    failed_flushes: int = Field(description="Flushes that failed and were kept for a retry")
+    dropped_unique_ips: int = Field(description="Requester IPs of failed flushes not kept for the retry")
+    discarded_increments: int = Field(description="Field increments of flushes failing without a Redis error")
+
+
+class StatisticsStreamMetrics(BaseModel):
+    subscribers: int = Field(description="Open /stat/stream connections on this worker")
+    published: int = Field(description="Deltas this worker published")
+    broadcasts: int = Field(description="Delta events handed to this worker's subscribers")
+    lagged: int = Field(description="Subscribers cut off because their buffer was full")
@@ -1,8 +1,9 @@
+import ipaddress
 from functools import lru_cache
 from pathlib import Path
 from typing import Literal
 
-from pydantic import Field, BaseModel, PostgresDsn
+from pydantic import Field, BaseModel, PostgresDsn, field_validator
 from pydantic_settings import SettingsConfigDict, BaseSettings
 
 
@@ -46,17 +47,207 @@ class DBSettings(BaseModel):
             path=self.name,
         )
 
+    @property
+    def dsn(self) -> PostgresDsn:
+        # plain libpq-style DSN for raw asyncpg connections (LISTEN/NOTIFY)
+        return PostgresDsn.build(
+            scheme="postgresql",
+            host=self.host,
+            port=self.port,
+            username=self.user,
+            password=self.password,
+            path=self.name,
+        )
+
 
 class RedisSettings(BaseModel):
     startup_nodes: list[dict[str, str | int]] = [{"host": "localhost", "port": 6379}]
     default_ttl: int = 3600
 
 
+class CatalogSettings(BaseModel):
+    db_lookup: bool = Field(
+        default=False,
+        description="Resolve supplies and eligible bidders from the database on every auction instead of the "
+        "in-process catalog index",
+    )
+    listen: bool = Field(
+        default=True,
+        description="Keep the in-process catalog in sync via Postgres LISTEN/NOTIFY",
+    )
+    listen_debounce_ms: int = Field(default=50, ge=0, description="Window for coalescing catalog change bursts")
+    listen_reconnect_seconds: float = Field(default=5.0, gt=0, description="Delay before re-establishing LISTEN")
+
+
+class BidderClientSettings(BaseModel):
+    transport: Literal["simulated", "http"] = "simulated"
+    max_connections_per_bidder: int = Field(default=100, ge=1)
+    max_keepalive_connections_per_bidder: int = Field(default=20, ge=0)
+    keepalive_expiry_seconds: float = Field(default=30.0, gt=0)
+    connect_timeout_ms: int = Field(default=50, ge=1)
+
+
+class StatisticsSettings(BaseModel):
+    writer_enabled: bool = Field(
+        default=True,
+        description="Record statistics through the background batched writer instead of inline Redis calls",
+    )
+    queue_size: int = Field(default=10000, ge=1, description="Capacity of the in-process statistics event queue")
+    flush_interval_ms: int = Field(default=50, ge=1, description="Max time an event waits before being flushed")
+    flush_max_events: int = Field(default=1000, ge=1, description="Flush as soon as this many events are queued")
+    overflow_policy: Literal["drop", "block"] = Field(
+        default="drop",
+        description="What to do with new events while the queue is full",
+    )
+    buckets_enabled: bool = Field(
+        default=True,
+        description="Also count into per-minute and per-hour bucket hashes queried by /stat/range; minute buckets "
+        "are kept for redis.default_ttl",
+    )
+    hourly_bucket_ttl_seconds: int = Field(default=7 * 24 * 3600, ge=1, description="Retention of hourly buckets")
+    range_max_buckets: int = Field(default=1440, ge=1, description="Max buckets a single /stat/range query may read")
+    stat_cache_ttl_ms: int = Field(
+        default=1000,
+        ge=0,
+        description="How long a worker serves the same /stat body before reading Redis again; 0 rebuilds it on "
+        "every request (concurrent requests still share one read)",
+    )
+    unique_ips_enabled: bool = Field(
+        default=True,
+        description="Count distinct requester IPs per supply, country and time bucket in HyperLogLogs (about 12 KB "
+        "per key at most)",
+    )
+    stream_interval_ms: int = Field(
+        default=1000,
+        ge=10,
+        description="How often workers publish their statistics increments and /stat/stream emits a delta",
+    )
+    stream_buffer_size: int = Field(
+        default=16,
+        ge=1,
+        description="Deltas buffered per /stat/stream subscriber; a subscriber falling further behind is disconnected",
+    )
+    supply_shards: dict[str, int] = Field(
+        default_factory=dict,
+        description="Spread the counters of hot supplies over this many Redis hashes (supply_id -> shards); "
+        "reads merge the shards, so only list supplies whose single hash is a write hotspot. Lower a count to 1 "
+        "instead of removing the supply, its other shards are only folded back while it is listed",
+    )
+
+    @field_validator("supply_shards")
+    @classmethod
+    def validate_supply_shards(cls, supply_shards: dict[str, int]) -> dict[str, int]:
+        if any(shards < 1 for shards in supply_shards.values()):
+            raise ValueError("Statistics supply shard counts must be at least 1")
+        return supply_shards
+
+
+class RateLimitWindowSettings(BaseModel):
+    max_requests: int = Field(ge=1)
+    window_seconds: int = Field(ge=1)
+
+
+class RateLimitPolicySettings(BaseModel):
+    name: str = Field(description="Unique policy name, part of the Redis key")
+    cidrs: list[str] = Field(
+        default_factory=list,
+        description="IPv4/IPv6 ranges the policy applies to, the longest matching prefix wins. Empty matches any IP",
+    )
+    supply_ids: list[str] = Field(
+        default_factory=list,
+        description="Supplies the policy applies to, counted per supply. Empty matches any supply",
+    )
+    windows: list[RateLimitWindowSettings] = Field(
+        min_length=1,
+        description="All windows are enforced together, e.g. a per-second burst limit plus a per-minute limit",
+    )
+    ipv6_prefix_length: int = Field(
+        default=64,
+        ge=0,
+        le=128,
+        description="IPv6 clients are counted per prefix of this length",
+    )
+
+    @field_validator("cidrs")
+    @classmethod
+    def validate_cidrs(cls, cidrs: list[str]) -> list[str]:
+        return [str(ipaddress.ip_network(cidr, strict=False)) for cidr in cidrs]
+
+
+class RateLimitSettings(BaseModel):
+    algorithm: Literal["sliding_log", "sliding_window_counter", "gcra"] = Field(
+        default="sliding_log",
+        description="sliding_log is exact but keeps one entry per request; sliding_window_counter and gcra keep "
+        "constant memory per IP",
+    )
+    max_requests: int = Field(default=3, ge=1, description="Max requests per IP within the window")
+    window_seconds: int = Field(default=60, ge=1)
+    ipv6_prefix_length: int = Field(
+        default=64,
+        ge=0,
+        le=128,
+        description="IPv6 clients are counted per prefix of this length, a single host usually owns a whole /64",
+    )
+    policies: list[RateLimitPolicySettings] = Field(
+        default_factory=list,
+        description="Limits for specific IP ranges and/or supplies; requests matching none use the defaults above",
+    )
+
+    denied_cache_enabled: bool = Field(
+        default=True,
+        description="Reject IPs that are known to be over the limit from an in-process cache, without Redis",
+    )
+    denied_cache_max_entries: int = Field(default=100000, ge=1, description="Max IPs held in the denied cache")
+    failure_policy: Literal["fail_closed", "fail_open", "local"] = Field(
+        default="local",
+        description="How to answer while Redis is unavailable: deny everything, allow everything, or enforce the "
+        "limit with an in-process limiter per worker",
+    )
+    workers: int = Field(
+        default=1,
+        ge=1,
+        description="Number of worker processes serving traffic; the local fallback allows max_requests / workers",
+    )
+    fallback_max_entries: int = Field(default=100000, ge=1, description="Max IPs tracked by the local fallback")
+    breaker_failure_threshold: int = Field(
+        default=5,
+        ge=1,
+        description="Consecutive Redis failures after which the limiter stops calling Redis for a cooldown",
+    )
+    breaker_cooldown_seconds: float = Field(default=5.0, gt=0)
+
+    @field_validator("policies")
+    @classmethod
+    def validate_policy_names(cls, policies: list[RateLimitPolicySettings]) -> list[RateLimitPolicySettings]:
+        if len({policy.name for policy in policies}) != len(policies):
+            raise ValueError("Rate limit policy names must be unique")
+        return policies
+
+
+class SupplyLimitSettings(BaseModel):
+    enabled: bool = Field(default=True, description="Enforce the per-supply QPS caps configured on supply rows")
+    lease_seconds: float = Field(
+        default=0.1,
+        gt=0,
+        description="Each worker leases this many seconds worth of a supply's tokens from Redis at once",
+    )
+    lease_ttl_seconds: float = Field(
+        default=1.0,
+        gt=0,
+        description="Unspent leased tokens are dropped after this long, bounding how stale a local budget can get",
+    )
+
+
 class Settings(BaseSettings):
     general: GeneralSettings = Field(default_factory=GeneralSettings)
     fastapi: FastAPISettings = Field(default_factory=FastAPISettings)
     db: DBSettings = DBSettings()
     redis: RedisSettings = RedisSettings()
+    catalog: CatalogSettings = CatalogSettings()
+    bidder_client: BidderClientSettings = BidderClientSettings()
+    statistics: StatisticsSettings = StatisticsSettings()
+    rate_limit: RateLimitSettings = RateLimitSettings()
+    supply_limits: SupplyLimitSettings = SupplyLimitSettings()
 
     model_config = SettingsConfigDict(
         env_file=".env",
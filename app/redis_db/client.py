@@ -18,6 +18,7 @@ class RedisCache:
                 startup_nodes=[
                     AsyncClusterNode(host=node.get("host"), port=node.get("port")) for node in startup_nodes
                 ],
+                decode_responses=True,
             )
         else:
             logger.info("Start async redis without cluster. Redis node: %s", startup_nodes)
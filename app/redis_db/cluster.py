@@ -0,0 +1,59 @@
+import asyncio
+import itertools
+from collections.abc import Callable, Iterable
+from typing import Any
+
+import redis.asyncio as redis
+from redis.asyncio import RedisCluster
+from redis.asyncio.client import Pipeline
+
+
+def hash_tag(value: str) -> str:
+    """
+    Wrap a key part in a hash tag.
+
+    Redis Cluster only hashes the part between the first {...}, so all keys sharing
+    a tag land in the same slot and can be used together in one script call.
+    """
+    return f"{{{value}}}"
+
+
+def group_keys_by_node(redis_client: redis.Redis | RedisCluster, keys: Iterable[str]) -> list[list[str]]:
+    """Split keys into groups that live on the same node; a single group without a cluster."""
+    keys = list(keys)
+    if not isinstance(redis_client, RedisCluster):
+        return [keys] if keys else []
+
+    groups: dict[str, list[str]] = {}
+    for key in keys:
+        groups.setdefault(redis_client.get_node_from_key(key).name, []).append(key)
+    return list(groups.values())
+
+
+async def pipeline_by_node(
+    redis_client: redis.Redis | RedisCluster,
+    keys: Iterable[str],
+    queue: Callable[[Pipeline, str], Any],
+    batch_size: int = 1000,
+) -> dict[str, Any]:
+    """
+    Run one command per key, pipelined per node.
+
+    Every node gets its own pipelines of at most batch_size commands, so each one is a
+    single round trip to a single node; nodes are queried concurrently. Returns the
+    result of every key's command.
+    """
+
+    async def run_group(group: list[str]) -> dict[str, Any]:
+        results: dict[str, Any] = {}
+        for batch in itertools.batched(group, batch_size, strict=False):
+            pipe = redis_client.pipeline(transaction=False)
+            for key in batch:
+                queue(pipe, key)
+            results.update(zip(batch, await pipe.execute(), strict=True))
+        return results
+
+    merged: dict[str, Any] = {}
+    for results in await asyncio.gather(*(run_group(group) for group in group_keys_by_node(redis_client, keys))):
+        merged.update(results)
+    return merged
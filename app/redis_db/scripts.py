@@ -0,0 +1,43 @@
+import hashlib
+from typing import Any
+
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import NoScriptError
+
+
+class LuaScript:
+    """
+    Server-side Lua script loaded once via SCRIPT LOAD and invoked via EVALSHA.
+
+    Unlike redis-py's registered scripts, queueing into a pipeline doesn't add a
+    SCRIPT EXISTS round trip to every execute; a NOSCRIPT error (Redis restart or
+    SCRIPT FLUSH) is handled by reloading and retrying.
+    """
+
+    def __init__(self, redis_client: redis.Redis, source: str) -> None:
+        self.redis = redis_client
+        self.source = source
+        self.sha = hashlib.sha1(source.encode()).hexdigest()
+        self._loaded = False
+
+    async def load(self) -> None:
+        self.sha = await self.redis.script_load(self.source)
+        self._loaded = True
+
+    async def ensure_loaded(self) -> None:
+        if not self._loaded:
+            await self.load()
+
+    async def __call__(self, keys: list[str], args: list[Any]) -> Any:
+        await self.ensure_loaded()
+
+        try:
+            return await self.redis.evalsha(self.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            await self.load()
+            return await self.redis.evalsha(self.sha, len(keys), *keys, *args)
+
+    def queue(self, pipe: Pipeline, keys: list[str], args: list[Any]) -> None:
+        """Queue an EVALSHA into a pipeline; call ensure_loaded() before executing it."""
+        pipe.evalsha(self.sha, len(keys), *keys, *args)
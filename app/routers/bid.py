@@ -1,15 +1,21 @@
 import logging
+import math
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.builders.api.bidding import BiddingResponseBuilder
+from app.clients.bidder.factory import bidder_client
+from app.config.settings import settings
 from app.db.session import get_db_session
 from app.dependencies.rate_limit import check_rate_limit
 from app.models.api.request.bid import BidRequest
 from app.models.api.response.bid import BidResponse
 from app.services.bidding import BiddingService
+from app.services.catalog import catalog_service
 from app.services.statistics import statistics_service
+from app.services.statistics_writer import statistics_writer
+from app.services.supply_admission import SupplyRateLimitExceededError, supply_admission
 
 logger = logging.getLogger(__name__)
 
@@ -42,11 +48,11 @@ router = APIRouter(tags=["bid"])
             },
         },
         429: {
-            "description": "Rate limit exceeded",
+            "description": "Per-IP rate limit or the supply's QPS cap exceeded",
             "content": {
                 "application/json": {
                     "example": {
-                        "detail": "Rate limit exceeded. Maximum 3 requests per minute per IP address."
+                        "detail": "Rate limit exceeded. Maximum 3 requests per 60 seconds per IP address."
                     }
                 }
             },
@@ -62,11 +68,24 @@ async def bid(
         f"{request.country=}, {request.tmax=}ms"
     )
 
-    bidding_service = BiddingService(session, statistics_service)
+    bidding_service = BiddingService(
+        session,
+        statistics_writer if settings.statistics.writer_enabled else statistics_service,
+        catalog_service=None if settings.catalog.db_lookup else catalog_service,
+        bidder_client=bidder_client,
+        supply_admission=supply_admission if settings.supply_limits.enabled else None,
+    )
 
     try:
-        result = await bidding_service.run_auction(request.supply_id, request.country, request.tmax)
+        result = await bidding_service.run_auction(request.supply_id, request.country, request.tmax, ip=request.ip)
         return BiddingResponseBuilder.build(auction_result=result)
+    except SupplyRateLimitExceededError as e:
+        logger.warning(f"Auction rejected: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        ) from e
     except ValueError as e:
         logger.error(f"Auction failed: {str(e)}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -0,0 +1,39 @@
+import logging
+
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+
+from app.builders.api.metrics import MetricsResponseBuilder
+from app.config.settings import settings
+from app.services.rate_limiter import rate_limiter
+from app.services.response_cache import stat_response_cache
+from app.services.statistics import statistics_service
+from app.services.statistics_stream import statistics_stream
+from app.services.statistics_writer import statistics_writer
+
+router = APIRouter(tags=["metrics"])
+
+logger = logging.getLogger(__name__)
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Get bidder latency metrics",
+    description="Per supply and bidder response latency histograms and their p50/p90/p99, plus the metrics of the "
+    "answering worker's statistics writer, /stat response cache, /stat/stream and denied IP cache, in the "
+    "Prometheus text exposition format",
+)
+async def get_metrics() -> PlainTextResponse:
+    statistics_result = await statistics_service.get_all_statistics()
+    return PlainTextResponse(
+        MetricsResponseBuilder.build(
+            statistics_result,
+            writer_metrics=statistics_writer.metrics if settings.statistics.writer_enabled else None,
+            response_cache_metrics=stat_response_cache.metrics,
+            stream_metrics=statistics_stream.metrics,
+            denied_ip_cache_metrics=rate_limiter.denied_cache.metrics if rate_limiter.denied_cache else None,
+        ),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -1,42 +1,239 @@
 import logging
+from datetime import UTC, datetime
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 
-from app.builders.api.statistics import StatisticsResponseBuilder
-from app.models.api.response.statistics import StatisticsResponse
+from app.builders.api.statistics import (
+    StatisticsChangesResponseBuilder,
+    StatisticsRangeResponseBuilder,
+    StatisticsResponseBuilder,
+)
+from app.models.api.response.statistics import (
+    StatisticsChangesResponse,
+    StatisticsRangeResponse,
+    StatisticsResponse,
+)
+from app.models.services.statistics import StatisticsField, StatisticsFilter, StatisticsGranularity
+from app.services.response_cache import etag_matches, get_etag, stat_response_cache
 from app.services.statistics import statistics_service
+from app.services.statistics_stream import statistics_stream
 
 router = APIRouter(tags=["bid"])
 
 logger = logging.getLogger(__name__)
 
+statistics_adapter = TypeAdapter(dict[str, StatisticsResponse])
+
+
+async def build_statistics_body() -> bytes:
+    statistics_result = await statistics_service.get_all_statistics()
+    return statistics_adapter.dump_json(StatisticsResponseBuilder.build(statistics_result), exclude_unset=True)
+
+
+def get_conditional_response(body: bytes, etag: str, if_none_match: str | None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 
 @router.get(
     "/stat",
-    response_model=dict[str, StatisticsResponse],
+    # the plain statistics, or only the changed supplies with since
+    response_model=dict[str, StatisticsResponse] | StatisticsChangesResponse,
     status_code=status.HTTP_200_OK,
     summary="Get auction statistics",
-    description="Returns overall service statistics such as total requests, bidder wins, and revenue grouped per supply",
+    description="Returns overall service statistics such as total requests, bidder wins, and revenue grouped per "
+    "supply. Each worker reuses the body for STATISTICS__STAT_CACHE_TTL_MS; send the ETag back in If-None-Match to "
+    "get a 304 while it hasn't changed. Filters are applied in Redis, filtered responses aren't cached. With since, "
+    "returns {version, supplies} with only the supplies changed after that version; start with since=0 and pass the "
+    "returned version next time",
     responses={
         200: {
             "description": "Statistics retrieved successfully",
             "content": {
                 "application/json": {
-                    "example": {
-                        "supply1": {
-                            "total_reqs": 10,
-                            "reqs_per_country": {"US": 5, "GB": 5},
-                            "bidders": {
-                                "bidder1": {"wins": 2, "total_revenue": 0.4, "no_bids": 3},
-                                "bidder2": {"wins": 3, "total_revenue": 0.7, "no_bids": 1},
+                    "examples": {
+                        "statistics": {
+                            "summary": "Without since",
+                            "value": {
+                                "supply1": {
+                                    "total_reqs": 10,
+                                    "reqs_per_country": {"US": 5, "GB": 5},
+                                    "bidders": {
+                                        "bidder1": {"wins": 2, "total_revenue": 0.4, "no_bids": 3},
+                                        "bidder2": {"wins": 3, "total_revenue": 0.7, "no_bids": 1},
+                                    },
+                                }
                             },
-                        }
+                        },
+                        "since": {
+                            "summary": "With since",
+                            "value": {"version": 42, "supplies": {"supply1": {"total_reqs": 11}}},
+                        },
                     }
                 }
             },
+        },
+        304: {"description": "Statistics haven't changed since the ETag in If-None-Match"},
+    },
+)
+async def get_statistics(
+    supply: list[str] | None = Query(default=None, description="Only these supplies, repeat for several"),
+    bidder: list[str] | None = Query(default=None, description="Only these bidders, repeat for several"),
+    country: list[str] | None = Query(default=None, description="Only these countries in reqs_per_country"),
+    fields: list[StatisticsField] | None = Query(default=None, description="Only these response fields"),
+    since: int | None = Query(default=None, ge=0, description="Only supplies changed after this version"),
+    if_none_match: str | None = Header(default=None),
+) -> Response:
+    statistics_filter = StatisticsFilter(
+        supply_ids=supply,
+        bidder_ids=bidder,
+        countries=country,
+        fields=fields,
+        since=since,
+    )
+
+    if since is not None:
+        statistics_result = await statistics_service.get_statistics(statistics_filter)
+        response = StatisticsChangesResponseBuilder.build(statistics_result, since, statistics_filter.fields)
+        body = response.model_dump_json(exclude_unset=True).encode()
+        return get_conditional_response(body, get_etag(body), if_none_match)
+
+    if statistics_filter == StatisticsFilter():
+        # the body is serialized once per refresh and returned as is, without response_model validation
+        cached = await stat_response_cache.get("stat", build_statistics_body)
+        return get_conditional_response(cached.body, cached.etag, if_none_match)
+
+    statistics_result = await statistics_service.get_statistics(statistics_filter)
+    response = StatisticsResponseBuilder.build(statistics_result, statistics_filter.fields)
+    body = statistics_adapter.dump_json(response, exclude_unset=True)
+    return get_conditional_response(body, get_etag(body), if_none_match)
+
+
+@router.get(
+    "/stat/range",
+    response_model=StatisticsRangeResponse,
+    response_model_exclude_unset=True,
+    status_code=status.HTTP_200_OK,
+    summary="Get auction statistics for a time range",
+    description="Sums per-minute or per-hour statistics buckets between from and to (widened to whole buckets). "
+    "Minute buckets are kept for REDIS__DEFAULT_TTL, hour buckets for STATISTICS__HOURLY_BUCKET_TTL_SECONDS",
+    responses={
+        200: {
+            "description": "Statistics retrieved successfully",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "start": "2026-10-17T14:00:00Z",
+                        "end": "2026-10-17T14:05:00Z",
+                        "granularity": "minute",
+                        "supplies": {
+                            "supply1": {
+                                "total_reqs": 10,
+                                "reqs_per_country": {"US": 5, "GB": 5},
+                                "bidders": {
+                                    "bidder1": {"wins": 2, "total_revenue": 0.4, "no_bids": 3, "timeouts": 0},
+                                },
+                            }
+                        },
+                    }
+                }
+            },
+        },
+        400: {
+            "description": "Empty range or more buckets than STATISTICS__RANGE_MAX_BUCKETS",
+            "content": {"application/json": {"example": {"detail": "Range end must be after its start"}}},
+        },
+    },
+)
+async def get_range_statistics(
+    start: datetime = Query(alias="from", description="Range start, ISO 8601 or unix seconds; naive means UTC"),
+    end: datetime | None = Query(default=None, alias="to", description="Range end (exclusive), defaults to now"),
+    granularity: StatisticsGranularity = "minute",
+) -> StatisticsRangeResponse:
+    try:
+        statistics_result = await statistics_service.get_range_statistics(start, end or datetime.now(UTC), granularity)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+
+    return StatisticsRangeResponseBuilder.build(statistics_result)
+
+
+@router.get(
+    "/stat/stream",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Stream live auction statistics",
+    description="Server-sent events with the statistics increments of all workers, one delta event per "
+    "STATISTICS__STREAM_INTERVAL_MS with traffic. Revenue is in micro-units. A subscriber falling more than "
+    "STATISTICS__STREAM_BUFFER_SIZE events behind gets a lagged event and is disconnected",
+    responses={
+        200: {
+            "description": "Event stream opened",
+            "content": {
+                "text/event-stream": {
+                    "example": 'event: delta\ndata: {"supply1":{"total_reqs":3,"country:US":3,'
+                    '"bidder:bidder1:wins":1,"bidder:bidder1:revenue":450000}}\n\n'
+                }
+            },
         }
     },
 )
-async def get_statistics() -> dict[str, StatisticsResponse]:
-    statistics_result = await statistics_service.get_all_statistics()
-    return StatisticsResponseBuilder.build(statistics_result)
+async def stream_statistics() -> StreamingResponse:
+    return StreamingResponse(
+        statistics_stream.subscribe(),
+        media_type="text/event-stream",
+        # no proxy buffering, events have to go out as they come
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/stat/supply/{supply_id}",
+    response_model=StatisticsResponse,
+    response_model_exclude_unset=True,
+    status_code=status.HTTP_200_OK,
+    summary="Get auction statistics of a supply",
+    description="Statistics of a single supply, read without touching the other supplies. Takes the same filters as "
+    "/stat",
+    responses={
+        200: {
+            "description": "Statistics retrieved successfully",
+            "content": {
+                "application/json": {
+                    "example": {"total_reqs": 10, "bidders": {"bidder1": {"wins": 2, "total_revenue": 0.4}}},
+                }
+            },
+        },
+        304: {"description": "Statistics haven't changed since the ETag in If-None-Match"},
+        404: {
+            "description": "No statistics (matching the filters) for the supply",
+            "content": {"application/json": {"example": {"detail": "No statistics for supply supply1"}}},
+        },
+    },
+)
+async def get_supply_statistics(
+    supply_id: str,
+    bidder: list[str] | None = Query(default=None, description="Only these bidders, repeat for several"),
+    country: list[str] | None = Query(default=None, description="Only these countries in reqs_per_country"),
+    fields: list[StatisticsField] | None = Query(default=None, description="Only these response fields"),
+    if_none_match: str | None = Header(default=None),
+) -> Response:
+    statistics_filter = StatisticsFilter(
+        supply_ids=[supply_id],
+        bidder_ids=bidder,
+        countries=country,
+        fields=fields,
+    )
+    statistics_result = await statistics_service.get_statistics(statistics_filter)
+    response = StatisticsResponseBuilder.build(statistics_result, statistics_filter.fields).get(supply_id)
+
+    if response is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No statistics for supply {supply_id}")
+
+    body = response.model_dump_json(exclude_unset=True).encode()
+    return get_conditional_response(body, get_etag(body), if_none_match)
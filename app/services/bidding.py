@@ -1,81 +1,195 @@
 import asyncio
 import logging
-import random
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.clients.bidder.base import BidderClient, BidderTimeoutError
+from app.clients.bidder.simulated import SimulatedBidderClient
 from app.db.dao.bidder import bidder_dao
 from app.db.dao.supply import supply_dao
+from app.models.clients.bidder import BidderRequest
 from app.models.services.bidding import AuctionResult
+from app.models.services.catalog import BidderInfo, SupplyLimit
+from app.services.catalog import CatalogService
 from app.services.statistics import StatisticsService
+from app.services.statistics_writer import StatisticsWriter
+from app.services.supply_admission import SupplyAdmission
 
 logger = logging.getLogger(__name__)
 
 
 class BiddingService:
-    NO_BID_PROBABILITY = 0.3
-    MIN_BID_PRICE = 0.01
-    MAX_BID_PRICE = 1.00
-
-    def __init__(self, session: AsyncSession, statistics_service: StatisticsService):
+    def __init__(
+        self,
+        session: AsyncSession,
+        statistics_service: StatisticsService | StatisticsWriter,
+        catalog_service: CatalogService | None = None,
+        bidder_client: BidderClient | None = None,
+        supply_admission: SupplyAdmission | None = None,
+    ):
         self.session = session
         self.statistics_service = statistics_service
+        # without a catalog every lookup goes to the database
+        self.catalog_service = catalog_service
+        self.bidder_client = bidder_client or SimulatedBidderClient()
+        # without it supply QPS caps aren't enforced
+        self.supply_admission = supply_admission
 
-    async def run_auction(self, supply_id: str, country: str, tmax: int = 200) -> AuctionResult:
-        if not await supply_dao.get(
-            session=self.session,
-            supply_id=supply_id
-        ):
-            raise ValueError(f"Supply {supply_id} not found")
+    async def _supply_exists(self, supply_id: str) -> bool:
+        if self.catalog_service is not None:
+            return self.catalog_service.supply_exists(supply_id)
 
-        await self.statistics_service.record_request(supply_id, country)
+        return await supply_dao.get(session=self.session, supply_id=supply_id) is not None
 
-        if not (
-            eligible_bidders := await bidder_dao.get_eligible_for_supply(
-                session=self.session,
-                supply_id=supply_id,
-                country=country,
-            )
-        ):
-            raise ValueError(f"No eligible bidders found for country {country}")
+    async def _get_supply_limit(self, supply_id: str) -> SupplyLimit | None:
+        if self.catalog_service is not None:
+            return self.catalog_service.get_supply_limit(supply_id)
 
-        logger.info(f"Auction for {supply_id} (country={country}, tmax={tmax}ms):")
+        if (supply := await supply_dao.get(session=self.session, supply_id=supply_id)) is None:
+            return None
+        return SupplyLimit.from_config(supply.qps_limit, supply.qps_burst)
+
+    async def _get_eligible_bidders(self, supply_id: str, country: str) -> list[BidderInfo]:
+        if self.catalog_service is not None:
+            return self.catalog_service.get_eligible_bidders(supply_id, country)
+
+        eligible_bidders = await bidder_dao.get_eligible_for_supply(
+            session=self.session,
+            supply_id=supply_id,
+            country=country,
+        )
+        return [
+            BidderInfo(id=bidder.id, country=bidder.country, endpoint=bidder.endpoint, timeout_ms=bidder.timeout_ms)
+            for bidder in eligible_bidders
+        ]
+
+    async def _request_bid(
+        self,
+        bidder: BidderInfo,
+        bid_request: BidderRequest,
+        deadline: float,
+        latencies_ms: dict[str, float],
+    ) -> float | None:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        # whatever is left of tmax, optionally capped further by the bidder's own timeout
+        timeout = deadline - started
+        if bidder.timeout_ms is not None:
+            timeout = min(timeout, bidder.timeout_ms / 1000)
+
+        timed_out = False
+        try:
+            return await self.bidder_client.request_bid(bidder, bid_request, timeout)
+        except BidderTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            # also runs when the request is cancelled at the deadline
+            latency = loop.time() - started
+            if timed_out:
+                # a client may give up before the timeout (the simulated one knows upfront the answer would be
+                # late, HTTP doesn't even try past the deadline), the bidder was still cut off at the timeout
+                latency = max(latency, timeout)
+            latencies_ms[bidder.id] = latency * 1000
+
+    async def _collect_bids(
+        self,
+        bidders: list[BidderInfo],
+        bid_request: BidderRequest,
+    ) -> tuple[dict[str, float], list[str], list[str], dict[str, float]]:
+        """
+        Fan out to all bidders concurrently under a single tmax deadline.
+
+        Returns as soon as every bidder has answered; bidders still pending when
+        the deadline expires are cancelled and counted as timeouts. Also returns the
+        response latency of every bid, no-bid and timeout (a timeout's latency is when
+        it was cut off); failed requests have none.
+        """
+        tmax = bid_request.tmax
+        deadline = asyncio.get_running_loop().time() + tmax / 1000
+        latencies_ms: dict[str, float] = {}
+
+        tasks = {
+            asyncio.create_task(self._request_bid(bidder, bid_request, deadline, latencies_ms)): bidder.id
+            for bidder in bidders
+        }
+        done, pending = await asyncio.wait(tasks, timeout=tmax / 1000)
+
+        for task in pending:
+            task.cancel()
 
         bids: dict[str, float] = {}
         no_bid_ids: list[str] = []
         timeout_ids: list[str] = []
 
-        for bidder in eligible_bidders:
-            # simulate latency (0 to 1.5x tmax)
-            latency_ms = random.randint(0, int(tmax * 1.5))
-
-            if latency_ms > tmax:
-                logger.info(f"{bidder.id} - timeout (latency: {latency_ms}ms > tmax: {tmax}ms)")
-                timeout_ids.append(bidder.id)
+        # iterate in bidder order to keep stats and logs deterministic
+        for task, bidder_id in tasks.items():
+            if task in pending:
+                logger.info(f"{bidder_id} - timeout (no response within tmax: {tmax}ms)")
+                timeout_ids.append(bidder_id)
                 continue
 
-            # simulate delay
-            if latency_ms > 0:
-                await asyncio.sleep(latency_ms / 1000)
+            if isinstance(exc := task.exception(), BidderTimeoutError):
+                timeout_ids.append(bidder_id)
+                continue
+            elif exc is not None:
+                logger.error(f"{bidder_id} - bid request failed: {exc}")
+                no_bid_ids.append(bidder_id)
+                latencies_ms.pop(bidder_id, None)
+                continue
 
-            if random.random() < self.NO_BID_PROBABILITY:
-                logger.info(f"{bidder.id} - no bid")
-                no_bid_ids.append(bidder.id)
+            if (bid_price := task.result()) is None:
+                logger.info(f"{bidder_id} - no bid")
+                no_bid_ids.append(bidder_id)
                 continue
 
-            bids[bidder.id] = (
-                bid_price := round(random.uniform(self.MIN_BID_PRICE, self.MAX_BID_PRICE), 2)
+            bids[bidder_id] = bid_price
+            logger.info(f"{bidder_id} - price {bid_price:.2f}")
+
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        return bids, no_bid_ids, timeout_ids, latencies_ms
+
+    async def run_auction(self, supply_id: str, country: str, tmax: int = 200, ip: str | None = None) -> AuctionResult:
+        if not await self._supply_exists(supply_id):
+            raise ValueError(f"Supply {supply_id} not found")
+
+        if self.supply_admission is not None and (supply_limit := await self._get_supply_limit(supply_id)):
+            # raises before any bidder is called or anything is recorded
+            await self.supply_admission.admit(supply_id, supply_limit)
+
+        if not (eligible_bidders := await self._get_eligible_bidders(supply_id, country)):
+            # still counts as a request for the supply
+            await self.statistics_service.record_auction(
+                supply_id=supply_id,
+                country=country,
+                winner_id=None,
+                winning_price=0.0,
+                no_bid_ids=[],
+                timeout_ids=[],
+                ip=ip,
             )
-            logger.info(f"{bidder.id} - price {bid_price:.2f}")
+            raise ValueError(f"No eligible bidders found for country {country}")
+
+        logger.info(f"Auction for {supply_id} (country={country}, tmax={tmax}ms):")
+
+        bids, no_bid_ids, timeout_ids, latencies_ms = await self._collect_bids(
+            eligible_bidders,
+            BidderRequest(supply_id=supply_id, country=country, tmax=tmax),
+        )
 
         if not bids.keys():
             logger.warning(f"All bidders skipped for supply {supply_id} (no_bids={len(no_bid_ids)}, timeouts={len(timeout_ids)})")
-            await self.statistics_service.record_auction_result(
+            await self.statistics_service.record_auction(
                 supply_id=supply_id,
+                country=country,
                 winner_id=None,
                 winning_price=0.0,
                 no_bid_ids=no_bid_ids,
                 timeout_ids=timeout_ids,
+                latencies_ms=latencies_ms,
+                ip=ip,
             )
             raise ValueError("No bids received - all bidders skipped or timed out")
 
@@ -84,12 +198,15 @@ class BiddingService:
 
         logger.info(f"Winner: {winner_id} ({winning_price:.2f})")
 
-        await self.statistics_service.record_auction_result(
+        await self.statistics_service.record_auction(
             supply_id=supply_id,
+            country=country,
             winner_id=winner_id,
             winning_price=winning_price,
             no_bid_ids=no_bid_ids,
             timeout_ids=timeout_ids,
+            latencies_ms=latencies_ms,
+            ip=ip,
         )
 
         return AuctionResult(winner=winner_id, price=winning_price)
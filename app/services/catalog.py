@@ -0,0 +1,169 @@
+import logging
+from collections import defaultdict
+from collections.abc import Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.dao.bidder import bidder_dao
+from app.db.dao.supply import supply_dao
+from app.models.services.catalog import BidderInfo, CatalogChange, CatalogSnapshot, SupplyLimit
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogService:
+    """
+    In-process index of supplies and their eligible bidders.
+
+    The snapshot is never mutated; refreshes build a new one and swap the reference,
+    so readers on the hot path always see a consistent catalog without locking.
+    """
+
+    def __init__(self) -> None:
+        self._snapshot = CatalogSnapshot()
+        # called with every new snapshot, e.g. to release resources of removed bidders
+        self._subscribers: list[Callable[[CatalogSnapshot], None]] = []
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        return self._snapshot
+
+    def subscribe(self, subscriber: Callable[[CatalogSnapshot], None]) -> None:
+        self._subscribers.append(subscriber)
+
+    def _set_snapshot(self, snapshot: CatalogSnapshot) -> None:
+        self._snapshot = snapshot
+
+        for subscriber in self._subscribers:
+            try:
+                subscriber(snapshot)
+            except Exception as e:
+                logger.error(f"Catalog subscriber failed: {e}", exc_info=True)
+
+    @staticmethod
+    def build_snapshot(
+        supply_bidders: dict[str, tuple[str, ...]],
+        bidders: dict[str, BidderInfo],
+        supply_limits: dict[str, SupplyLimit] | None = None,
+    ) -> CatalogSnapshot:
+        eligible_bidders: dict[tuple[str, str], list[str]] = defaultdict(list)
+
+        for supply_id, bidder_ids in supply_bidders.items():
+            for bidder_id in bidder_ids:
+                if (bidder := bidders.get(bidder_id)) is not None:
+                    eligible_bidders[(supply_id, bidder.country)].append(bidder_id)
+
+        return CatalogSnapshot(
+            supplies=frozenset(supply_bidders),
+            bidders=bidders,
+            supply_bidders=supply_bidders,
+            eligible_bidders={key: tuple(bidder_ids) for key, bidder_ids in eligible_bidders.items()},
+            supply_limits={
+                supply_id: limit for supply_id, limit in (supply_limits or {}).items() if supply_id in supply_bidders
+            },
+        )
+
+    async def refresh(self, session: AsyncSession) -> CatalogSnapshot:
+        supply_bidders: dict[str, list[str]] = {}
+        for supply_id, bidder_id in await supply_dao.get_bidder_links(session):
+            bidders = supply_bidders.setdefault(supply_id, [])
+            if bidder_id is not None:
+                bidders.append(bidder_id)
+
+        bidders = {
+            bidder_id: BidderInfo(id=bidder_id, country=country, endpoint=endpoint, timeout_ms=timeout_ms)
+            for bidder_id, country, endpoint, timeout_ms in await bidder_dao.get_catalog_rows(session)
+        }
+
+        supply_limits = {
+            supply_id: SupplyLimit.from_config(qps_limit, qps_burst)
+            for supply_id, qps_limit, qps_burst in await supply_dao.get_qps_limits(session)
+        }
+
+        self._set_snapshot(
+            self.build_snapshot(
+                supply_bidders={
+                    supply_id: tuple(sorted(bidder_ids)) for supply_id, bidder_ids in supply_bidders.items()
+                },
+                bidders=bidders,
+                supply_limits=supply_limits,
+            )
+        )
+
+        logger.info(
+            f"Catalog refreshed: {len(self._snapshot.supplies)} supplies, {len(self._snapshot.bidders)} bidders"
+        )
+
+        return self._snapshot
+
+    def apply_changes(self, changes: list[CatalogChange]) -> CatalogSnapshot:
+        """
+        Apply row-level changes on top of the current snapshot without touching the database.
+
+        Raises ValueError for changes that can't be applied incrementally (e.g. TRUNCATE),
+        the caller is expected to fall back to a full refresh.
+        """
+        supply_bidders = {supply_id: set(bidder_ids) for supply_id, bidder_ids in self._snapshot.supply_bidders.items()}
+        bidders = dict(self._snapshot.bidders)
+        supply_limits = dict(self._snapshot.supply_limits)
+
+        for change in changes:
+            if change.op == "TRUNCATE":
+                raise ValueError(f"Can't apply {change.op} on {change.table} incrementally")
+
+            if change.table == "supplies":
+                if change.old is not None:
+                    bidder_ids = supply_bidders.pop(change.old["id"], set())
+                    supply_limits.pop(change.old["id"], None)
+                    if change.new is not None:
+                        # a renamed supply keeps its links (FK updates emit no separate change)
+                        supply_bidders.setdefault(change.new["id"], set()).update(bidder_ids)
+                elif change.new is not None:
+                    supply_bidders.setdefault(change.new["id"], set())
+
+                if change.new is not None and (
+                    limit := SupplyLimit.from_config(change.new.get("qps_limit"), change.new.get("qps_burst"))
+                ):
+                    supply_limits[change.new["id"]] = limit
+
+            elif change.table == "bidders":
+                if change.old is not None:
+                    bidders.pop(change.old["id"], None)
+                if change.new is not None:
+                    bidders[change.new["id"]] = BidderInfo.model_validate(change.new)
+
+            elif change.table == "supply_bidder":
+                if change.old is not None:
+                    supply_bidders.get(change.old["supply_id"], set()).discard(change.old["bidder_id"])
+                if change.new is not None:
+                    supply_bidders.setdefault(change.new["supply_id"], set()).add(change.new["bidder_id"])
+
+        self._set_snapshot(
+            self.build_snapshot(
+                supply_bidders={
+                    supply_id: tuple(sorted(bidder_ids)) for supply_id, bidder_ids in supply_bidders.items()
+                },
+                bidders=bidders,
+                supply_limits=supply_limits,
+            )
+        )
+
+        logger.info(f"Catalog updated with {len(changes)} change(s)")
+
+        return self._snapshot
+
+    def supply_exists(self, supply_id: str) -> bool:
+        return supply_id in self._snapshot.supplies
+
+    def get_supply_limit(self, supply_id: str) -> SupplyLimit | None:
+        return self._snapshot.supply_limits.get(supply_id)
+
+    def get_eligible_bidder_ids(self, supply_id: str, country: str) -> tuple[str, ...]:
+        return self._snapshot.eligible_bidders.get((supply_id, country), ())
+
+    def get_eligible_bidders(self, supply_id: str, country: str) -> list[BidderInfo]:
+        snapshot = self._snapshot
+        return [snapshot.bidders[bidder_id] for bidder_id in snapshot.eligible_bidders.get((supply_id, country), ())]
+
+
+catalog_service = CatalogService()
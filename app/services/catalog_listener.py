@@ -0,0 +1,125 @@
+import asyncio
+import contextlib
+import logging
+
+import asyncpg
+from pydantic import ValidationError
+
+from app.config.settings import settings
+from app.db.session import session_factory
+from app.models.services.catalog import CatalogChange
+from app.services.catalog import CatalogService, catalog_service
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogListener:
+    """
+    Keeps the in-process catalog in sync with Postgres via LISTEN/NOTIFY.
+
+    Triggers on the catalog tables publish row-level changes on CHANNEL; bursts of
+    notifications (e.g. a whole load-data transaction) are coalesced for debounce_ms
+    and applied to the catalog in one go.
+    """
+
+    CHANNEL = "catalog_changes"
+
+    def __init__(
+        self,
+        catalog_service: CatalogService,
+        dsn: str,
+        debounce_ms: int = 50,
+        reconnect_delay: float = 5.0,
+    ) -> None:
+        self.catalog_service = catalog_service
+        self.dsn = dsn
+        self.debounce = debounce_ms / 1000
+        self.reconnect_delay = reconnect_delay
+        # None is the "connection lost" sentinel
+        self._queue: asyncio.Queue[str | None] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="catalog-listener")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    def _on_notify(self, connection: asyncpg.Connection, pid: int, channel: str, payload: str) -> None:
+        self._queue.put_nowait(payload)
+
+    def _on_terminate(self, connection: asyncpg.Connection) -> None:
+        self._queue.put_nowait(None)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Catalog listener failed, reconnecting in {self.reconnect_delay}s: {e}", exc_info=True)
+
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen(self) -> None:
+        connection = await asyncpg.connect(self.dsn)
+
+        try:
+            connection.add_termination_listener(self._on_terminate)
+            await connection.add_listener(self.CHANNEL, self._on_notify)
+            logger.info(f"Listening for catalog changes on {self.CHANNEL}")
+
+            # anything committed while we weren't listening is only visible via a full reload
+            self._drain()
+            await self._full_refresh()
+
+            while True:
+                payloads = [await self._queue.get()]
+                await asyncio.sleep(self.debounce)
+                payloads.extend(self._drain())
+
+                connection_lost = None in payloads
+                await self._apply([payload for payload in payloads if payload is not None])
+
+                if connection_lost:
+                    raise ConnectionError("Catalog listener connection lost")
+        finally:
+            if not connection.is_closed():
+                await connection.close()
+
+    def _drain(self) -> list[str | None]:
+        payloads = []
+        while not self._queue.empty():
+            payloads.append(self._queue.get_nowait())
+        return payloads
+
+    async def _apply(self, payloads: list[str]) -> None:
+        if not payloads:
+            return
+
+        try:
+            changes = [CatalogChange.model_validate_json(payload) for payload in payloads]
+            self.catalog_service.apply_changes(changes)
+        except (ValidationError, ValueError) as e:
+            logger.info(f"Falling back to a full catalog refresh: {e}")
+            await self._full_refresh()
+
+    async def _full_refresh(self) -> None:
+        async with session_factory() as session:
+            await self.catalog_service.refresh(session)
+
+
+catalog_listener = CatalogListener(
+    catalog_service=catalog_service,
+    dsn=str(settings.db.dsn),
+    debounce_ms=settings.catalog.listen_debounce_ms,
+    reconnect_delay=settings.catalog.listen_reconnect_seconds,
+)
@@ -0,0 +1,65 @@
+import logging
+import time
+from typing import Literal
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for a cooldown period.
+
+    Opens after failure_threshold consecutive failures. Once the cooldown has
+    passed a single trial call is let through (half-open): success closes the
+    breaker again, failure re-opens it for another cooldown.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown_seconds: float = 5.0) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown_seconds
+
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> Literal["closed", "open", "half_open"]:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def allow_request(self) -> bool:
+        match self.state:
+            case "closed":
+                return True
+            case "open":
+                return False
+            case "half_open":
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+                return True
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info(f"Circuit breaker {self.name} closed")
+
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+
+        if self._trial_in_flight or (self._opened_at is None and self._failures >= self.failure_threshold):
+            logger.warning(f"Circuit breaker {self.name} opened for {self.cooldown}s after {self._failures} failure(s)")
+            self._opened_at = time.monotonic()
+
+        self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Give back a call let through without an outcome (e.g. cancelled), so a new trial can start."""
+        self._trial_in_flight = False
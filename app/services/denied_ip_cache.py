@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+
+from app.models.services.rate_limit import DeniedIpCacheMetrics, RateLimitResult
+
+
+class DeniedIpCache:
+    """
+    Bounded in-process cache of clients known to be rate limited until a given moment.
+
+    Lets repeated requests from a client that is already over its limit be rejected
+    without a Redis round trip. Entries are keyed by rate limit key and expire at
+    their retry-after; when the cache is full the oldest entry is evicted, so an IP
+    spray can't grow it unbounded.
+    """
+
+    def __init__(self, max_entries: int = 100000) -> None:
+        self.max_entries = max_entries
+        # key -> (monotonic deadline, denial it was cached from), in insertion order
+        self._entries: OrderedDict[str, tuple[float, RateLimitResult]] = OrderedDict()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def metrics(self) -> DeniedIpCacheMetrics:
+        return DeniedIpCacheMetrics(
+            entries=len(self._entries),
+            max_entries=self.max_entries,
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+        )
+
+    def get(self, key: str) -> RateLimitResult | None:
+        """Denial with the remaining retry-after, None if the key isn't cached."""
+        if (entry := self._entries.get(key)) is not None:
+            denied_until, result = entry
+            if (retry_after := denied_until - time.monotonic()) > 0:
+                self._hits += 1
+                return result.model_copy(update={"retry_after": retry_after})
+
+            del self._entries[key]
+
+        self._misses += 1
+        return None
+
+    def add(self, key: str, result: RateLimitResult) -> None:
+        if result.allowed or result.retry_after <= 0 or self.max_entries <= 0:
+            return
+
+        now = time.monotonic()
+        self._entries.pop(key, None)
+
+        while len(self._entries) >= self.max_entries:
+            _, (denied_until, _) = self._entries.popitem(last=False)
+            if denied_until > now:
+                self._evictions += 1
+
+        self._entries[key] = (now + result.retry_after, result)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,63 @@
+import math
+import time
+from collections import OrderedDict, deque
+
+from app.models.services.rate_limit import RateLimitResult
+from app.models.settings import RateLimitWindowSettings
+
+
+class LocalRateLimiter:
+    """
+    In-process sliding log limiter, used as a per-worker fallback while Redis is unavailable.
+
+    Each worker only sees its own share of the traffic, so every window's quota is
+    divided by the number of workers. Tracks at most max_entries clients, evicting
+    the least recently seen one.
+    """
+
+    def __init__(self, workers: int = 1, max_entries: int = 100000) -> None:
+        self.workers = workers
+        self.max_entries = max_entries
+        # key -> monotonic timestamps of allowed requests within the longest window
+        self._requests: OrderedDict[str, deque[float]] = OrderedDict()
+
+    def check(self, key: str, windows: list[RateLimitWindowSettings]) -> RateLimitResult:
+        now = time.monotonic()
+
+        if (requests := self._requests.get(key)) is None:
+            while len(self._requests) >= self.max_entries:
+                self._requests.popitem(last=False)
+            requests = self._requests[key] = deque()
+        else:
+            self._requests.move_to_end(key)
+
+        longest = max(window.window_seconds for window in windows)
+        while requests and requests[0] <= now - longest:
+            requests.popleft()
+
+        # (allowed, remaining, retry_after, limit, window) per window
+        states = []
+        for window in windows:
+            limit = max(1, window.max_requests // self.workers)
+            in_window = [timestamp for timestamp in requests if timestamp > now - window.window_seconds]
+
+            if len(in_window) < limit:
+                states.append((True, limit - len(in_window) - 1, 0.0, limit, window))
+            else:
+                # the request whose expiry frees a slot in this window
+                retry_after = in_window[len(in_window) - limit] + window.window_seconds - now
+                states.append((False, 0, math.ceil(retry_after * 1000) / 1000, limit, window))
+
+        if denied := [state for state in states if not state[0]]:
+            _, _, retry_after, limit, window = max(denied, key=lambda state: state[2])
+            return RateLimitResult(
+                allowed=False,
+                limit=limit,
+                window_seconds=window.window_seconds,
+                remaining=0,
+                retry_after=retry_after,
+            )
+
+        requests.append(now)
+        _, remaining, _, limit, window = min(states, key=lambda state: state[1])
+        return RateLimitResult(allowed=True, limit=limit, window_seconds=window.window_seconds, remaining=remaining)
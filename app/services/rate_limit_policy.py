@@ -0,0 +1,106 @@
+import ipaddress
+from typing import Any
+
+from app.models.settings import RateLimitPolicySettings
+
+IPAddress = ipaddress.IPv4Address | ipaddress.IPv6Address
+
+
+def parse_ip(ip: str) -> IPAddress | None:
+    try:
+        return ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+
+
+def get_client_id(ip: str, address: IPAddress | None, ipv6_prefix_length: int) -> str:
+    """IPv6 clients are aggregated to their prefix, anything else is counted as is."""
+    if address is None or address.version == 4 or ipv6_prefix_length >= 128:
+        return ip
+
+    return str(ipaddress.IPv6Network((address, ipv6_prefix_length), strict=False))
+
+
+class PrefixTrie:
+    """
+    Binary trie over address bits for longest-prefix matching.
+
+    A lookup walks at most as many bits as the longest stored prefix, so its cost
+    depends on prefix length, not on the number of stored networks.
+    """
+
+    def __init__(self, max_bits: int) -> None:
+        self.max_bits = max_bits
+        self.depth = 0
+        # node: [child for bit 0, child for bit 1, values stored at this prefix]
+        self._root: list[Any] = [None, None, []]
+
+    def insert(self, network: ipaddress.IPv4Network | ipaddress.IPv6Network, value: Any) -> None:
+        bits = int(network.network_address)
+        node = self._root
+
+        for i in range(network.prefixlen):
+            bit = (bits >> (self.max_bits - 1 - i)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, []]
+            node = node[bit]
+
+        node[2].append(value)
+        self.depth = max(self.depth, network.prefixlen)
+
+    def match(self, address: IPAddress) -> list[tuple[int, Any]]:
+        """All values whose prefix contains the address, as (prefix length, value), shortest prefix first."""
+        bits = int(address)
+        node = self._root
+        matches = [(0, value) for value in node[2]]
+
+        for i in range(self.depth):
+            if (node := node[(bits >> (self.max_bits - 1 - i)) & 1]) is None:
+                break
+            matches.extend((i + 1, value) for value in node[2])
+
+        return matches
+
+
+class RateLimitPolicyMatcher:
+    """
+    Resolves the rate limit policy of a request from the configured policy table.
+
+    A policy restricted to the request's supply beats a supply-agnostic one; within
+    the same kind, the longest matching CIDR prefix wins. Policies without CIDRs
+    match any IP with prefix length 0.
+    """
+
+    def __init__(self, policies: list[RateLimitPolicySettings]) -> None:
+        self._tries = {4: PrefixTrie(max_bits=32), 6: PrefixTrie(max_bits=128)}
+        self._any_ip: list[tuple[int, RateLimitPolicySettings]] = []
+
+        for policy in policies:
+            if not policy.cidrs:
+                self._any_ip.append((0, policy))
+                self._tries[4].insert(ipaddress.IPv4Network("0.0.0.0/0"), policy)
+                self._tries[6].insert(ipaddress.IPv6Network("::/0"), policy)
+                continue
+
+            for cidr in policy.cidrs:
+                network = ipaddress.ip_network(cidr)
+                self._tries[network.version].insert(network, policy)
+
+    def resolve(self, address: IPAddress | None, supply_id: str | None = None) -> RateLimitPolicySettings | None:
+        matches = self._any_ip if address is None else self._tries[address.version].match(address)
+
+        best: RateLimitPolicySettings | None = None
+        best_rank = (-1, -1)
+        for prefix_length, policy in matches:
+            if policy.supply_ids:
+                if supply_id not in policy.supply_ids:
+                    continue
+                rank = (1, prefix_length)
+            else:
+                rank = (0, prefix_length)
+
+            # ties keep the policy configured first
+            if rank > best_rank:
+                best, best_rank = policy, rank
+
+        return best
@@ -1,48 +1,389 @@
 import logging
-import time
+import uuid
+from typing import Literal
 
 import redis.asyncio as redis
 
+from app.config.settings import settings
+from app.models.services.rate_limit import RateLimitResult
+from app.models.settings import RateLimitWindowSettings
 from app.redis_db.client import redis_client
+from app.redis_db.scripts import LuaScript
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.denied_ip_cache import DeniedIpCache
+from app.services.local_rate_limiter import LocalRateLimiter
+from app.services.rate_limit_policy import RateLimitPolicyMatcher, get_client_id, parse_ip
 
 logger = logging.getLogger(__name__)
 
+# Every script enforces one or more windows at once and uses the Redis clock, so all workers
+# share one time source. ARGV: number of windows n, then n pairs of (window ms, max requests),
+# then algorithm specific arguments from ARGV[2 * n + 2].
+# Returns {allowed, remaining, retry_after_ms, index of the most constraining window (1-based)}.
+_SCRIPT_PRELUDE = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local n = tonumber(ARGV[1])
+local windows, limits = {}, {}
+local longest = 0
+for i = 1, n do
+    windows[i] = tonumber(ARGV[2 * i])
+    limits[i] = tonumber(ARGV[2 * i + 1])
+    longest = math.max(longest, windows[i])
+end
+
+-- smallest remaining budget if allowed, longest wait if denied
+local function result(allowed, remaining, retry_after)
+    local pick = 1
+    for i = 2, n do
+        if allowed == 1 and remaining[i] < remaining[pick] then
+            pick = i
+        elseif allowed == 0 and retry_after[i] > retry_after[pick] then
+            pick = i
+        end
+    end
+    return {allowed, remaining[pick], math.max(math.ceil(retry_after[pick]), 0), pick}
+end
+"""
+
+# Sliding log: one zset member per request, each window counts the members within it.
+# KEYS[1] - request log zset; extra ARGV: unique member, key TTL (s)
+SLIDING_LOG_SCRIPT = (
+    _SCRIPT_PRELUDE
+    + """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - longest)
+
+local allowed = 1
+local remaining, retry_after = {}, {}
+for i = 1, n do
+    local since = string.format('(%d', now - windows[i])
+    local count = redis.call('ZCOUNT', KEYS[1], since, '+inf')
+    remaining[i] = limits[i] - count - 1
+    retry_after[i] = 0
+
+    if count >= limits[i] then
+        allowed = 0
+        -- the request whose expiry frees a slot in this window
+        local entry = redis.call(
+            'ZRANGEBYSCORE', KEYS[1], since, '+inf', 'WITHSCORES', 'LIMIT', count - limits[i], 1
+        )
+        retry_after[i] = tonumber(entry[2]) + windows[i] - now
+    end
+end
+
+if allowed == 1 then
+    redis.call('ZADD', KEYS[1], now, ARGV[2 * n + 2])
+    redis.call('EXPIRE', KEYS[1], ARGV[2 * n + 3])
+else
+    for i = 1, n do remaining[i] = 0 end
+end
+
+return result(allowed, remaining, retry_after)
+"""
+)
+
+# Sliding window counter: counts of the current and previous fixed window, the previous
+# one weighted by how much of it still overlaps the sliding window.
+# KEYS[1] - hash {w<i>: current window index, c<i>: current count, p<i>: previous count} per window i
+SLIDING_WINDOW_COUNTER_SCRIPT = (
+    _SCRIPT_PRELUDE
+    + """
+local fields = {}
+for i = 1, n do
+    fields[3 * i - 2], fields[3 * i - 1], fields[3 * i] = 'w' .. i, 'c' .. i, 'p' .. i
+end
+local state = redis.call('HMGET', KEYS[1], unpack(fields))
+
+local allowed = 1
+local remaining, retry_after, updates = {}, {}, {}
+for i = 1, n do
+    local window, limit = windows[i], limits[i]
+    local index = math.floor(now / window)
+    local stored_index = tonumber(state[3 * i - 2])
+    local current = tonumber(state[3 * i - 1]) or 0
+    local previous = tonumber(state[3 * i]) or 0
+
+    if stored_index == index - 1 then
+        previous = current
+        current = 0
+    elseif stored_index ~= index then
+        previous = 0
+        current = 0
+    end
+
+    local elapsed = now - index * window
+    local estimate = previous * (window - elapsed) / window + current
+    remaining[i] = math.floor(limit - estimate - 1)
+    retry_after[i] = 0
+
+    if estimate + 1 > limit then
+        allowed = 0
+        retry_after[i] = window - elapsed
+        if current + 1 <= limit and previous > 0 then
+            -- the previous window's weight decays enough before the current window ends
+            retry_after[i] = window * (1 - (limit - 1 - current) / previous) - elapsed
+        end
+    end
+
+    table.insert(updates, 'w' .. i)
+    table.insert(updates, index)
+    table.insert(updates, 'c' .. i)
+    table.insert(updates, current + 1)
+    table.insert(updates, 'p' .. i)
+    table.insert(updates, previous)
+end
+
+if allowed == 1 then
+    redis.call('HSET', KEYS[1], unpack(updates))
+    redis.call('PEXPIRE', KEYS[1], 2 * longest)
+else
+    for i = 1, n do remaining[i] = 0 end
+end
+
+return result(allowed, remaining, retry_after)
+"""
+)
+
+# GCRA: a single theoretical arrival time (TAT) per window.
+# KEYS[1] - hash {t<i>: TAT in ms} per window i
+GCRA_SCRIPT = (
+    _SCRIPT_PRELUDE
+    + """
+local fields = {}
+for i = 1, n do fields[i] = 't' .. i end
+local state = redis.call('HMGET', KEYS[1], unpack(fields))
+
+local allowed = 1
+local remaining, retry_after, updates = {}, {}, {}
+local ttl = 0
+for i = 1, n do
+    local interval = windows[i] / limits[i]
+    local tat = math.max(tonumber(state[i]) or now, now)
+    local new_tat = tat + interval
+    local allow_at = new_tat - windows[i]
+    remaining[i] = 0
+    retry_after[i] = 0
+
+    if now < allow_at then
+        allowed = 0
+        retry_after[i] = allow_at - now
+    else
+        remaining[i] = math.floor((now - allow_at) / interval)
+    end
+
+    table.insert(updates, 't' .. i)
+    table.insert(updates, string.format('%.3f', new_tat))
+    ttl = math.max(ttl, new_tat - now)
+end
+
+if allowed == 1 then
+    redis.call('HSET', KEYS[1], unpack(updates))
+    redis.call('PEXPIRE', KEYS[1], math.ceil(ttl))
+else
+    for i = 1, n do remaining[i] = 0 end
+end
+
+return result(allowed, remaining, retry_after)
+"""
+)
+
 
 class RedisRateLimiter:
-    def __init__(self, redis_client: redis.Redis, max_requests: int = 3, window_seconds: int = 60) -> None:
+    """
+    Sliding log limiter: exact, but stores one zset member per request in the window.
+
+    Limits come from the policy table when a policy matches the request and from
+    max_requests / window_seconds otherwise; all windows of a policy are enforced in
+    one atomic script call.
+    """
+
+    SCRIPT = SLIDING_LOG_SCRIPT
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        max_requests: int = 3,
+        window_seconds: int = 60,
+        denied_cache: DeniedIpCache | None = None,
+        failure_policy: Literal["fail_closed", "fail_open", "local"] = "fail_closed",
+        fallback_limiter: LocalRateLimiter | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        policies: RateLimitPolicyMatcher | None = None,
+        ipv6_prefix_length: int = 64,
+    ) -> None:
+        if failure_policy == "local" and fallback_limiter is None:
+            raise ValueError("failure_policy 'local' requires a fallback_limiter")
+
         self.redis = redis_client
         self.max_requests = max_requests
         self.window = window_seconds
+        self.windows = [RateLimitWindowSettings(max_requests=max_requests, window_seconds=window_seconds)]
+        self.policies = policies
+        self.ipv6_prefix_length = ipv6_prefix_length
+        # short-circuits clients that are known to be denied, without a Redis call
+        self.denied_cache = denied_cache
+        # what to answer while Redis is failing or the breaker is open
+        self.failure_policy = failure_policy
+        self.fallback_limiter = fallback_limiter
+        self.circuit_breaker = circuit_breaker
+        self._script = LuaScript(redis_client, self.SCRIPT)
 
     @staticmethod
     def _get_key(ip: str) -> str:
         return f"rate_limit:{ip}"
 
-    async def is_allowed(self, ip: str) -> bool:
-        key = self._get_key(ip)
-        current_time = time.time()
-        window_start = current_time - self.window
+    def _resolve(self, ip: str, supply_id: str | None) -> tuple[str, list[RateLimitWindowSettings]]:
+        """Redis key and windows that apply to the request."""
+        address = parse_ip(ip)
+
+        if self.policies is None or (policy := self.policies.resolve(address, supply_id)) is None:
+            return self._get_key(get_client_id(ip, address, self.ipv6_prefix_length)), self.windows
+
+        client_id = get_client_id(ip, address, policy.ipv6_prefix_length)
+        if policy.supply_ids:
+            # supply policies count every supply separately
+            return f"rate_limit:{policy.name}:{supply_id}:{client_id}", policy.windows
+
+        return f"rate_limit:{policy.name}:{client_id}", policy.windows
+
+    def _get_script_args(self, windows: list[RateLimitWindowSettings]) -> list[str | int]:
+        args: list[str | int] = [len(windows)]
+        for window in windows:
+            args.extend((window.window_seconds * 1000, window.max_requests))
+        return args
+
+    def _get_extra_script_args(self, windows: list[RateLimitWindowSettings]) -> list[str | int]:
+        # unique member, requests within the same millisecond must not overwrite each other
+        return [uuid.uuid4().hex, max(window.window_seconds for window in windows) + 10]
+
+    async def check(self, ip: str, supply_id: str | None = None) -> RateLimitResult:
+        """Check and record a request in one atomic round trip."""
+        key, windows = self._resolve(ip, supply_id)
+
+        if self.denied_cache is not None and (cached := self.denied_cache.get(key)) is not None:
+            return cached
+
+        if self.circuit_breaker is not None and not self.circuit_breaker.allow_request():
+            return self._check_degraded(key, windows)
 
         try:
-            pipe = self.redis.pipeline()
-            await pipe.zremrangebyscore(key, 0, window_start)
-            await pipe.zcard(key)
-            results = await pipe.execute()
-            current_count = results[1]
-
-            if current_count < self.max_requests:
-                await self.redis.zadd(key, {f"{current_time:.6f}": current_time})
-                await self.redis.expire(key, self.window + 10)
-                return True
-            return False
+            allowed, remaining, retry_after_ms, window_index = await self._script(
+                keys=[key],
+                args=self._get_script_args(windows) + self._get_extra_script_args(windows),
+            )
+            window = windows[int(window_index) - 1]
+
+            result = RateLimitResult(
+                allowed=bool(allowed),
+                limit=window.max_requests,
+                window_seconds=window.window_seconds,
+                remaining=int(remaining),
+                retry_after=int(retry_after_ms) / 1000,
+            )
 
         except Exception as e:
-            logger.error(f"Error checking rate limit for {ip}: {e}", exc_info=True)
-            return False
+            logger.error(f"Error checking rate limit for {ip}, applying {self.failure_policy} policy: {e}")
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_failure()
+            return self._check_degraded(key, windows)
+        except BaseException:
+            # cancelled: no outcome, but the breaker mustn't wait for the trial forever
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.release_trial()
+            raise
 
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success()
 
-rate_limiter = RedisRateLimiter(
-    redis_client=redis_client,
-    max_requests=3,
-    window_seconds=60,
-)
+        if not result.allowed and self.denied_cache is not None:
+            self.denied_cache.add(key, result)
+
+        return result
+
+    async def is_allowed(self, ip: str, supply_id: str | None = None) -> bool:
+        return (await self.check(ip, supply_id)).allowed
+
+    def _check_degraded(self, key: str, windows: list[RateLimitWindowSettings]) -> RateLimitResult:
+        window = windows[0]
+
+        match self.failure_policy:
+            case "fail_open":
+                return RateLimitResult(
+                    allowed=True,
+                    limit=window.max_requests,
+                    window_seconds=window.window_seconds,
+                    remaining=window.max_requests,
+                )
+            case "fail_closed":
+                return RateLimitResult(
+                    allowed=False,
+                    limit=window.max_requests,
+                    window_seconds=window.window_seconds,
+                    remaining=0,
+                )
+            case "local":
+                return self.fallback_limiter.check(key, windows)
+
+
+class SlidingWindowCounterRateLimiter(RedisRateLimiter):
+    """
+    Approximate sliding window from two fixed-window counters, O(1) memory per key.
+
+    Assumes requests were evenly spread over the previous window, so it may
+    be off by a fraction of the limit right after a burst.
+    """
+
+    SCRIPT = SLIDING_WINDOW_COUNTER_SCRIPT
+
+    def _get_extra_script_args(self, windows: list[RateLimitWindowSettings]) -> list[str | int]:
+        return []
+
+
+class GcraRateLimiter(RedisRateLimiter):
+    """
+    Generic cell rate algorithm, one timestamp per key.
+
+    Allows a burst of max_requests, after which requests are spaced evenly at
+    window / max_requests instead of waiting for the whole window to slide.
+    """
+
+    SCRIPT = GCRA_SCRIPT
+
+    def _get_extra_script_args(self, windows: list[RateLimitWindowSettings]) -> list[str | int]:
+        return []
+
+
+RATE_LIMITERS: dict[str, type[RedisRateLimiter]] = {
+    "sliding_log": RedisRateLimiter,
+    "sliding_window_counter": SlidingWindowCounterRateLimiter,
+    "gcra": GcraRateLimiter,
+}
+
+
+def create_rate_limiter(redis_client: redis.Redis) -> RedisRateLimiter:
+    config = settings.rate_limit
+
+    return RATE_LIMITERS[config.algorithm](
+        redis_client=redis_client,
+        max_requests=config.max_requests,
+        window_seconds=config.window_seconds,
+        denied_cache=(
+            DeniedIpCache(max_entries=config.denied_cache_max_entries) if config.denied_cache_enabled else None
+        ),
+        failure_policy=config.failure_policy,
+        fallback_limiter=(
+            LocalRateLimiter(workers=config.workers, max_entries=config.fallback_max_entries)
+            if config.failure_policy == "local"
+            else None
+        ),
+        circuit_breaker=CircuitBreaker(
+            name="rate_limiter_redis",
+            failure_threshold=config.breaker_failure_threshold,
+            cooldown_seconds=config.breaker_cooldown_seconds,
+        ),
+        policies=RateLimitPolicyMatcher(config.policies) if config.policies else None,
+        ipv6_prefix_length=config.ipv6_prefix_length,
+    )
+
+
+rate_limiter = create_rate_limiter(redis_client)
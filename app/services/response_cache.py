@@ -0,0 +1,81 @@
+import asyncio
+import hashlib
+from collections.abc import Awaitable, Callable
+
+from app.config.settings import settings
+from app.models.services.response_cache import CachedResponse, ResponseCacheMetrics
+
+
+def get_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag (weak comparison, as RFC 9110 requires for it)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ResponseCache:
+    """
+    Per-worker cache of serialized response bodies, refreshed at most every ttl_seconds.
+
+    A refresh is single-flight: requests arriving while a body is being rebuilt wait
+    for that rebuild instead of starting their own, so a burst of pollers costs one
+    read of the underlying data. A body can be up to ttl_seconds stale.
+    """
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[str, CachedResponse] = {}
+        self._refreshes: dict[str, asyncio.Task[CachedResponse]] = {}
+
+        self._hits = 0
+        self._refresh_count = 0
+        self._coalesced = 0
+
+    @property
+    def metrics(self) -> ResponseCacheMetrics:
+        return ResponseCacheMetrics(
+            entries=len(self._entries),
+            hits=self._hits,
+            refreshes=self._refresh_count,
+            coalesced=self._coalesced,
+        )
+
+    async def get(self, key: str, build: Callable[[], Awaitable[bytes]]) -> CachedResponse:
+        """Cached body of the key, rebuilt with build() once it is older than the TTL."""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > asyncio.get_running_loop().time():
+            self._hits += 1
+            return entry
+
+        if (refresh := self._refreshes.get(key)) is None:
+            refresh = asyncio.create_task(self._refresh(key, build))
+            self._refreshes[key] = refresh
+            refresh.add_done_callback(lambda _: self._refreshes.pop(key, None))
+        else:
+            self._coalesced += 1
+
+        # a waiter that goes away (client disconnect) must not cancel the refresh the others wait for
+        return await asyncio.shield(refresh)
+
+    async def _refresh(self, key: str, build: Callable[[], Awaitable[bytes]]) -> CachedResponse:
+        self._refresh_count += 1
+        body = await build()
+        entry = CachedResponse(
+            body=body,
+            etag=get_etag(body),
+            expires_at=asyncio.get_running_loop().time() + self.ttl_seconds,
+        )
+        self._entries[key] = entry
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+stat_response_cache = ResponseCache(ttl_seconds=settings.statistics.stat_cache_ttl_ms / 1000)
@@ -1,82 +1,1034 @@
 import logging
-from typing import Optional
+import math
+import random
+import time
+import uuid
+from collections.abc import Callable, Iterable
+from datetime import UTC, datetime
+from typing import get_args
 
 import redis.asyncio as redis
+from redis.asyncio import RedisCluster
+from redis.asyncio.client import Pipeline
+from redis.exceptions import NoScriptError
 
-from app.models.services.statistics import StatisticsResult
+from app.config.settings import settings
+from app.models.services.statistics import (
+    BIDDER_FIELD_CODES,
+    BIDDER_NAME_PREFIX,
+    BIDDER_RESPONSE_FIELDS,
+    COMPACT_FIELD_PATTERN,
+    COUNTRY_FIELD_CODE,
+    COUNTRY_NAME_PREFIX,
+    GRANULARITY_SECONDS,
+    HISTOGRAM_BUCKETS,
+    HISTOGRAM_FIELD_CODES,
+    REVENUE_SCALE,
+    TOTAL_REQS_FIELD,
+    UNIQUE_IP_FIELD_PREFIX,
+    StatisticsField,
+    StatisticsFilter,
+    StatisticsGranularity,
+    StatisticsRangeResult,
+    StatisticsResult,
+    get_histogram_bucket,
+)
 from app.redis_db.client import redis_client
+from app.redis_db.cluster import hash_tag, pipeline_by_node
+from app.redis_db.scripts import LuaScript
 
 logger = logging.getLogger(__name__)
 
+# KEYS[1] - supply stats hash, KEYS[2..] - time bucket hashes of the same supply shard;
+# ARGV - one TTL per bucket hash, then field/amount pairs, all amounts are integers
+RECORD_STATS_SCRIPT = """
+local buckets = #KEYS - 1
+for i = buckets + 1, #ARGV, 2 do
+    for k = 1, #KEYS do
+        redis.call('HINCRBY', KEYS[k], ARGV[i], ARGV[i + 1])
+    end
+end
+for k = 1, buckets do
+    redis.call('EXPIRE', KEYS[k + 1], ARGV[k])
+end
+return (#ARGV - buckets) / 2
+"""
+
+# KEYS[1] - statistics dictionary, ARGV - names; returns their ids, assigning the next free id to new names.
+# Holds name -> id and id -> name fields plus the "next" counter; names always contain ':' so they never clash.
+ASSIGN_IDS_SCRIPT = """
+local ids = {}
+for i, name in ipairs(ARGV) do
+    local id = redis.call('HGET', KEYS[1], name)
+    if not id then
+        id = redis.call('HINCRBY', KEYS[1], 'next', 1)
+        redis.call('HSET', KEYS[1], name, id, id, name)
+    end
+    ids[i] = tonumber(id)
+end
+return ids
+"""
+
+# KEYS[1] - supply stats hash, ARGV - (legacy field, compact field, scale) triples. Moves each legacy counter onto its
+# compact field in one step, reading the value here so increments of workers still on the old layout aren't lost
+CONVERT_FIELDS_SCRIPT = """
+local moved = 0
+for i = 1, #ARGV, 3 do
+    local value = redis.call('HGET', KEYS[1], ARGV[i])
+    if value then
+        local amount = math.floor(tonumber(value) * tonumber(ARGV[i + 2]) + 0.5)
+        redis.call('HINCRBY', KEYS[1], ARGV[i + 1], string.format('%d', amount))
+        redis.call('HDEL', KEYS[1], ARGV[i])
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+# KEYS[1] - stats version counter, KEYS[2] - sorted set of supply ids scored by the version of their last change
+# (both share a hash tag); ARGV - supplies just written. Returns the new version
+BUMP_VERSIONS_SCRIPT = """
+local version = redis.call('INCR', KEYS[1])
+for i = 1, #ARGV do
+    redis.call('ZADD', KEYS[2], version, ARGV[i])
+end
+return version
+"""
+
+# KEYS as for BUMP_VERSIONS_SCRIPT, ARGV[1] - cursor; returns the current version, then the supplies changed after it
+GET_CHANGED_SUPPLIES_SCRIPT = """
+local changed = redis.call('ZRANGEBYSCORE', KEYS[2], '(' .. ARGV[1], '+inf')
+table.insert(changed, 1, redis.call('GET', KEYS[1]) or '0')
+return changed
+"""
+
+# KEYS[1] - supply stats hash, KEYS[2] - set of migration tokens already applied to it (same hash tag);
+# ARGV[1] - token, ARGV[2] - TTL of the token set, then field/amount pairs. Applies the amounts once per token,
+# so a migration interrupted before deleting its staged hash can be rerun without counting anything twice
+APPLY_ONCE_SCRIPT = """
+if redis.call('SADD', KEYS[2], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+for i = 3, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+# KEYS[1] - stale stats hash, KEYS[2] - its unique staging key (same slot); moves the hash aside, so its content is
+# frozen while it is migrated and later writes of old-layout workers start a new one. Returns 0 if there is nothing
+# to move (e.g. another worker moved it first)
+STAGE_HASH_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('RENAME', KEYS[1], KEYS[2])
+return 1
+"""
+
+
+class StatisticsWriteError(Exception):
+    """Increments of some supplies weren't applied; the rest of the batch was."""
+
+    def __init__(self, failed_supply_ids: set[str]) -> None:
+        super().__init__(f"Statistics of {len(failed_supply_ids)} supply(ies) weren't written")
+        self.failed_supply_ids = failed_supply_ids
+
 
 class StatisticsService:
-    def __init__(self, redis_client: redis.Redis):
+    # set of supply ids with statistics, kept outside the stats:* namespace
+    SUPPLY_REGISTRY_KEY = "stats_index:supplies"
+    SHARD_SEPARATOR = "#"
+    # maps bidder and country names to the small integer ids used in stats hash fields
+    DICTIONARY_KEY = "stats_dict"
+    # global change counter and supply_id -> version of its last change, for /stat?since=
+    VERSION_KEY = "stats_index:{stats_version}:counter"
+    SUPPLY_VERSIONS_KEY = "stats_index:{stats_version}:supplies"
+    # how long tokens of applied migrations are remembered, long enough to rerun an interrupted one
+    MIGRATION_TOKEN_TTL = 7 * 24 * 3600
+    # stale hashes being migrated, see _migrate_key
+    STAGING_KEY_PREFIX = "stats_migrating:"
+    # layout the keys were last migrated to, so worker startups skip the migration scans
+    MIGRATION_KEY = "stats_index:migrated"
+    # bump when a migration is added
+    MIGRATIONS_VERSION = 1
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        supply_shards: dict[str, int] | None = None,
+        bucket_ttls: dict[StatisticsGranularity, int] | None = None,
+        range_max_buckets: int = 1440,
+        unique_ips_enabled: bool = True,
+    ):
         self.redis = redis_client
+        # supply_id -> number of hashes its counters are spread over, 1 when not listed
+        self.supply_shards = supply_shards or {}
+        # granularity -> retention of its time buckets; no buckets are written without it
+        self.bucket_ttls = bucket_ttls or {}
+        self.range_max_buckets = range_max_buckets
+        # count distinct requester IPs into HyperLogLogs; the IPs in increments are dropped without it
+        self.unique_ips_enabled = unique_ips_enabled
+        self._record_script = LuaScript(redis_client, RECORD_STATS_SCRIPT)
+        self._apply_once_script = LuaScript(redis_client, APPLY_ONCE_SCRIPT)
+        self._stage_hash_script = LuaScript(redis_client, STAGE_HASH_SCRIPT)
+        self._assign_ids_script = LuaScript(redis_client, ASSIGN_IDS_SCRIPT)
+        self._convert_fields_script = LuaScript(redis_client, CONVERT_FIELDS_SCRIPT)
+        self._bump_versions_script = LuaScript(redis_client, BUMP_VERSIONS_SCRIPT)
+        self._get_changed_supplies_script = LuaScript(redis_client, GET_CHANGED_SUPPLIES_SCRIPT)
+        # dictionary entries never change once assigned, so both directions are cached for good
+        self._ids: dict[str, int] = {}
+        self._names: dict[str, str] = {}
+        # written supplies whose version bump failed, bumped with the next write
+        self._unversioned: set[str] = set()
+        # written supplies whose registry update failed, registered with the next write
+        self._unregistered: set[str] = set()
+
+    def _get_supply_key(self, supply_id: str, shard: int = 0) -> str:
+        """
+        Stats hash of a supply shard: stats:{<supply_id>} for shard 0, stats:{<supply_id>#<shard>} for the others.
+
+        Every shard has its own hash tag, so in a cluster the shards of a hot supply spread over the slots
+        (and nodes) instead of pinning all of its writes to one.
+        """
+        return f"stats:{self._get_shard_tag(supply_id, shard)}"
+
+    def _get_shard_tag(self, supply_id: str, shard: int) -> str:
+        return hash_tag(f"{supply_id}{self.SHARD_SEPARATOR}{shard}" if shard else supply_id)
+
+    def _get_bucket_key(self, supply_id: str, shard: int, granularity: StatisticsGranularity, start: int) -> str:
+        # same hash tag as the shard's all-time hash, so both are updated by one script call; kept out of stats:*
+        return f"stats_bucket:{self._get_shard_tag(supply_id, shard)}:{granularity}:{start}"
+
+    def _get_unique_ips_key(
+        self,
+        supply_id: str,
+        country: str | None = None,
+        granularity: StatisticsGranularity | None = None,
+        start: int | None = None,
+    ) -> str:
+        """
+        HyperLogLog of a supply's requester IPs, optionally of one country and/or one time bucket.
+
+        Always on the supply's own hash tag, not its shards', so the buckets of a range can be
+        counted together by a single PFCOUNT.
+        """
+        key = f"stats_uniques:{self._get_shard_tag(supply_id, 0)}"
+        if granularity is not None:
+            key += f":{granularity}:{start}"
+        return f"{key}:ip:{country}" if country is not None else f"{key}:ip"
+
+    def _get_supply_keys(self, supply_id: str) -> list[str]:
+        return [self._get_supply_key(supply_id, shard) for shard in range(self.get_shard_count(supply_id))]
+
+    def _parse_key(self, key: str) -> tuple[str, int, bool]:
+        """
+        Supply id and shard of a stats key, and whether the key uses the legacy untagged layout (stats:<supply_id>).
+
+        A #<shard> suffix is only split off for supplies listed in supply_shards, so an unsharded
+        supply id like "a#2" isn't taken for a shard of "a".
+        """
+        supply_part = key.split(":", 1)[1]
+        if not (supply_part.startswith("{") and supply_part.endswith("}")):
+            return supply_part, 0, True
+
+        supply_id, separator, shard = supply_part[1:-1].rpartition(self.SHARD_SEPARATOR)
+        if separator and shard.isdigit() and int(shard) > 0 and supply_id in self.supply_shards:
+            return supply_id, int(shard), False
+        return supply_part[1:-1], 0, False
+
+    def get_shard_count(self, supply_id: str) -> int:
+        return self.supply_shards.get(supply_id, 1)
+
+    def _pick_shard(self, supply_id: str) -> int:
+        if (shards := self.get_shard_count(supply_id)) == 1:
+            return 0
+        return random.randrange(shards)
 
     @staticmethod
-    def _get_supply_key(supply_id: str) -> str:
-        return f"stats:{supply_id}"
+    def get_request_increments(country: str, ip: str | None = None) -> dict[str, int | float]:
+        increments: dict[str, int | float] = {"total_reqs": 1, f"country:{country}": 1}
+        if ip:
+            increments[f"{UNIQUE_IP_FIELD_PREFIX}{country}:{ip}"] = 1
+        return increments
 
-    async def record_request(self, supply_id: str, country: str) -> None:
-        try:
-            key = self._get_supply_key(supply_id)
-            pipe = self.redis.pipeline()
-            await pipe.hincrby(key, "total_reqs", 1)
-            await pipe.hincrby(key, f"country:{country}", 1)
-            await pipe.execute()
+    @staticmethod
+    def _split_unique_ips(fields: dict[str, int]) -> tuple[dict[str, int], dict[str, set[str]]]:
+        """Counter fields, and the requester IPs carried by the increments per country."""
+        counters: dict[str, int] = {}
+        unique_ips: dict[str, set[str]] = {}
+        for field, amount in fields.items():
+            if field.startswith(UNIQUE_IP_FIELD_PREFIX):
+                # IPv6 addresses contain ':' too, country codes don't
+                country, _, ip = field.removeprefix(UNIQUE_IP_FIELD_PREFIX).partition(":")
+                unique_ips.setdefault(country, set()).add(ip)
+            else:
+                counters[field] = amount
+        return counters, unique_ips
+
+    @staticmethod
+    def get_auction_result_increments(
+        winner_id: str | None,
+        winning_price: float,
+        no_bid_ids: list[str],
+        timeout_ids: list[str] | None = None,
+        latencies_ms: dict[str, float] | None = None,
+    ) -> dict[str, int | float]:
+        increments: dict[str, int | float] = {}
+
+        if winner_id:
+            increments[f"bidder:{winner_id}:wins"] = 1
+            increments[f"bidder:{winner_id}:revenue"] = round(winning_price * REVENUE_SCALE)
+            # clearing price distribution, the supply's is the sum over its bidders
+            bucket = get_histogram_bucket(HISTOGRAM_BUCKETS["price"], winning_price)
+            increments[f"bidder:{winner_id}:price:{bucket}"] = 1
+
+        for bidder_id in no_bid_ids:
+            field = f"bidder:{bidder_id}:no_bids"
+            increments[field] = increments.get(field, 0) + 1
+
+        for bidder_id in timeout_ids or []:
+            field = f"bidder:{bidder_id}:timeouts"
+            increments[field] = increments.get(field, 0) + 1
+
+        # one histogram count per response, plus the latency sum in microseconds
+        for bidder_id, latency_ms in (latencies_ms or {}).items():
+            bucket = get_histogram_bucket(HISTOGRAM_BUCKETS["latency"], latency_ms)
+            increments[f"bidder:{bidder_id}:latency:{bucket}"] = 1
+            increments[f"bidder:{bidder_id}:latency_sum_us"] = round(latency_ms * 1000)
+
+        return increments
+
+    @staticmethod
+    def _get_script_args(fields: dict[str, int]) -> list[str]:
+        args: list[str] = []
+        for field, amount in fields.items():
+            args += [field, str(amount)]
+        return args
+
+    @staticmethod
+    def _split_bidder_field(field: str) -> tuple[str, str, str | None]:
+        """
+        Bidder id, metric and histogram bucket (None for plain counters) of a verbose bidder field.
+
+        Parsed from the right, bidder ids may contain ':' themselves; metrics never are numbers, buckets always.
+        """
+        rest, _, last = field.removeprefix("bidder:").rpartition(":")
+        if last.isdigit():
+            bidder_id, _, metric = rest.rpartition(":")
+            if metric in HISTOGRAM_FIELD_CODES:
+                return bidder_id, metric, last
+        return rest, last, None
+
+    @classmethod
+    def _get_dictionary_name(cls, field: str) -> str | None:
+        """Dictionary entry a verbose field refers to: "c:<country>", "b:<bidder_id>" or None for total_reqs."""
+        kind, _, rest = field.partition(":")
+        if kind == "country":
+            return f"{COUNTRY_NAME_PREFIX}{rest}"
+        if kind == "bidder":
+            return f"{BIDDER_NAME_PREFIX}{cls._split_bidder_field(field)[0]}"
+        return None
+
+    @staticmethod
+    def _is_compact_field(field: str) -> bool:
+        return field == TOTAL_REQS_FIELD or COMPACT_FIELD_PATTERN.fullmatch(field) is not None
+
+    @staticmethod
+    def _get_entry_ids(supplies: dict[str, dict[str, str]]) -> set[str]:
+        """Dictionary ids referenced by the compact fields of the given hashes."""
+        return {
+            match.group(2)
+            for data in supplies.values()
+            for field in data
+            if (match := COMPACT_FIELD_PATTERN.fullmatch(field))
+        }
+
+    async def _get_ids(self, names: set[str]) -> dict[str, int]:
+        if missing := [name for name in names if name not in self._ids]:
+            ids = await self._assign_ids_script(keys=[self.DICTIONARY_KEY], args=missing)
+            for name, entry_id in zip(missing, ids, strict=True):
+                self._ids[name] = entry_id
+                self._names[str(entry_id)] = name
+        return self._ids
+
+    async def _get_compact_field_names(self, fields: Iterable[str]) -> dict[str, str]:
+        """
+        Map verbose fields onto compact field names.
+
+        Verbose fields are total_reqs, country:<country>, bidder:<id>:<metric> and
+        bidder:<id>:<histogram>:<bucket> for the latency and price histograms.
+        """
+        fields = list(fields)
+        ids = await self._get_ids({name for field in fields if (name := self._get_dictionary_name(field))})
+
+        compact_fields: dict[str, str] = {}
+        for field in fields:
+            if field == "total_reqs":
+                compact_fields[field] = TOTAL_REQS_FIELD
+            elif field.startswith("country:"):
+                compact_fields[field] = f"{COUNTRY_FIELD_CODE}{ids[self._get_dictionary_name(field)]}"
+            else:
+                _, metric, bucket = self._split_bidder_field(field)
+                entry_id = ids[self._get_dictionary_name(field)]
+                if bucket is not None:
+                    compact_fields[field] = f"{HISTOGRAM_FIELD_CODES[metric]}{entry_id}.{bucket}"
+                else:
+                    compact_fields[field] = f"{BIDDER_FIELD_CODES[metric]}{entry_id}"
+        return compact_fields
+
+    async def _encode_fields(self, fields: dict[str, int]) -> dict[str, int]:
+        compact_fields = await self._get_compact_field_names(fields)
+        return {compact_fields[field]: amount for field, amount in fields.items()}
+
+    async def _load_names(self, entry_ids: set[str]) -> dict[str, str]:
+        """Dictionary names of the given ids, fetching the ones assigned by other workers."""
+        if missing := [entry_id for entry_id in entry_ids if entry_id not in self._names]:
+            for entry_id, name in zip(missing, await self.redis.hmget(self.DICTIONARY_KEY, missing), strict=True):
+                if name is not None:
+                    self._names[entry_id] = name
+                    self._ids[name] = int(entry_id)
+        return {entry_id: self._names[entry_id] for entry_id in entry_ids if entry_id in self._names}
+
+    async def _lookup_ids(self, names: list[str]) -> dict[str, int]:
+        """Ids of existing dictionary entries; unlike _get_ids, unknown names are skipped instead of assigned."""
+        if missing := [name for name in names if name not in self._ids]:
+            for name, entry_id in zip(missing, await self.redis.hmget(self.DICTIONARY_KEY, missing), strict=True):
+                if entry_id is not None:
+                    self._ids[name] = int(entry_id)
+                    self._names[entry_id] = name
+        return {name: self._ids[name] for name in names if name in self._ids}
+
+    async def _resolve_ids(self, prefix: str, names: list[str]) -> list[int]:
+        """Dictionary ids of the given countries or bidders."""
+        return sorted((await self._lookup_ids([f"{prefix}{name}" for name in names])).values())
+
+    @staticmethod
+    def _is_narrow(statistics_filter: StatisticsFilter) -> bool:
+        """
+        Whether the filter selects few enough counters to read them with HMGET.
+
+        Histograms, and bidder or country counters without a bidder or country filter, would
+        mean a field per bucket or dictionary entry (of any supply) for every hash; reading
+        the whole hash and filtering it is cheaper then.
+        """
+        fields = statistics_filter.fields or set(get_args(StatisticsField))
+        if fields & HISTOGRAM_FIELD_CODES.keys():
+            return False
+        if statistics_filter.bidder_ids is None and fields & BIDDER_RESPONSE_FIELDS.keys():
+            return False
+        return statistics_filter.countries is not None or not fields & {"reqs_per_country", "unique_ips"}
+
+    async def _get_projected_fields(self, statistics_filter: StatisticsFilter) -> list[str]:
+        """Compact hash fields holding the counters selected by a narrow filter."""
+        fields = statistics_filter.fields or set(get_args(StatisticsField))
+        projected: list[str] = []
+
+        if "total_reqs" in fields:
+            projected.append(TOTAL_REQS_FIELD)
+
+        # unique IPs are counted for the countries the supply has requests from
+        if fields & {"reqs_per_country", "unique_ips"}:
+            for entry_id in await self._resolve_ids(COUNTRY_NAME_PREFIX, statistics_filter.countries):
+                projected.append(f"{COUNTRY_FIELD_CODE}{entry_id}")
+
+        if bidder_fields := sorted(fields & BIDDER_RESPONSE_FIELDS.keys()):
+            for entry_id in await self._resolve_ids(BIDDER_NAME_PREFIX, statistics_filter.bidder_ids):
+                projected += [
+                    f"{BIDDER_FIELD_CODES[BIDDER_RESPONSE_FIELDS[field]]}{entry_id}" for field in bidder_fields
+                ]
+
+        return projected
+
+    async def _get_field_selector(self, statistics_filter: StatisticsFilter) -> Callable[[str], bool]:
+        """Whether a compact hash field holds a counter selected by the filter, for whole hashes read by HGETALL."""
+        fields = statistics_filter.fields or set(get_args(StatisticsField))
+        codes = {BIDDER_FIELD_CODES[BIDDER_RESPONSE_FIELDS[field]] for field in fields & BIDDER_RESPONSE_FIELDS.keys()}
+        codes |= {HISTOGRAM_FIELD_CODES[field] for field in fields & HISTOGRAM_FIELD_CODES.keys()}
+        if fields & {"reqs_per_country", "unique_ips"}:
+            codes.add(COUNTRY_FIELD_CODE)
+
+        # None selects every country or bidder
+        country_ids, bidder_ids = None, None
+        if statistics_filter.countries is not None:
+            country_ids = {
+                str(entry_id) for entry_id in await self._resolve_ids(COUNTRY_NAME_PREFIX, statistics_filter.countries)
+            }
+        if statistics_filter.bidder_ids is not None:
+            bidder_ids = {
+                str(entry_id) for entry_id in await self._resolve_ids(BIDDER_NAME_PREFIX, statistics_filter.bidder_ids)
+            }
+
+        def is_selected(field: str) -> bool:
+            if field == TOTAL_REQS_FIELD:
+                return "total_reqs" in fields
+            if not (match := COMPACT_FIELD_PATTERN.fullmatch(field)) or match[1] not in codes:
+                return False
+            entry_ids = country_ids if match[1] == COUNTRY_FIELD_CODE else bidder_ids
+            return entry_ids is None or match[2] in entry_ids
+
+        return is_selected
+
+    async def apply_increments(self, increments: dict[str, dict[str, int]], timestamp: float | None = None) -> None:
+        """
+        Apply pre-aggregated increments in a single round trip.
+
+        Maps supply_id to verbose field -> integer amount (revenue in micro-units), stored in the
+        compact dictionary-encoded layout. Every supply is updated atomically by one EVALSHA of
+        RECORD_STATS_SCRIPT on a randomly picked shard, together with the time buckets containing
+        timestamp (now by default); all supplies share a pipeline with the supply registry update.
+        Requester IP fields are added to the supply's HyperLogLogs in the same pipeline.
+        Errors are propagated so callers can decide whether to retry. The supplies don't share a
+        transaction, so a failure of some of them is raised as StatisticsWriteError naming the
+        supplies that weren't applied; the others are, and mustn't be applied again.
+        """
+        if not increments:
+            return
+
+        encoded: dict[str, dict[str, int]] = {}
+        unique_ips: dict[str, dict[str, set[str]]] = {}
+        for supply_id, fields in increments.items():
+            counters, unique_ips[supply_id] = self._split_unique_ips(fields)
+            encoded[supply_id] = await self._encode_fields(counters)
+
+        await self._apply_encoded(
+            encoded,
+            time.time() if timestamp is None else timestamp,
+            unique_ips if self.unique_ips_enabled else None,
+        )
+
+    async def _apply_encoded(
+        self,
+        increments: dict[str, dict[str, int]],
+        timestamp: float | None = None,
+        unique_ips: dict[str, dict[str, set[str]]] | None = None,
+    ) -> None:
+        """Write compact increments; time buckets are only counted into when a timestamp is given."""
+        await self._record_script.ensure_loaded()
+        await self._bump_versions_script.ensure_loaded()
+        # commands of a pipeline run in order on a single node, so the version bump can go last in the same round
+        # trip; a cluster pipeline runs on the nodes concurrently, there it has to wait for the counters
+        bump_in_pipeline = not isinstance(self.redis, RedisCluster)
+
+        buckets = {
+            granularity: (int(timestamp) // GRANULARITY_SECONDS[granularity] * GRANULARITY_SECONDS[granularity], ttl)
+            for granularity, ttl in self.bucket_ttls.items()
+            if timestamp is not None
+        }
+
+        pending = increments
+        applied: set[str] = set()
+        failed: dict[str, Exception] = {}
+        for attempt in range(2):
+            pipe = self.redis.pipeline(transaction=False)
+
+            for supply_id, fields in pending.items():
+                shard = self._pick_shard(supply_id)
+                keys = [self._get_supply_key(supply_id, shard)]
+                keys += [self._get_bucket_key(supply_id, shard, g, start) for g, (start, _) in buckets.items()]
+                args = [str(ttl) for _, ttl in buckets.values()] + self._get_script_args(fields)
+                self._record_script.queue(pipe, keys, args)
 
+            # PFADDs don't depend on the script cache, they are only sent once
+            if not attempt:
+                for supply_id, ips_per_country in (unique_ips or {}).items():
+                    self._queue_unique_ips(pipe, supply_id, ips_per_country, buckets)
+
+            registered = self._unregistered | set(pending)
+            pipe.sadd(self.SUPPLY_REGISTRY_KEY, *registered)
+
+            supply_ids = self._unversioned | set(pending)
+            if bump_in_pipeline:
+                self._queue_version_bump(pipe, supply_ids)
+
+            results = await pipe.execute(raise_on_error=False)
+            bump_result = results.pop() if bump_in_pipeline else None
+            self._on_registered(registered, results.pop())
+            record_results = dict(zip(pending, results[: len(pending)], strict=True))
+            if unique_ip_errors := [result for result in results[len(pending) :] if isinstance(result, Exception)]:
+                # approximate counts, losing some IPs isn't worth failing supplies whose counters landed
+                logger.error(f"Error counting unique IPs: {unique_ip_errors[0]}", exc_info=unique_ip_errors[0])
+
+            if isinstance(bump_result, Exception):
+                self._on_version_bump_failed(supply_ids, bump_result)
+            elif bump_in_pipeline:
+                self._unversioned -= supply_ids
+
+            # the pipeline isn't atomic: every entry that didn't error is applied, whatever happened to the others
+            applied |= {supply_id for supply_id, result in record_results.items() if not isinstance(result, Exception)}
+            # NOSCRIPT comes from a node whose script cache was flushed (restart, failover) and applied nothing,
+            # but the other nodes of a cluster did apply theirs, so only these entries are run again
+            no_script = {supply_id for supply_id, result in record_results.items() if isinstance(result, NoScriptError)}
+            failed.update(
+                (supply_id, result)
+                for supply_id, result in record_results.items()
+                if isinstance(result, Exception) and (attempt or supply_id not in no_script)
+            )
+            if attempt or not no_script:
+                break
+            await self._record_script.load()
+            await self._bump_versions_script.load()
+            pending = {supply_id: increments[supply_id] for supply_id in no_script}
+
+        if not bump_in_pipeline and applied:
+            await self._bump_versions(applied)
+
+        if failed:
+            raise StatisticsWriteError(set(failed)) from next(iter(failed.values()))
+
+    def _on_registered(self, supply_ids: set[str], result: object) -> None:
+        """Supplies whose registry SADD failed are registered with the next write, their counters are written."""
+        if isinstance(result, Exception):
+            self._unregistered |= supply_ids
+            logger.error(
+                f"Error registering statistics supplies, retrying with the next write: {result}", exc_info=result
+            )
+        else:
+            self._unregistered -= supply_ids
+
+    def _queue_unique_ips(
+        self,
+        pipe: Pipeline,
+        supply_id: str,
+        ips_per_country: dict[str, set[str]],
+        buckets: dict[StatisticsGranularity, tuple[int, int]],
+    ) -> None:
+        """Queue PFADDs of a supply's IPs, overall and per country, into the all-time and time bucket HyperLogLogs."""
+        if not ips_per_country:
+            return
+
+        for country, ips in [(None, set().union(*ips_per_country.values())), *ips_per_country.items()]:
+            pipe.pfadd(self._get_unique_ips_key(supply_id, country), *ips)
+            for granularity, (start, ttl) in buckets.items():
+                key = self._get_unique_ips_key(supply_id, country, granularity, start)
+                pipe.pfadd(key, *ips)
+                pipe.expire(key, ttl)
+
+    def _queue_version_bump(self, pipe: Pipeline, supply_ids: set[str]) -> None:
+        self._bump_versions_script.queue(pipe, [self.VERSION_KEY, self.SUPPLY_VERSIONS_KEY], sorted(supply_ids))
+
+    async def _bump_versions(self, supply_ids: Iterable[str]) -> None:
+        """
+        Mark supplies as changed for /stat?since= readers.
+
+        Runs only once their counters are written, so a reader never sees a version whose data
+        it can't read yet. The counters are already applied, so a failure isn't raised (that
+        would make the writer apply them again); the supplies are bumped with the next write.
+        """
+        supply_ids = self._unversioned | set(supply_ids)
+
+        try:
+            await self._bump_versions_script(keys=[self.VERSION_KEY, self.SUPPLY_VERSIONS_KEY], args=sorted(supply_ids))
         except Exception as e:
-            logger.error(f"Error recording request: {e}", exc_info=True)
+            self._on_version_bump_failed(supply_ids, e)
+        else:
+            self._unversioned -= supply_ids
+
+    def _on_version_bump_failed(self, supply_ids: set[str], error: Exception) -> None:
+        self._unversioned |= supply_ids
+        logger.error(f"Error bumping statistics versions, retrying with the next write: {error}", exc_info=error)
 
-    async def record_auction_result(
+    async def record_auction(
         self,
         supply_id: str,
-        winner_id: Optional[str],
+        country: str,
+        winner_id: str | None,
         winning_price: float,
         no_bid_ids: list[str],
-        timeout_ids: list[str] = None,
+        timeout_ids: list[str] | None = None,
+        latencies_ms: dict[str, float] | None = None,
+        ip: str | None = None,
     ) -> None:
+        """Record the request and the auction outcome atomically in one round trip."""
+        try:
+            increments = self.get_request_increments(country, ip)
+            increments.update(
+                self.get_auction_result_increments(winner_id, winning_price, no_bid_ids, timeout_ids, latencies_ms)
+            )
+            await self.apply_increments({supply_id: increments})
+
+        except Exception as e:
+            logger.error(f"Error recording auction: {e}", exc_info=True)
+
+    async def rebuild_registry(self, scan_count: int = 1000) -> int:
+        """
+        Backfill the supply registry from existing stats:* hashes.
+
+        Uses incremental SCAN (on every node of a cluster), so it never blocks Redis;
+        only needed once for data recorded before the registry existed.
+        """
+        supply_ids: set[str] = set()
+        async for key in self.redis.scan_iter(match="stats:*", count=scan_count, _type="hash"):
+            supply_ids.add(self._parse_key(key)[0])
+
+        if supply_ids:
+            await self.redis.sadd(self.SUPPLY_REGISTRY_KEY, *supply_ids)
+
+        logger.info(f"Statistics registry rebuilt with {len(supply_ids)} supplies")
+        return len(supply_ids)
+
+    def _is_stale_key(self, key: str) -> bool:
+        supply_id, shard, is_legacy = self._parse_key(key)
+        return is_legacy or shard >= self.get_shard_count(supply_id)
+
+    async def migrate_legacy_keys(self, scan_count: int = 1000) -> int:
+        """
+        Move counters from untagged stats:<supply_id> hashes into the hash-tagged layout.
+
+        Shards beyond a supply's configured shard count (left over after lowering it) are
+        folded back the same way, so reads never miss them. Safe to run while traffic is
+        flowing, also against workers still writing the old layout, and to rerun after a
+        failure: a stale hash is only deleted once its counters are on the current key, and
+        hashes left staged by an interrupted run are finished first (see _migrate_key).
+        """
+        async for staging_key in self.redis.scan_iter(match=f"{self.STAGING_KEY_PREFIX}*", count=scan_count):
+            await self._migrate_staged(staging_key)
+
+        legacy_keys = [
+            key
+            async for key in self.redis.scan_iter(match="stats:*", count=scan_count, _type="hash")
+            if self._is_stale_key(key)
+        ]
+
+        for key in legacy_keys:
+            await self._migrate_key(key)
+
+        if legacy_keys:
+            logger.info(f"Migrated {len(legacy_keys)} legacy statistics keys")
+        return len(legacy_keys)
+
+    @staticmethod
+    def _get_staging_key(key: str) -> str:
+        # keeps the slot of the stale key, so the two can be renamed in one script call; unique per move, as the
+        # name is also the token that applies the move once
+        tag = key[key.index("{") + 1 : key.index("}")] if "{" in key else key
+        return f"{StatisticsService.STAGING_KEY_PREFIX}{hash_tag(tag)}:{uuid.uuid4().hex}"
+
+    @staticmethod
+    def _get_staged_key(staging_key: str) -> str:
+        tag = staging_key.rpartition(":")[0][len(StatisticsService.STAGING_KEY_PREFIX) + 1 : -1]
+        return tag if tag.startswith("stats:") else f"stats:{hash_tag(tag)}"
+
+    async def _migrate_key(self, key: str) -> None:
+        """
+        Move a stale hash aside, add it onto the supply's current key, then delete it.
+
+        The two keys may live on different cluster nodes, so this can't be one script. Every move
+        gets its own staging key, whose name is the token the copy is applied with: it is applied
+        at most once, and a run interrupted before the delete is finished by the next one without
+        counting twice, while a later hash with the same content is a new move and counted again.
+        Returns early if another worker moved the hash first.
+        """
+        staging_key = self._get_staging_key(key)
+        if await self._stage_hash_script(keys=[key, staging_key], args=[]):
+            await self._migrate_staged(staging_key)
+
+    async def _migrate_staged(self, staging_key: str) -> None:
+        supply_id = self._parse_key(self._get_staged_key(staging_key))[0]
+        data = await self.redis.hgetall(staging_key)
+        if data:
+            fields = await self._get_compact_fields(data)
+            await self._apply_once_script(
+                keys=[self._get_supply_key(supply_id), f"stats_migrated:{self._get_shard_tag(supply_id, 0)}"],
+                args=[staging_key, self.MIGRATION_TOKEN_TTL, *self._get_script_args(fields)],
+            )
+            await self.redis.sadd(self.SUPPLY_REGISTRY_KEY, supply_id)
+            await self._bump_versions([supply_id])
+        await self.redis.delete(staging_key)
+
+    async def _get_compact_fields(self, data: dict[str, str]) -> dict[str, int]:
+        """Stored hash data of either layout as compact fields; legacy decimal revenue becomes micro-units."""
+        compact: dict[str, int] = {}
+        legacy: dict[str, int] = {}
+        for field, value in data.items():
+            if self._is_compact_field(field):
+                compact[field] = int(value)
+            elif field.endswith(":revenue"):
+                legacy[field] = round(float(value) * REVENUE_SCALE)
+            else:
+                legacy[field] = int(value)
+
+        for field, amount in (await self._encode_fields(legacy)).items():
+            compact[field] = compact.get(field, 0) + amount
+        return compact
+
+    async def migrate_legacy_fields(self, scan_count: int = 1000) -> int:
+        """
+        Convert verbose fields (total_reqs, country:<country>, bidder:<id>:<metric>) into the compact layout.
+
+        Runs in place and online: each field is moved by CONVERT_FIELDS_SCRIPT, which reads its
+        current value atomically. Reads decode both layouts, so fields written later by workers
+        still on the old layout stay visible until the next run converts them.
+        """
+        keys = [
+            key
+            async for key in self.redis.scan_iter(match="stats:*", count=scan_count, _type="hash")
+            if not self._is_stale_key(key)
+        ]
+        field_names = await pipeline_by_node(self.redis, keys, lambda pipe, key: pipe.hkeys(key))
+
+        converted = 0
+        for key, fields in field_names.items():
+            if not (legacy_fields := [field for field in fields if not self._is_compact_field(field)]):
+                continue
+
+            args: list[str | int] = []
+            for field, compact_field in (await self._get_compact_field_names(legacy_fields)).items():
+                args += [field, compact_field, REVENUE_SCALE if field.endswith(":revenue") else 1]
+            await self._convert_fields_script(keys=[key], args=args)
+            converted += 1
+
+        if converted:
+            logger.info(f"Converted {converted} statistics hashes to the compact layout")
+        return converted
+
+    async def ensure_registry(self) -> None:
         try:
-            key = self._get_supply_key(supply_id)
-            pipe = self.redis.pipeline()
+            if not await self.redis.exists(self.SUPPLY_REGISTRY_KEY):
+                await self.rebuild_registry()
+            await self.migrate()
+        except Exception as e:
+            logger.error(f"Error preparing statistics keys: {e}", exc_info=True)
+
+    async def migrate(self, force: bool = False) -> bool:
+        """
+        Run the key and field migrations unless they already ran for the current layout.
+
+        The layout includes the shard counts, as lowering one leaves shards to fold back. Returns
+        whether the migrations ran; force reruns them, e.g. once the last worker writing an old
+        layout is gone after a rolling deploy.
+        """
+        layout = f"{self.MIGRATIONS_VERSION}:{sorted(self.supply_shards.items())}"
+        if not force and await self.redis.get(self.MIGRATION_KEY) == layout:
+            return False
+
+        await self.migrate_legacy_keys()
+        await self.migrate_legacy_fields()
+        await self.redis.set(self.MIGRATION_KEY, layout)
+        return True
+
+    @staticmethod
+    def _merge_shards(shards: list[dict[str, str]]) -> dict[str, str]:
+        """Sum the counters of all shards of a supply; a single shard is returned as stored."""
+        if len(shards) == 1:
+            return shards[0]
+
+        totals: dict[str, int | float] = {}
+        for data in shards:
+            for field, value in data.items():
+                totals[field] = totals.get(field, 0) + (float(value) if "." in value else int(value))
+
+        # floats formatted like HINCRBYFLOAT replies: no exponent, no trailing zeros
+        return {
+            field: f"{total:.10f}".rstrip("0").rstrip(".") if isinstance(total, float) else str(total)
+            for field, total in totals.items()
+        }
+
+    def get_bucket_starts(self, start: datetime, end: datetime, granularity: StatisticsGranularity) -> list[int]:
+        """Starts (unix seconds) of the buckets overlapping [start, end); naive datetimes are taken as UTC."""
+        start_ts, end_ts = (
+            (value if value.tzinfo else value.replace(tzinfo=UTC)).timestamp() for value in (start, end)
+        )
+        if end_ts <= start_ts:
+            raise ValueError("Range end must be after its start")
+
+        size = GRANULARITY_SECONDS[granularity]
+        first, last = int(start_ts // size), math.ceil(end_ts / size)
+        if last - first > self.range_max_buckets:
+            raise ValueError(f"Range covers more than {self.range_max_buckets} {granularity} buckets")
+        return [bucket * size for bucket in range(first, last)]
 
-            if winner_id:
-                await pipe.hincrby(key, f"bidder:{winner_id}:wins", 1)
-                await pipe.hincrbyfloat(key, f"bidder:{winner_id}:revenue", winning_price)
+    async def get_range_statistics(
+        self,
+        start: datetime,
+        end: datetime,
+        granularity: StatisticsGranularity = "minute",
+    ) -> StatisticsRangeResult:
+        """
+        Sum the time buckets overlapping [start, end) per supply.
+
+        The range is widened to whole buckets; every bucket of every shard is read in one
+        pipelined pass per node. Buckets older than their retention are simply gone.
+        Raises ValueError for an empty or too long range.
+        """
+        bucket_starts = self.get_bucket_starts(start, end, granularity)
+        result = StatisticsRangeResult(
+            supplies={},
+            start=datetime.fromtimestamp(bucket_starts[0], UTC),
+            end=datetime.fromtimestamp(bucket_starts[-1] + GRANULARITY_SECONDS[granularity], UTC),
+            granularity=granularity,
+        )
 
-            for bidder_id in no_bid_ids:
-                await pipe.hincrby(key, f"bidder:{bidder_id}:no_bids", 1)
+        try:
+            supply_ids = sorted(await self.redis.smembers(self.SUPPLY_REGISTRY_KEY))
 
-            if timeout_ids:
-                for bidder_id in timeout_ids:
-                    await pipe.hincrby(key, f"bidder:{bidder_id}:timeouts", 1)
+            keys = {
+                supply_id: [
+                    self._get_bucket_key(supply_id, shard, granularity, bucket_start)
+                    for shard in range(self.get_shard_count(supply_id))
+                    for bucket_start in bucket_starts
+                ]
+                for supply_id in supply_ids
+            }
+            results = await pipeline_by_node(
+                self.redis,
+                [key for supply_keys in keys.values() for key in supply_keys],
+                lambda pipe, key: pipe.hgetall(key),
+            )
 
-            await pipe.execute()
+            for supply_id, supply_keys in keys.items():
+                if data := self._merge_shards([results[key] for key in supply_keys]):
+                    result.supplies[supply_id] = data
 
+            result.names = await self._load_names(self._get_entry_ids(result.supplies))
+            await self._count_unique_ips(
+                result,
+                lambda supply_id, country: [
+                    self._get_unique_ips_key(supply_id, country, granularity, bucket_start)
+                    for bucket_start in bucket_starts
+                ],
+            )
         except Exception as e:
-            logger.error(f"Error recording auction result: {e}", exc_info=True)
+            logger.error(f"Error getting range statistics: {e}", exc_info=True)
+
+        return result
 
     async def get_all_statistics(self) -> StatisticsResult | None:
+        return await self.get_statistics(StatisticsFilter())
+
+    async def get_statistics(self, statistics_filter: StatisticsFilter) -> StatisticsResult | None:
+        """
+        Statistics of the filtered supplies, None if there are none.
+
+        Listed supplies are read directly, without the registry. Narrow bidder, country and field
+        filters are pushed down to Redis: only the compact fields holding the selected counters
+        are read with HMGET, so the work scales with what is asked for. Wider ones (see
+        _is_narrow) read whole hashes and filter them here. Either way verbose fields not yet
+        converted aren't read. Unknown bidders and countries match nothing. With since, only
+        supplies changed after that version are read, and the result always carries the
+        version to pass as the next since.
+        """
         try:
-            keys = await self.redis.keys("stats:*")
+            version, changed = None, None
+            if statistics_filter.since is not None:
+                version, changed = await self._get_changed_supplies(statistics_filter.since)
 
-            if not keys:
-                return
+            if changed is not None:
+                supply_ids = set(changed)
+                if statistics_filter.supply_ids is not None:
+                    supply_ids &= set(statistics_filter.supply_ids)
+            elif statistics_filter.supply_ids is not None:
+                supply_ids = set(statistics_filter.supply_ids)
+            else:
+                supply_ids = await self.redis.smembers(self.SUPPLY_REGISTRY_KEY)
 
-            pipe = self.redis.pipeline()
-            for key in keys:
-                await pipe.hgetall(key)
+            supply_ids = sorted(supply_ids)
+            keys = [key for supply_id in supply_ids for key in self._get_supply_keys(supply_id)]
+            results: dict[str, dict[str, str]] = {}
 
-            results = await pipe.execute()
+            if keys and not statistics_filter.is_projected:
+                results = await pipeline_by_node(self.redis, keys, lambda pipe, key: pipe.hgetall(key))
+            elif keys and not self._is_narrow(statistics_filter):
+                is_selected = await self._get_field_selector(statistics_filter)
+                hashes = await pipeline_by_node(self.redis, keys, lambda pipe, key: pipe.hgetall(key))
+                results = {
+                    key: {field: value for field, value in data.items() if is_selected(field)}
+                    for key, data in hashes.items()
+                }
+            elif keys and (fields := await self._get_projected_fields(statistics_filter)):
+                values = await pipeline_by_node(self.redis, keys, lambda pipe, key: pipe.hmget(key, fields))
+                results = {
+                    key: {field: value for field, value in zip(fields, key_values, strict=True) if value is not None}
+                    for key, key_values in values.items()
+                }
 
             stats: dict[str, dict] = {}
-            for key, data in zip(keys, results):
-                supply_id = key.split(":", 1)[1]
-                stats[supply_id] = data
+            for supply_id in supply_ids:
+                # unknown supply, none of the selected counters, or the hash is gone (e.g. deleted manually)
+                if data := self._merge_shards([results.get(key, {}) for key in self._get_supply_keys(supply_id)]):
+                    stats[supply_id] = data
 
-            return StatisticsResult(supplies=stats)
+            if not stats and version is None:
+                return
+
+            result = StatisticsResult(
+                supplies=stats,
+                names=await self._load_names(self._get_entry_ids(stats)),
+                version=version,
+            )
+            if statistics_filter.fields is None or "unique_ips" in statistics_filter.fields:
+                await self._count_unique_ips(
+                    result, lambda supply_id, country: [self._get_unique_ips_key(supply_id, country)]
+                )
+            return result
         except Exception as e:
             logger.error(f"Error getting statistics: {e}", exc_info=True)
 
+    @staticmethod
+    def _get_countries(data: dict[str, str], names: dict[str, str]) -> list[str]:
+        """Countries a supply's hash data has requests from, in either layout."""
+        countries: set[str] = set()
+        for field in data:
+            if (match := COMPACT_FIELD_PATTERN.fullmatch(field)) and match.group(1) == COUNTRY_FIELD_CODE:
+                if (name := names.get(match.group(2))) is not None:
+                    countries.add(name.removeprefix(COUNTRY_NAME_PREFIX))
+            elif field.startswith("country:"):
+                countries.add(field.split(":", 1)[1])
+        return sorted(countries)
+
+    async def _count_unique_ips(
+        self,
+        result: StatisticsResult,
+        get_keys: Callable[[str, str | None], list[str]],
+    ) -> None:
+        """
+        Fill in the distinct IPs of the result's supplies, overall and per country they have requests from.
+
+        get_keys returns the HyperLogLogs of a supply (and country) to count together; they share
+        the supply's hash tag, so one PFCOUNT returns the size of their union.
+        """
+        if not self.unique_ips_enabled:
+            return
+
+        key_groups: dict[str, list[str]] = {}
+        counted: list[tuple[str, str | None, str]] = []
+        for supply_id, data in result.supplies.items():
+            for country in [None, *self._get_countries(data, result.names)]:
+                keys = get_keys(supply_id, country)
+                key_groups[keys[0]] = keys
+                counted.append((supply_id, country, keys[0]))
+
+        counts = await pipeline_by_node(self.redis, list(key_groups), lambda pipe, key: pipe.pfcount(*key_groups[key]))
+
+        for supply_id, country, key in counted:
+            # nothing recorded, e.g. data from before IPs were counted
+            if not counts[key]:
+                continue
+            if country is None:
+                result.unique_ips[supply_id] = counts[key]
+            else:
+                result.unique_ips_per_country.setdefault(supply_id, {})[country] = counts[key]
+
+    async def _get_changed_supplies(self, since: int) -> tuple[int, list[str] | None]:
+        """Current version and the supplies changed after since, read atomically; None when all have to be read."""
+        version, *changed = await self._get_changed_supplies_script(
+            keys=[self.VERSION_KEY, self.SUPPLY_VERSIONS_KEY],
+            args=[since],
+        )
+        # 0 asks for everything, including supplies last written before versions existed;
+        # a cursor ahead of the counter was handed out before Redis lost its data
+        if since == 0 or since > int(version):
+            return int(version), None
+        return int(version), changed
+
 
-statistics_service = StatisticsService(redis_client=redis_client)
+statistics_service = StatisticsService(
+    redis_client=redis_client,
+    supply_shards=settings.statistics.supply_shards,
+    bucket_ttls={"minute": settings.redis.default_ttl, "hour": settings.statistics.hourly_bucket_ttl_seconds}
+    if settings.statistics.buckets_enabled
+    else None,
+    range_max_buckets=settings.statistics.range_max_buckets,
+    unique_ips_enabled=settings.statistics.unique_ips_enabled,
+)
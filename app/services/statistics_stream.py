@@ -0,0 +1,198 @@
+import asyncio
+import contextlib
+import json
+import logging
+from collections.abc import AsyncIterator
+
+import redis.asyncio as redis
+
+from app.config.settings import settings
+from app.models.services.statistics import UNIQUE_IP_FIELD_PREFIX, StatisticsStreamMetrics
+from app.redis_db.client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# supply_id -> verbose field -> increment, the same shape the statistics writer flushes
+StatisticsDelta = dict[str, dict[str, int | float]]
+
+
+def merge_delta(delta: StatisticsDelta, increments: StatisticsDelta) -> StatisticsDelta:
+    for supply_id, fields in increments.items():
+        supply_delta = delta.setdefault(supply_id, {})
+        for field, amount in fields.items():
+            supply_delta[field] = supply_delta.get(field, 0) + amount
+    return delta
+
+
+class StatisticsStream:
+    """
+    Live feed of statistics increments for /stat/stream, shared by all workers through Redis pub/sub.
+
+    Every worker adds what its statistics writer flushed and publishes the sum once per
+    interval on CHANNEL. While a worker has stream subscribers, a single fan-out task
+    listens on the channel, merges the deltas of all workers per interval and hands the
+    serialized event to every subscriber's bounded buffer. A subscriber that falls
+    buffer_size events behind is cut off (its deltas would no longer add up) and has to
+    re-read /stat.
+    """
+
+    CHANNEL = "stats_stream"
+    # idle connections get a comment line this often, so proxies don't close them
+    KEEPALIVE_SECONDS = 15
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        interval_ms: int = 1000,
+        buffer_size: int = 16,
+        reconnect_delay: float = 5.0,
+    ) -> None:
+        self.redis = redis_client
+        self.interval = interval_ms / 1000
+        self.buffer_size = buffer_size
+        self.reconnect_delay = reconnect_delay
+
+        # flushed by this worker, not yet published
+        self._delta: StatisticsDelta = {}
+        self._publisher: asyncio.Task | None = None
+        self._fan_out: asyncio.Task | None = None
+        self._subscribers: set[asyncio.Queue[str]] = set()
+        self._stopped = False
+
+        self._published = 0
+        self._broadcasts = 0
+        self._lagged = 0
+
+    @property
+    def metrics(self) -> StatisticsStreamMetrics:
+        return StatisticsStreamMetrics(
+            subscribers=len(self._subscribers),
+            published=self._published,
+            broadcasts=self._broadcasts,
+            lagged=self._lagged,
+        )
+
+    def start(self) -> None:
+        self._stopped = False
+        if self._publisher is None:
+            self._publisher = asyncio.create_task(self._run_publisher(), name="statistics-stream-publisher")
+
+    async def stop(self) -> None:
+        """Publish what is left and end all subscriptions."""
+        self._stopped = True
+        for subscriber in self._subscribers:
+            subscriber.shutdown(immediate=True)
+        self._subscribers.clear()
+
+        for task in (self._publisher, self._fan_out):
+            if task is not None:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        self._publisher = self._fan_out = None
+
+        await self._publish()
+
+    def add(self, increments: StatisticsDelta) -> None:
+        """Count increments written by this worker into the next published delta."""
+        # requester IPs aren't counters, and aren't for a public feed either
+        counters = {
+            supply_id: {
+                field: amount for field, amount in fields.items() if not field.startswith(UNIQUE_IP_FIELD_PREFIX)
+            }
+            for supply_id, fields in increments.items()
+        }
+        merge_delta(self._delta, counters)
+
+    async def _run_publisher(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._publish()
+
+    async def _publish(self) -> None:
+        if not self._delta:
+            return
+
+        delta, self._delta = self._delta, {}
+        try:
+            await self.redis.publish(self.CHANNEL, json.dumps(delta, separators=(",", ":")))
+            self._published += 1
+        except Exception as e:
+            # the stream is best effort, /stat stays authoritative
+            logger.error(f"Error publishing statistics delta: {e}", exc_info=True)
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        """Server-sent events: a delta event per interval with new statistics, a keepalive comment otherwise."""
+        subscriber: asyncio.Queue[str] = asyncio.Queue(maxsize=self.buffer_size)
+        self._subscribers.add(subscriber)
+        if self._fan_out is None:
+            self._fan_out = asyncio.create_task(self._run_fan_out(), name="statistics-stream-fan-out")
+
+        try:
+            yield f"retry: {int(self.reconnect_delay * 1000)}\n\n"
+            while True:
+                try:
+                    async with asyncio.timeout(self.KEEPALIVE_SECONDS):
+                        event = await subscriber.get()
+                except TimeoutError:
+                    event = ": keepalive\n\n"
+                yield event
+        except asyncio.QueueShutDown:
+            if not self._stopped:
+                yield 'event: lagged\ndata: {"detail":"Subscriber fell behind, re-read /stat and reconnect"}\n\n'
+        finally:
+            self._subscribers.discard(subscriber)
+            # nobody left to listen for on this worker
+            if not self._subscribers and self._fan_out is not None:
+                self._fan_out.cancel()
+                self._fan_out = None
+
+    async def _run_fan_out(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Statistics stream listener failed, reconnecting in {self.reconnect_delay}s: {e}")
+
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen(self) -> None:
+        loop = asyncio.get_running_loop()
+        pubsub = self.redis.pubsub()
+
+        try:
+            await pubsub.subscribe(self.CHANNEL)
+
+            while True:
+                delta: StatisticsDelta = {}
+                deadline = loop.time() + self.interval
+
+                while (remaining := deadline - loop.time()) > 0:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+                    if message is not None:
+                        merge_delta(delta, json.loads(message["data"]))
+
+                if delta:
+                    self._broadcast(f"event: delta\ndata: {json.dumps(delta, separators=(',', ':'))}\n\n")
+        finally:
+            await pubsub.aclose()
+
+    def _broadcast(self, event: str) -> None:
+        self._broadcasts += 1
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.put_nowait(event)
+            except asyncio.QueueFull:
+                # a gap would make the subscriber's running totals wrong, so it is dropped instead
+                self._lagged += 1
+                self._subscribers.discard(subscriber)
+                subscriber.shutdown()
+
+
+statistics_stream = StatisticsStream(
+    redis_client=redis_client,
+    interval_ms=settings.statistics.stream_interval_ms,
+    buffer_size=settings.statistics.stream_buffer_size,
+)
@@ -0,0 +1,245 @@
+import asyncio
+import logging
+from typing import Literal
+
+from redis.exceptions import RedisError
+
+from app.config.settings import settings
+from app.models.services.statistics import UNIQUE_IP_FIELD_PREFIX, StatisticsWriterMetrics
+from app.services.statistics import StatisticsService, StatisticsWriteError, statistics_service
+from app.services.statistics_stream import StatisticsStream, statistics_stream
+
+logger = logging.getLogger(__name__)
+
+# compact queue entries: (supply_id, field increments)
+StatisticsEvent = tuple[str, dict[str, int | float]]
+
+
+class StatisticsWriter:
+    """
+    Takes statistics recording off the auction response path.
+
+    Exposes the same recording interface as StatisticsService, but only enqueues events into a
+    bounded in-process queue. A background task drains it, coalesces increments per
+    (supply, field) and writes them in one pipeline every flush_interval_ms or flush_max_events.
+    """
+
+    def __init__(
+        self,
+        statistics_service: StatisticsService,
+        max_queue_size: int = 10000,
+        flush_interval_ms: int = 50,
+        flush_max_events: int = 1000,
+        overflow_policy: Literal["drop", "block"] = "drop",
+        statistics_stream: StatisticsStream | None = None,
+    ) -> None:
+        self.statistics_service = statistics_service
+        # gets every flushed batch for /stat/stream
+        self.statistics_stream = statistics_stream
+        self.max_queue_size = max_queue_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_max_events = flush_max_events
+        self.overflow_policy = overflow_policy
+
+        self._queue: asyncio.Queue[StatisticsEvent] = asyncio.Queue(maxsize=max_queue_size)
+        self._task: asyncio.Task | None = None
+        self._closed = False
+        # increments of failed flushes, retried with the next batch
+        self._pending: dict[str, dict[str, int | float]] = {}
+
+        self._enqueued = 0
+        self._dropped = 0
+        self._dropped_reported = 0
+        self._blocked = 0
+        self._flushed_events = 0
+        self._flushes = 0
+        self._failed_flushes = 0
+        self._dropped_unique_ips = 0
+        self._discarded_increments = 0
+
+    @property
+    def metrics(self) -> StatisticsWriterMetrics:
+        return StatisticsWriterMetrics(
+            queue_size=self._queue.qsize(),
+            max_queue_size=self.max_queue_size,
+            enqueued=self._enqueued,
+            dropped=self._dropped,
+            blocked=self._blocked,
+            flushed_events=self._flushed_events,
+            flushes=self._flushes,
+            failed_flushes=self._failed_flushes,
+            dropped_unique_ips=self._dropped_unique_ips,
+            discarded_increments=self._discarded_increments,
+        )
+
+    def start(self) -> None:
+        if self._task is None:
+            if self._closed:
+                self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+                self._closed = False
+            self._task = asyncio.create_task(self._run(), name="statistics-writer")
+
+    async def stop(self) -> None:
+        """Stop accepting events and flush everything still queued."""
+        if self._task is None:
+            return
+
+        self._queue.shutdown()
+        self._closed = True
+        await self._task
+        self._task = None
+
+    async def record_auction(
+        self,
+        supply_id: str,
+        country: str,
+        winner_id: str | None,
+        winning_price: float,
+        no_bid_ids: list[str],
+        timeout_ids: list[str] | None = None,
+        latencies_ms: dict[str, float] | None = None,
+        ip: str | None = None,
+    ) -> None:
+        increments = self.statistics_service.get_request_increments(country, ip)
+        increments.update(
+            self.statistics_service.get_auction_result_increments(
+                winner_id, winning_price, no_bid_ids, timeout_ids, latencies_ms
+            )
+        )
+        await self._enqueue((supply_id, increments))
+
+    async def _enqueue(self, event: StatisticsEvent) -> None:
+        try:
+            if self.overflow_policy == "block" and self._queue.full():
+                self._blocked += 1
+                await self._queue.put(event)
+            else:
+                self._queue.put_nowait(event)
+        except (asyncio.QueueFull, asyncio.QueueShutDown):
+            self._dropped += 1
+            return
+
+        self._enqueued += 1
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            try:
+                # increments of a failed flush are retried after an interval even if no events come in
+                async with asyncio.timeout(self.flush_interval if self._pending else None):
+                    events = [await self._queue.get()]
+            except TimeoutError:
+                await self._flush([])
+                continue
+            except asyncio.QueueShutDown:
+                break
+
+            deadline = loop.time() + self.flush_interval
+
+            while len(events) < self.flush_max_events:
+                while len(events) < self.flush_max_events and not self._queue.empty():
+                    events.append(self._queue.get_nowait())
+
+                if len(events) >= self.flush_max_events or (remaining := deadline - loop.time()) <= 0:
+                    break
+
+                try:
+                    async with asyncio.timeout(remaining):
+                        events.append(await self._queue.get())
+                except (TimeoutError, asyncio.QueueShutDown):
+                    break
+
+            await self._flush(events)
+
+        # last attempt for increments of earlier failed flushes
+        if self._pending:
+            await self._flush([])
+
+    @staticmethod
+    def _coalesce(
+        increments: dict[str, dict[str, int | float]],
+        events: list[StatisticsEvent],
+    ) -> dict[str, dict[str, int | float]]:
+        for supply_id, fields in events:
+            supply_increments = increments.setdefault(supply_id, {})
+            for field, amount in fields.items():
+                supply_increments[field] = supply_increments.get(field, 0) + amount
+        return increments
+
+    def _get_retried_increments(
+        self,
+        increments: dict[str, dict[str, int | float]],
+    ) -> dict[str, dict[str, int | float]]:
+        """
+        Increments of a failed flush worth keeping for the next one.
+
+        Counters are bounded by supplies x fields, but every distinct requester IP is a field of
+        its own, so IPs aren't kept: an outage under IP-spray traffic would grow the buffer
+        without bound. Unique IP counts are approximate anyway.
+        """
+        retried: dict[str, dict[str, int | float]] = {}
+        for supply_id, fields in increments.items():
+            retried[supply_id] = {}
+            for field, amount in fields.items():
+                if field.startswith(UNIQUE_IP_FIELD_PREFIX):
+                    self._dropped_unique_ips += 1
+                else:
+                    retried[supply_id][field] = amount
+        return retried
+
+    async def _flush(self, events: list[StatisticsEvent]) -> None:
+        increments = self._coalesce(self._pending, events)
+        self._pending = {}
+
+        try:
+            await self.statistics_service.apply_increments(increments)
+        except StatisticsWriteError as e:
+            # the other supplies are written, retrying them would count them twice
+            failed = {supply_id: increments.pop(supply_id) for supply_id in e.failed_supply_ids}
+            self._on_flush_failed(events, failed, e)
+            if self.statistics_stream is not None:
+                self.statistics_stream.add(increments)
+            return
+        except (RedisError, ConnectionError, TimeoutError) as e:
+            self._on_flush_failed(events, increments, e)
+            return
+        except Exception as e:
+            # not a Redis outage, retrying the same increments would fail the same way and block every later flush
+            self._failed_flushes += 1
+            self._discarded_increments += sum(len(fields) for fields in increments.values())
+            logger.error(f"Error flushing {len(events)} statistics event(s), discarding them: {e}", exc_info=True)
+            return
+
+        self._flushes += 1
+        self._flushed_events += len(events)
+
+        if self.statistics_stream is not None:
+            self.statistics_stream.add(increments)
+
+        if self._dropped > self._dropped_reported:
+            logger.warning(
+                f"Statistics queue overflow: dropped {self._dropped - self._dropped_reported} event(s) "
+                f"since the last flush"
+            )
+            self._dropped_reported = self._dropped
+
+    def _on_flush_failed(
+        self,
+        events: list[StatisticsEvent],
+        increments: dict[str, dict[str, int | float]],
+        error: Exception,
+    ) -> None:
+        self._failed_flushes += 1
+        self._pending = self._get_retried_increments(increments)
+        logger.error(f"Error flushing {len(events)} statistics event(s), will retry: {error}", exc_info=error)
+
+
+statistics_writer = StatisticsWriter(
+    statistics_service=statistics_service,
+    max_queue_size=settings.statistics.queue_size,
+    flush_interval_ms=settings.statistics.flush_interval_ms,
+    flush_max_events=settings.statistics.flush_max_events,
+    overflow_policy=settings.statistics.overflow_policy,
+    statistics_stream=statistics_stream,
+)
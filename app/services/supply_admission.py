@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import math
+import time
+
+import redis.asyncio as redis
+
+from app.config.settings import settings
+from app.models.services.catalog import SupplyLimit
+from app.redis_db.client import redis_client
+from app.redis_db.scripts import LuaScript
+from app.services.circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+# Token bucket shared by all workers, tokens are handed out in batches.
+# KEYS[1] - hash {tokens, ts}; ARGV: refill rate (tokens/s), capacity, tokens requested
+# Returns {tokens granted, ms until the next token if none were granted}.
+TAKE_TOKENS_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * rate / 1000)
+
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+
+redis.call('HSET', KEYS[1], 'tokens', string.format('%.6f', tokens), 'ts', now)
+-- once the bucket would be full again the key carries no information
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) * 1000 / rate) + 1000)
+
+if granted > 0 then
+    return {granted, 0}
+end
+return {0, math.ceil((1 - tokens) * 1000 / rate)}
+"""
+
+
+class SupplyRateLimitExceededError(Exception):
+    def __init__(self, supply_id: str, retry_after: float) -> None:
+        super().__init__(f"QPS limit exceeded for supply {supply_id}")
+        self.supply_id = supply_id
+        self.retry_after = retry_after
+
+
+class SupplyAdmission:
+    """
+    Per-supply QPS caps enforced by token buckets in Redis.
+
+    Workers lease tokens from the shared bucket in batches of about lease_seconds worth
+    of traffic and spend them locally, so most admissions need no network I/O. Leased
+    tokens are dropped after lease_ttl_seconds, so the global cap can be overshot by at
+    most one batch per worker. A denial is remembered until the bucket refills one
+    token. If Redis is unavailable auctions are admitted, the caps are a safety valve
+    rather than a hard quota.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        lease_seconds: float = 0.1,
+        lease_ttl_seconds: float = 1.0,
+        circuit_breaker: CircuitBreaker | None = None,
+    ) -> None:
+        self.redis = redis_client
+        self.lease_seconds = lease_seconds
+        self.lease_ttl = lease_ttl_seconds
+        self.circuit_breaker = circuit_breaker
+        self._script = LuaScript(redis_client, TAKE_TOKENS_SCRIPT)
+        # supply_id -> (leased tokens left, monotonic expiry); an empty lease expires when Redis has a token again
+        self._leases: dict[str, tuple[int, float]] = {}
+        # one refill in flight per supply, concurrent requests wait for it
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def _get_key(supply_id: str) -> str:
+        return f"supply_qps:{supply_id}"
+
+    def get_batch_size(self, limit: SupplyLimit) -> int:
+        return max(1, min(math.ceil(limit.qps * self.lease_seconds), limit.burst))
+
+    def _take_local(self, supply_id: str) -> bool | None:
+        """True/False if the local lease decides, None if it's expired and needs a refill."""
+        tokens, expires_at = self._leases.get(supply_id, (0, 0.0))
+        if expires_at <= time.monotonic():
+            return None
+
+        if tokens > 1:
+            self._leases[supply_id] = (tokens - 1, expires_at)
+            return True
+        if tokens == 1:
+            # spent, the next request leases a new batch
+            del self._leases[supply_id]
+            return True
+        return False
+
+    def _retry_after(self, supply_id: str) -> float:
+        _, expires_at = self._leases.get(supply_id, (0, 0.0))
+        return max(expires_at - time.monotonic(), 0.0)
+
+    async def admit(self, supply_id: str, limit: SupplyLimit) -> None:
+        """Raises SupplyRateLimitExceededError if the supply is over its QPS cap."""
+        if (admitted := self._take_local(supply_id)) is None:
+            lock = self._locks.setdefault(supply_id, asyncio.Lock())
+            async with lock:
+                # another request may have refilled the lease while we waited
+                if (admitted := self._take_local(supply_id)) is None:
+                    admitted = await self._refill(supply_id, limit)
+
+        if not admitted:
+            raise SupplyRateLimitExceededError(supply_id, retry_after=self._retry_after(supply_id))
+
+    async def _refill(self, supply_id: str, limit: SupplyLimit) -> bool:
+        if self.circuit_breaker is not None and not self.circuit_breaker.allow_request():
+            return True
+
+        try:
+            granted, retry_after_ms = await self._script(
+                keys=[self._get_key(supply_id)],
+                args=[limit.qps, limit.burst, self.get_batch_size(limit)],
+            )
+        except Exception as e:
+            logger.error(f"Error leasing QPS tokens for supply {supply_id}, admitting: {e}")
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_failure()
+            return True
+        except BaseException:
+            # cancelled: no outcome, but the breaker mustn't wait for the trial forever
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.release_trial()
+            raise
+
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success()
+
+        now = time.monotonic()
+        if granted := int(granted):
+            # this request spends the first token
+            if granted > 1:
+                self._leases[supply_id] = (granted - 1, now + self.lease_ttl)
+            else:
+                self._leases.pop(supply_id, None)
+            return True
+
+        self._leases[supply_id] = (0, now + int(retry_after_ms) / 1000)
+        return False
+
+
+supply_admission = SupplyAdmission(
+    redis_client=redis_client,
+    lease_seconds=settings.supply_limits.lease_seconds,
+    lease_ttl_seconds=settings.supply_limits.lease_ttl_seconds,
+    circuit_breaker=CircuitBreaker(
+        name="supply_admission_redis",
+        failure_threshold=settings.rate_limit.breaker_failure_threshold,
+        cooldown_seconds=settings.rate_limit.breaker_cooldown_seconds,
+    ),
+)
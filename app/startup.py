@@ -3,6 +3,9 @@ import logging
 from app.commands.generate_auction_data import generate_auction_data
 from app.commands.load_data import load_json_to_db
 from app.config.settings import settings
+from app.db.session import session_factory
+from app.services.catalog import catalog_service
+from app.services.statistics import statistics_service
 
 logger = logging.getLogger(__name__)
 
@@ -32,3 +35,8 @@ async def setup() -> None:
 
     logger.info(f"Load successful. {load_result=}")
 
+    async with session_factory() as session:
+        await catalog_service.refresh(session)
+
+    await statistics_service.ensure_registry()
+
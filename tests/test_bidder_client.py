@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from unittest.mock import patch
+
+from app.clients.bidder.base import BidderTimeoutError
+from app.clients.bidder.http import HttpBidderClient
+from app.clients.bidder.simulated import SimulatedBidderClient
+from app.models.clients.bidder import BidderRequest
+from app.models.services.catalog import BidderInfo
+
+BID_REQUEST = BidderRequest(supply_id="supply1", country="US", tmax=200)
+
+
+def create_http_client(handler) -> HttpBidderClient:
+    """Helper to create an HTTP bidder client backed by a mock transport."""
+    return HttpBidderClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_http_client_returns_price():
+    """Test that a 200 response is parsed into a bid price."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json={"price": 0.42})
+
+    client = create_http_client(handler)
+    bidder = BidderInfo(id="bidder1", country="US", endpoint="http://bidder1/bid")
+
+    assert await client.request_bid(bidder, BID_REQUEST, timeout=0.2) == 0.42
+    assert requests == [{"supply_id": "supply1", "country": "US", "tmax": 200}]
+
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_http_client_no_bid():
+    """Test that 204 and null prices are no-bids."""
+    responses = iter([httpx.Response(204), httpx.Response(200, json={"price": None})])
+    client = create_http_client(lambda request: next(responses))
+    bidder = BidderInfo(id="bidder1", country="US", endpoint="http://bidder1/bid")
+
+    assert await client.request_bid(bidder, BID_REQUEST, timeout=0.2) is None
+    assert await client.request_bid(bidder, BID_REQUEST, timeout=0.2) is None
+
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_http_client_timeout():
+    """Test that transport timeouts and an exhausted budget surface as BidderTimeoutError."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    client = create_http_client(handler)
+    bidder = BidderInfo(id="bidder1", country="US", endpoint="http://bidder1/bid")
+
+    with pytest.raises(BidderTimeoutError):
+        await client.request_bid(bidder, BID_REQUEST, timeout=0.2)
+
+    with pytest.raises(BidderTimeoutError):
+        await client.request_bid(bidder, BID_REQUEST, timeout=0)
+
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_http_client_reuses_pool_per_bidder():
+    """Test that each bidder keeps one pooled client until its endpoint changes."""
+    client = create_http_client(lambda request: httpx.Response(200, json={"price": 0.1}))
+    bidder = BidderInfo(id="bidder1", country="US", endpoint="http://bidder1/bid")
+    other = BidderInfo(id="bidder2", country="US", endpoint="http://bidder2/bid")
+
+    pool = client._get_client(bidder)
+    assert client._get_client(bidder) is pool
+    assert client._get_client(other) is not pool
+
+    moved = BidderInfo(id="bidder1", country="US", endpoint="http://bidder1-new/bid")
+    new_pool = client._get_client(moved)
+    assert new_pool is not pool
+
+    await client.aclose()
+    assert pool.is_closed
+    assert new_pool.is_closed
+
+
+@pytest.mark.asyncio
+async def test_http_client_closes_pools_of_removed_bidders():
+    """Test that pools of bidders dropped from the catalog or moved to another endpoint are closed."""
+    client = create_http_client(lambda request: httpx.Response(200, json={"price": 0.1}))
+    kept = BidderInfo(id="bidder1", country="US", endpoint="http://bidder1/bid")
+    removed = BidderInfo(id="bidder2", country="US", endpoint="http://bidder2/bid")
+    moved = BidderInfo(id="bidder3", country="US", endpoint="http://bidder3/bid")
+    pools = {bidder.id: client._get_client(bidder) for bidder in (kept, removed, moved)}
+
+    client.retain_bidders({"bidder1": kept, "bidder3": moved.model_copy(update={"endpoint": "http://bidder3-new/bid"})})
+    await asyncio.gather(*client._closing)
+
+    assert not pools["bidder1"].is_closed
+    assert pools["bidder2"].is_closed
+    assert pools["bidder3"].is_closed
+    assert client._get_client(kept) is pools["bidder1"]
+
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_http_client_requires_endpoint():
+    """Test that bidders without an endpoint can't be called over HTTP."""
+    client = create_http_client(lambda request: httpx.Response(200, json={"price": 0.1}))
+
+    with pytest.raises(ValueError, match="no endpoint"):
+        await client.request_bid(BidderInfo(id="bidder1", country="US"), BID_REQUEST, timeout=0.2)
+
+
+@pytest.mark.asyncio
+async def test_simulated_client_respects_bidder_timeout():
+    """Test that the per-bidder timeout caps the simulated latency budget."""
+    client = SimulatedBidderClient()
+    bidder = BidderInfo(id="bidder1", country="US", timeout_ms=50)
+
+    with patch("random.randint", return_value=100), patch("asyncio.sleep") as mock_sleep:
+        with pytest.raises(BidderTimeoutError):
+            await client.request_bid(bidder, BID_REQUEST, timeout=0.2)
+
+        mock_sleep.assert_not_called()
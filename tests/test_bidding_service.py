@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 import pytest_asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -6,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models.bidder import Bidder
 from app.db.models.supply import Supply
 from app.models.services.bidding import AuctionResult
+from app.models.services.statistics import LATENCY_BUCKETS_MS, get_histogram_bucket
 from app.services.bidding import BiddingService
 from app.services.statistics import StatisticsService
 
@@ -20,8 +23,7 @@ def mock_session():
 def mock_statistics_service():
     """Create a mock statistics service."""
     service = AsyncMock(spec=StatisticsService)
-    service.record_request = AsyncMock()
-    service.record_auction_result = AsyncMock()
+    service.record_auction = AsyncMock()
     return service
 
 
@@ -36,6 +38,8 @@ def create_mock_bidder(bidder_id: str, country: str) -> Bidder:
     bidder = MagicMock(spec=Bidder)
     bidder.id = bidder_id
     bidder.country = country
+    bidder.endpoint = None
+    bidder.timeout_ms = None
     return bidder
 
 
@@ -44,6 +48,8 @@ def create_mock_supply(supply_id: str, bidders: list[Bidder]) -> Supply:
     supply = MagicMock(spec=Supply)
     supply.id = supply_id
     supply.bidders = bidders
+    supply.qps_limit = None
+    supply.qps_burst = None
     return supply
 
 
@@ -81,9 +87,12 @@ async def test_run_auction_successful(bidding_service, mock_statistics_service):
         assert result.winner in ["bidder1", "bidder2", "bidder3"]
         assert 0.01 <= result.price <= 1.0
 
-        # Verify statistics were recorded
-        mock_statistics_service.record_request.assert_called_once_with(supply_id, country)
-        mock_statistics_service.record_auction_result.assert_called_once()
+        # Verify request and result were recorded in one call
+        mock_statistics_service.record_auction.assert_called_once()
+        call_args = mock_statistics_service.record_auction.call_args
+        assert call_args.kwargs["supply_id"] == supply_id
+        assert call_args.kwargs["country"] == country
+        assert call_args.kwargs["winner_id"] == result.winner
 
 
 @pytest.mark.asyncio
@@ -100,8 +109,7 @@ async def test_run_auction_supply_not_found(bidding_service, mock_statistics_ser
             await bidding_service.run_auction(supply_id, country)
 
         # No statistics should be recorded for invalid supply
-        mock_statistics_service.record_request.assert_not_called()
-        mock_statistics_service.record_auction_result.assert_not_called()
+        mock_statistics_service.record_auction.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -122,9 +130,12 @@ async def test_run_auction_no_eligible_bidders(bidding_service, mock_statistics_
         with pytest.raises(ValueError, match="No eligible bidders found"):
             await bidding_service.run_auction(supply_id, country)
 
-        # Statistics recorded
-        mock_statistics_service.record_request.assert_called_once()
-        mock_statistics_service.record_auction_result.assert_not_called()
+        # Request recorded without any bidder outcomes
+        mock_statistics_service.record_auction.assert_called_once()
+        call_args = mock_statistics_service.record_auction.call_args
+        assert call_args.kwargs["winner_id"] is None
+        assert call_args.kwargs["no_bid_ids"] == []
+        assert call_args.kwargs["timeout_ids"] == []
 
 
 @pytest.mark.asyncio
@@ -154,8 +165,8 @@ async def test_run_auction_all_bidders_skip(bidding_service, mock_statistics_ser
             await bidding_service.run_auction(supply_id, country, tmax)
 
         # Statistics should record the failure
-        mock_statistics_service.record_auction_result.assert_called_once()
-        call_args = mock_statistics_service.record_auction_result.call_args
+        mock_statistics_service.record_auction.assert_called_once()
+        call_args = mock_statistics_service.record_auction.call_args
         assert call_args.kwargs["winner_id"] is None
         assert len(call_args.kwargs["no_bid_ids"]) == 2
 
@@ -201,7 +212,7 @@ async def test_run_auction_with_timeouts(bidding_service, mock_statistics_servic
         assert result.winner == "bidder2"
 
         # Check statistics recorded timeouts
-        call_args = mock_statistics_service.record_auction_result.call_args
+        call_args = mock_statistics_service.record_auction.call_args
         timeout_ids = call_args.kwargs["timeout_ids"]
         assert len(timeout_ids) == 2
         assert "bidder1" in timeout_ids
@@ -299,7 +310,7 @@ async def test_run_auction_mixed_outcomes(bidding_service, mock_statistics_servi
         assert result.winner in ["bidder1", "bidder4"]
 
         # Check statistics
-        call_args = mock_statistics_service.record_auction_result.call_args
+        call_args = mock_statistics_service.record_auction.call_args
         no_bid_ids = call_args.kwargs["no_bid_ids"]
         timeout_ids = call_args.kwargs["timeout_ids"]
 
@@ -356,4 +367,149 @@ async def test_run_auction_latency_simulation(bidding_service, mock_statistics_s
         await bidding_service.run_auction(supply_id, country, tmax)
 
         # Verify asyncio.sleep was called with correct latency (100ms = 0.1s)
-        mock_sleep.assert_called_once_with(0.1)
\ No newline at end of file
+        mock_sleep.assert_called_once_with(0.1)
+
+@pytest.mark.asyncio
+async def test_run_auction_bidders_run_concurrently(bidding_service, mock_statistics_service):
+    """Test that auction wall time is bounded by the slowest bidder, not the sum of latencies."""
+    supply_id = "test_supply"
+    country = "US"
+    tmax = 200
+
+    bidders = [create_mock_bidder(f"bidder{i}", "US") for i in range(1, 6)]
+    mock_supply = create_mock_supply(supply_id, bidders)
+
+    with patch("app.services.bidding.supply_dao") as mock_supply_dao, \
+         patch("app.services.bidding.bidder_dao") as mock_bidder_dao, \
+         patch("random.random", return_value=0.5), \
+         patch("random.uniform", return_value=0.75), \
+         patch("random.randint", return_value=100):
+
+        mock_supply_dao.get = AsyncMock(return_value=mock_supply)
+        mock_bidder_dao.get_eligible_for_supply = AsyncMock(return_value=bidders)
+
+        started = asyncio.get_running_loop().time()
+        result = await bidding_service.run_auction(supply_id, country, tmax)
+        elapsed = asyncio.get_running_loop().time() - started
+
+        # 5 bidders x 100ms sequentially would take 500ms
+        assert elapsed < 0.3
+        assert result.winner in [bidder.id for bidder in bidders]
+
+
+@pytest.mark.asyncio
+async def test_run_auction_deadline_cancels_stragglers(bidding_service, mock_statistics_service):
+    """Test that bidders still pending at the tmax deadline are cancelled and counted as timeouts."""
+    supply_id = "test_supply"
+    country = "US"
+    tmax = 50
+
+    bidders = [
+        create_mock_bidder("fast", "US"),
+        create_mock_bidder("slow", "US"),
+    ]
+    mock_supply = create_mock_supply(supply_id, bidders)
+    slow_cancelled = asyncio.Event()
+
+    async def mock_request_bid(bidder, bid_request, timeout):
+        if bidder.id == "fast":
+            return 0.5
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            slow_cancelled.set()
+            raise
+
+    with patch("app.services.bidding.supply_dao") as mock_supply_dao, \
+         patch("app.services.bidding.bidder_dao") as mock_bidder_dao, \
+         patch.object(bidding_service.bidder_client, "request_bid", side_effect=mock_request_bid):
+
+        mock_supply_dao.get = AsyncMock(return_value=mock_supply)
+        mock_bidder_dao.get_eligible_for_supply = AsyncMock(return_value=bidders)
+
+        started = asyncio.get_running_loop().time()
+        result = await bidding_service.run_auction(supply_id, country, tmax)
+        elapsed = asyncio.get_running_loop().time() - started
+
+        assert result.winner == "fast"
+        assert elapsed < 0.5
+        assert slow_cancelled.is_set()
+
+        call_args = mock_statistics_service.record_auction.call_args
+        assert call_args.kwargs["timeout_ids"] == ["slow"]
+
+
+@pytest.mark.asyncio
+async def test_run_auction_records_latencies(bidding_service, mock_statistics_service):
+    """Test that bid, no-bid and timeout latencies are recorded, failed requests are not."""
+    supply_id = "test_supply"
+    bidders = [
+        create_mock_bidder("bidder", "US"),
+        create_mock_bidder("no_bidder", "US"),
+        create_mock_bidder("slow", "US"),
+        create_mock_bidder("broken", "US"),
+    ]
+    mock_supply = create_mock_supply(supply_id, bidders)
+
+    async def mock_request_bid(bidder, bid_request, timeout):
+        if bidder.id == "broken":
+            raise RuntimeError("connection reset")
+        await asyncio.sleep({"bidder": 0.02, "no_bidder": 0.01, "slow": 10}[bidder.id])
+        return 0.5 if bidder.id == "bidder" else None
+
+    with patch("app.services.bidding.supply_dao") as mock_supply_dao, \
+         patch("app.services.bidding.bidder_dao") as mock_bidder_dao, \
+         patch.object(bidding_service.bidder_client, "request_bid", side_effect=mock_request_bid):
+
+        mock_supply_dao.get = AsyncMock(return_value=mock_supply)
+        mock_bidder_dao.get_eligible_for_supply = AsyncMock(return_value=bidders)
+
+        await bidding_service.run_auction(supply_id, "US", tmax=60)
+
+        latencies_ms = mock_statistics_service.record_auction.call_args.kwargs["latencies_ms"]
+        assert sorted(latencies_ms) == ["bidder", "no_bidder", "slow"]
+        assert 15 <= latencies_ms["bidder"] < 60
+        assert 5 <= latencies_ms["no_bidder"] < latencies_ms["bidder"]
+        assert 55 <= latencies_ms["slow"] < 200
+
+
+@pytest.mark.asyncio
+async def test_run_auction_records_requester_ip(bidding_service, mock_statistics_service):
+    """Test that the requester IP is passed on to the statistics for unique IP counting."""
+    bidders = [create_mock_bidder("bidder1", "US")]
+    mock_supply = create_mock_supply("test_supply", bidders)
+
+    with patch("app.services.bidding.supply_dao") as mock_supply_dao, \
+         patch("app.services.bidding.bidder_dao") as mock_bidder_dao, \
+         patch.object(bidding_service.bidder_client, "request_bid", AsyncMock(return_value=0.5)):
+
+        mock_supply_dao.get = AsyncMock(return_value=mock_supply)
+        mock_bidder_dao.get_eligible_for_supply = AsyncMock(return_value=bidders)
+
+        await bidding_service.run_auction("test_supply", "US", ip="203.0.113.7")
+
+        assert mock_statistics_service.record_auction.call_args.kwargs["ip"] == "203.0.113.7"
+
+
+@pytest.mark.asyncio
+async def test_run_auction_records_timeouts_at_cut_off(bidding_service, mock_statistics_service):
+    """Test that a timeout the simulated client reports without waiting is recorded at the timeout, not at 0ms."""
+    bidders = [create_mock_bidder("slow", "US")]
+    mock_supply = create_mock_supply("test_supply", bidders)
+
+    with patch("app.services.bidding.supply_dao") as mock_supply_dao, \
+         patch("app.services.bidding.bidder_dao") as mock_bidder_dao, \
+         patch("random.randint", return_value=150):  # latency beyond tmax
+
+        mock_supply_dao.get = AsyncMock(return_value=mock_supply)
+        mock_bidder_dao.get_eligible_for_supply = AsyncMock(return_value=bidders)
+
+        with pytest.raises(ValueError, match="No bids received"):
+            await bidding_service.run_auction("test_supply", "US", tmax=100)
+
+        call_args = mock_statistics_service.record_auction.call_args
+        assert call_args.kwargs["timeout_ids"] == ["slow"]
+        latency_ms = call_args.kwargs["latencies_ms"]["slow"]
+        assert 95 <= latency_ms <= 100
+        # lands in the bucket of the timeout (70-100ms), not the lowest one
+        assert get_histogram_bucket(LATENCY_BUCKETS_MS, latency_ms) == LATENCY_BUCKETS_MS.index(100)
@@ -0,0 +1,246 @@
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, patch
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.services.catalog import BidderInfo, CatalogChange, SupplyLimit
+from app.services.bidding import BiddingService
+from app.services.catalog import CatalogService
+from app.services.catalog_listener import CatalogListener
+from app.services.statistics import StatisticsService
+
+
+@pytest_asyncio.fixture
+def catalog_service():
+    """Create an empty CatalogService instance."""
+    return CatalogService()
+
+
+@pytest_asyncio.fixture
+def mock_session():
+    """Create a mock database session."""
+    return AsyncMock(spec=AsyncSession)
+
+
+def create_bidders(countries: dict[str, str]) -> dict[str, BidderInfo]:
+    """Helper to create catalog bidder entries from a bidder_id -> country mapping."""
+    return {bidder_id: BidderInfo(id=bidder_id, country=country) for bidder_id, country in countries.items()}
+
+
+def test_build_snapshot_indexes_by_supply_and_country():
+    """Test that eligible bidders are indexed by (supply_id, country)."""
+    snapshot = CatalogService.build_snapshot(
+        supply_bidders={"supply1": ("bidder1", "bidder2", "bidder3"), "supply2": ("bidder2",), "supply3": ()},
+        bidders=create_bidders({"bidder1": "US", "bidder2": "GB", "bidder3": "US"}),
+    )
+
+    assert snapshot.supplies == frozenset({"supply1", "supply2", "supply3"})
+    assert snapshot.eligible_bidders[("supply1", "US")] == ("bidder1", "bidder3")
+    assert snapshot.eligible_bidders[("supply1", "GB")] == ("bidder2",)
+    assert snapshot.eligible_bidders[("supply2", "GB")] == ("bidder2",)
+    assert ("supply2", "US") not in snapshot.eligible_bidders
+
+
+def test_build_snapshot_skips_unknown_bidders():
+    """Test that links to bidders without a country are ignored."""
+    snapshot = CatalogService.build_snapshot(
+        supply_bidders={"supply1": ("bidder1", "ghost")},
+        bidders=create_bidders({"bidder1": "US"}),
+    )
+
+    assert snapshot.eligible_bidders == {("supply1", "US"): ("bidder1",)}
+
+
+def test_snapshot_is_immutable():
+    """Test that the snapshot can't be modified in place."""
+    snapshot = CatalogService.build_snapshot(supply_bidders={}, bidders=create_bidders({}))
+
+    with pytest.raises(Exception):
+        snapshot.supplies = frozenset({"supply1"})
+
+
+@pytest.mark.asyncio
+async def test_refresh_swaps_snapshot(catalog_service, mock_session):
+    """Test that refresh loads the catalog from the database and replaces the snapshot."""
+    old_snapshot = catalog_service.snapshot
+
+    with (
+        patch("app.services.catalog.supply_dao") as mock_supply_dao,
+        patch("app.services.catalog.bidder_dao") as mock_bidder_dao,
+    ):
+        mock_supply_dao.get_bidder_links = AsyncMock(
+            return_value=[("supply1", "bidder1"), ("supply1", "bidder2"), ("supply2", None)]
+        )
+        mock_bidder_dao.get_catalog_rows = AsyncMock(
+            return_value=[("bidder1", "US", None, None), ("bidder2", "US", "http://localhost:9001/bid", 80)]
+        )
+        mock_supply_dao.get_qps_limits = AsyncMock(return_value=[("supply1", 50.0, None)])
+
+        snapshot = await catalog_service.refresh(mock_session)
+
+    assert snapshot is catalog_service.snapshot
+    assert snapshot is not old_snapshot
+    assert catalog_service.supply_exists("supply2")
+    assert catalog_service.get_eligible_bidder_ids("supply1", "US") == ("bidder1", "bidder2")
+    assert catalog_service.get_eligible_bidder_ids("supply2", "US") == ()
+    assert catalog_service.get_eligible_bidders("supply1", "US")[1] == BidderInfo(
+        id="bidder2", country="US", endpoint="http://localhost:9001/bid", timeout_ms=80
+    )
+    assert catalog_service.get_supply_limit("supply1") == SupplyLimit(qps=50.0, burst=50)
+    assert catalog_service.get_supply_limit("supply2") is None
+
+
+@pytest.mark.asyncio
+async def test_run_auction_uses_catalog_without_db(catalog_service, mock_session):
+    """Test that the auction hot path doesn't touch the database when a catalog is provided."""
+    catalog_service._snapshot = CatalogService.build_snapshot(
+        supply_bidders={"supply1": ("bidder1",)},
+        bidders=create_bidders({"bidder1": "US"}),
+    )
+    statistics_service = AsyncMock(spec=StatisticsService)
+    bidding_service = BiddingService(mock_session, statistics_service, catalog_service=catalog_service)
+
+    with (
+        patch("app.services.bidding.supply_dao") as mock_supply_dao,
+        patch("app.services.bidding.bidder_dao") as mock_bidder_dao,
+        patch("random.random", return_value=0.5),
+        patch("random.uniform", return_value=0.75),
+        patch("random.randint", return_value=0),
+    ):
+        result = await bidding_service.run_auction("supply1", "US")
+
+        assert result.winner == "bidder1"
+        mock_supply_dao.get.assert_not_called()
+        mock_bidder_dao.get_eligible_for_supply.assert_not_called()
+        mock_session.execute.assert_not_called()
+
+        with pytest.raises(ValueError, match="Supply .* not found"):
+            await bidding_service.run_auction("unknown", "US")
+
+        with pytest.raises(ValueError, match="No eligible bidders found"):
+            await bidding_service.run_auction("supply1", "GB")
+
+
+def test_apply_changes_incrementally(catalog_service):
+    """Test that row-level changes update the index without a database round trip."""
+    catalog_service._snapshot = CatalogService.build_snapshot(
+        supply_bidders={"supply1": ("bidder1",)},
+        bidders=create_bidders({"bidder1": "US"}),
+    )
+
+    catalog_service.apply_changes(
+        [
+            CatalogChange(table="bidders", op="INSERT", new={"id": "bidder2", "country": "US"}),
+            CatalogChange(table="supplies", op="INSERT", new={"id": "supply2"}),
+            CatalogChange(table="supply_bidder", op="INSERT", new={"supply_id": "supply1", "bidder_id": "bidder2"}),
+            CatalogChange(table="supply_bidder", op="INSERT", new={"supply_id": "supply2", "bidder_id": "bidder1"}),
+            CatalogChange(
+                table="bidders",
+                op="UPDATE",
+                old={"id": "bidder1", "country": "US"},
+                new={"id": "bidder1", "country": "GB"},
+            ),
+        ]
+    )
+
+    assert catalog_service.supply_exists("supply2")
+    assert catalog_service.get_eligible_bidder_ids("supply1", "US") == ("bidder2",)
+    assert catalog_service.get_eligible_bidder_ids("supply1", "GB") == ("bidder1",)
+    assert catalog_service.get_eligible_bidder_ids("supply2", "GB") == ("bidder1",)
+
+    catalog_service.apply_changes(
+        [
+            CatalogChange(table="supply_bidder", op="DELETE", old={"supply_id": "supply1", "bidder_id": "bidder2"}),
+            CatalogChange(table="supplies", op="DELETE", old={"id": "supply2"}),
+        ]
+    )
+
+    assert not catalog_service.supply_exists("supply2")
+    assert catalog_service.get_eligible_bidder_ids("supply1", "US") == ()
+
+
+def test_apply_changes_updates_supply_limits(catalog_service):
+    """Test that QPS caps follow supply row changes."""
+    catalog_service._snapshot = CatalogService.build_snapshot(
+        supply_bidders={"supply1": ()},
+        bidders={},
+        supply_limits={"supply1": SupplyLimit(qps=10, burst=10)},
+    )
+
+    catalog_service.apply_changes(
+        [
+            CatalogChange(
+                table="supplies",
+                op="UPDATE",
+                old={"id": "supply1", "qps_limit": 10, "qps_burst": None},
+                new={"id": "supply1", "qps_limit": 100, "qps_burst": 250},
+            ),
+            CatalogChange(table="supplies", op="INSERT", new={"id": "supply2", "qps_limit": None, "qps_burst": None}),
+        ]
+    )
+
+    assert catalog_service.get_supply_limit("supply1") == SupplyLimit(qps=100, burst=250)
+    assert catalog_service.get_supply_limit("supply2") is None
+
+    catalog_service.apply_changes(
+        [
+            CatalogChange(
+                table="supplies",
+                op="UPDATE",
+                old={"id": "supply1", "qps_limit": 100, "qps_burst": 250},
+                new={"id": "supply1", "qps_limit": None, "qps_burst": None},
+            ),
+        ]
+    )
+
+    assert catalog_service.get_supply_limit("supply1") is None
+
+
+def test_apply_changes_notifies_subscribers(catalog_service):
+    """Test that subscribers get every new snapshot, and a failing one doesn't fail the update."""
+    snapshots = []
+    catalog_service.subscribe(lambda snapshot: 1 / 0)
+    catalog_service.subscribe(snapshots.append)
+
+    catalog_service.apply_changes([CatalogChange(table="bidders", op="INSERT", new={"id": "bidder1", "country": "US"})])
+    catalog_service.apply_changes([CatalogChange(table="bidders", op="DELETE", old={"id": "bidder1", "country": "US"})])
+
+    assert [set(snapshot.bidders) for snapshot in snapshots] == [{"bidder1"}, set()]
+    assert catalog_service.snapshot is snapshots[-1]
+
+
+def test_apply_changes_rejects_truncate(catalog_service):
+    """Test that TRUNCATE can't be applied incrementally."""
+    with pytest.raises(ValueError):
+        catalog_service.apply_changes([CatalogChange(table="bidders", op="TRUNCATE")])
+
+
+@pytest.mark.asyncio
+async def test_listener_applies_notifications(catalog_service):
+    """Test that NOTIFY payloads are applied to the catalog."""
+    listener = CatalogListener(catalog_service, dsn="postgresql://localhost/test")
+
+    with patch.object(listener, "_full_refresh", new_callable=AsyncMock) as mock_full_refresh:
+        await listener._apply(
+            [
+                '{"table": "supplies", "op": "INSERT", "new": {"id": "supply1"}}',
+                '{"table": "bidders", "op": "INSERT", "new": {"id": "bidder1", "country": "US"}}',
+                '{"table": "supply_bidder", "op": "INSERT", "new": {"supply_id": "supply1", "bidder_id": "bidder1"}}',
+            ]
+        )
+
+        mock_full_refresh.assert_not_called()
+
+    assert catalog_service.get_eligible_bidder_ids("supply1", "US") == ("bidder1",)
+
+
+@pytest.mark.asyncio
+async def test_listener_falls_back_to_full_refresh(catalog_service):
+    """Test that changes that can't be applied incrementally trigger a full reload."""
+    listener = CatalogListener(catalog_service, dsn="postgresql://localhost/test")
+
+    with patch.object(listener, "_full_refresh", new_callable=AsyncMock) as mock_full_refresh:
+        await listener._apply(['{"table": "supply_bidder", "op": "TRUNCATE"}'])
+        await listener._apply(["not json"])
+
+        assert mock_full_refresh.await_count == 2
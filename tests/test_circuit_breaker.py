@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from app.services.circuit_breaker import CircuitBreaker
+
+
+def test_circuit_breaker_opens_after_threshold() -> None:
+    """Test that the breaker keeps allowing calls until failure_threshold consecutive failures."""
+    breaker = CircuitBreaker(name="test", failure_threshold=3, cooldown_seconds=5)
+
+    for _ in range(2):
+        assert breaker.allow_request() is True
+        breaker.record_failure()
+    assert breaker.state == "closed"
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.allow_request() is False
+
+
+def test_circuit_breaker_success_resets_failures() -> None:
+    """Test that failures have to be consecutive to open the breaker."""
+    breaker = CircuitBreaker(name="test", failure_threshold=2, cooldown_seconds=5)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == "closed"
+
+
+def test_circuit_breaker_half_open_trial(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that after the cooldown a single trial call decides whether the breaker closes."""
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+
+    breaker = CircuitBreaker(name="test", failure_threshold=1, cooldown_seconds=5)
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 5.1)
+    assert breaker.state == "half_open"
+    assert breaker.allow_request() is True
+    # only one trial at a time
+    assert breaker.allow_request() is False
+
+    # failed trial re-opens for another cooldown
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 10.2)
+    assert breaker.allow_request() is True
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow_request() is True
+
+
+def test_circuit_breaker_released_trial(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a trial given back without an outcome lets the next call be the trial."""
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+
+    breaker = CircuitBreaker(name="test", failure_threshold=1, cooldown_seconds=5)
+    breaker.record_failure()
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 5.1)
+    assert breaker.allow_request() is True
+    breaker.release_trial()
+    assert breaker.state == "half_open"
+    assert breaker.allow_request() is True
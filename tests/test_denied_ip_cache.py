@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from app.models.services.rate_limit import RateLimitResult
+from app.services.denied_ip_cache import DeniedIpCache
+
+
+def denied(retry_after: float) -> RateLimitResult:
+    return RateLimitResult(allowed=False, limit=3, window_seconds=60, remaining=0, retry_after=retry_after)
+
+
+def test_denied_ip_cache_hit_and_miss() -> None:
+    """Test that cached IPs are reported as denied and unknown IPs count as misses."""
+    cache = DeniedIpCache(max_entries=10)
+    cache.add("10.0.0.1", denied(30))
+
+    result = cache.get("10.0.0.1")
+    assert result.allowed is False
+    assert result.limit == 3
+    assert 29 < result.retry_after <= 30
+    assert cache.get("10.0.0.2") is None
+
+    metrics = cache.metrics
+    assert metrics.hits == 1
+    assert metrics.misses == 1
+    assert metrics.entries == 1
+
+
+def test_denied_ip_cache_expires_entries(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that an entry stops denying once its retry-after has passed."""
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+
+    cache = DeniedIpCache(max_entries=10)
+    cache.add("10.0.0.1", denied(5))
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 5.1)
+
+    assert cache.get("10.0.0.1") is None
+    assert cache.metrics.entries == 0
+
+
+def test_denied_ip_cache_bounded() -> None:
+    """Test that an IP spray can't grow the cache past max_entries."""
+    cache = DeniedIpCache(max_entries=100)
+
+    for i in range(1000):
+        cache.add(f"10.0.{i // 256}.{i % 256}", denied(60))
+
+    metrics = cache.metrics
+    assert metrics.entries == 100
+    assert metrics.evictions == 900
+    # the most recent offenders are kept
+    assert cache.get("10.0.3.231") is not None
+    assert cache.get("10.0.0.0") is None
+
+
+def test_denied_ip_cache_ignores_non_positive_retry_after() -> None:
+    """Test that a denial without a retry-after isn't cached."""
+    cache = DeniedIpCache(max_entries=10)
+    cache.add("10.0.0.1", denied(0))
+
+    assert cache.metrics.entries == 0
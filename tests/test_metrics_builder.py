@@ -0,0 +1,67 @@
+from app.builders.api.metrics import MetricsResponseBuilder
+from app.models.services.rate_limit import DeniedIpCacheMetrics
+from app.models.services.response_cache import ResponseCacheMetrics
+from app.models.services.statistics import StatisticsStreamMetrics, StatisticsWriterMetrics
+
+
+def test_metrics_include_statistics_writer():
+    """Test that the writer's queue depth is a gauge and its event counts are counters."""
+    writer_metrics = StatisticsWriterMetrics(
+        queue_size=7,
+        max_queue_size=100,
+        enqueued=50,
+        dropped=2,
+        blocked=0,
+        flushed_events=41,
+        flushes=5,
+        failed_flushes=1,
+        dropped_unique_ips=3,
+        discarded_increments=0,
+    )
+
+    lines = MetricsResponseBuilder.build(writer_metrics=writer_metrics).splitlines()
+
+    assert "# TYPE statistics_writer_queue_size gauge" in lines
+    assert "statistics_writer_queue_size 7" in lines
+    assert "# TYPE statistics_writer_dropped_total counter" in lines
+    assert "statistics_writer_dropped_total 2" in lines
+    assert "statistics_writer_failed_flushes_total 1" in lines
+
+
+def test_metrics_include_stat_response_cache():
+    """Test that the /stat cache's hit and refresh counts are exported."""
+    response_cache_metrics = ResponseCacheMetrics(entries=1, hits=90, refreshes=10, coalesced=4)
+
+    lines = MetricsResponseBuilder.build(response_cache_metrics=response_cache_metrics).splitlines()
+
+    assert "stat_response_cache_entries 1" in lines
+    assert "stat_response_cache_hits_total 90" in lines
+    assert "stat_response_cache_refreshes_total 10" in lines
+    assert "stat_response_cache_coalesced_total 4" in lines
+
+
+def test_metrics_include_statistics_stream():
+    """Test that open /stat/stream connections are a gauge and lagged subscribers a counter."""
+    stream_metrics = StatisticsStreamMetrics(subscribers=3, published=12, broadcasts=30, lagged=1)
+
+    lines = MetricsResponseBuilder.build(stream_metrics=stream_metrics).splitlines()
+
+    assert "# TYPE statistics_stream_subscribers gauge" in lines
+    assert "statistics_stream_subscribers 3" in lines
+    assert "statistics_stream_lagged_total 1" in lines
+
+
+def test_metrics_include_denied_ip_cache():
+    """Test that the denied IP cache's hits and misses are exported."""
+    denied_ip_cache_metrics = DeniedIpCacheMetrics(entries=5, max_entries=100, hits=40, misses=60, evictions=0)
+
+    lines = MetricsResponseBuilder.build(denied_ip_cache_metrics=denied_ip_cache_metrics).splitlines()
+
+    assert "rate_limit_denied_ip_cache_entries 5" in lines
+    assert "rate_limit_denied_ip_cache_hits_total 40" in lines
+    assert "rate_limit_denied_ip_cache_misses_total 60" in lines
+
+
+def test_metrics_skip_components_not_given():
+    """Test that only the latency metrics are rendered without component metrics."""
+    assert "statistics_writer" not in MetricsResponseBuilder.build()
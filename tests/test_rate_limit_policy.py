@@ -0,0 +1,71 @@
+import ipaddress
+
+from app.models.settings import RateLimitPolicySettings, RateLimitWindowSettings
+from app.services.rate_limit_policy import PrefixTrie, RateLimitPolicyMatcher, get_client_id, parse_ip
+
+
+def make_policy(
+    name: str,
+    cidrs: list[str] | None = None,
+    supply_ids: list[str] | None = None,
+) -> RateLimitPolicySettings:
+    return RateLimitPolicySettings(
+        name=name,
+        cidrs=cidrs or [],
+        supply_ids=supply_ids or [],
+        windows=[RateLimitWindowSettings(max_requests=10, window_seconds=60)],
+    )
+
+
+def test_prefix_trie_returns_all_matching_prefixes() -> None:
+    """Test that every stored prefix containing the address is returned, shortest first."""
+    trie = PrefixTrie(max_bits=32)
+    trie.insert(ipaddress.ip_network("10.0.0.0/8"), "a")
+    trie.insert(ipaddress.ip_network("10.1.0.0/16"), "b")
+    trie.insert(ipaddress.ip_network("10.1.2.0/24"), "c")
+    trie.insert(ipaddress.ip_network("192.168.0.0/16"), "d")
+
+    assert trie.match(ipaddress.ip_address("10.1.2.3")) == [(8, "a"), (16, "b"), (24, "c")]
+    assert trie.match(ipaddress.ip_address("10.2.0.1")) == [(8, "a")]
+    assert trie.match(ipaddress.ip_address("172.16.0.1")) == []
+
+
+def test_matcher_longest_prefix_wins() -> None:
+    """Test that the most specific CIDR policy is chosen."""
+    matcher = RateLimitPolicyMatcher(
+        [
+            make_policy("datacenter", cidrs=["10.0.0.0/8"]),
+            make_policy("partner", cidrs=["10.1.0.0/16"]),
+            make_policy("v6-partner", cidrs=["2001:db8::/32"]),
+        ]
+    )
+
+    assert matcher.resolve(parse_ip("10.1.2.3")).name == "partner"
+    assert matcher.resolve(parse_ip("10.2.2.3")).name == "datacenter"
+    assert matcher.resolve(parse_ip("2001:db8:1::1")).name == "v6-partner"
+    assert matcher.resolve(parse_ip("192.168.1.1")) is None
+
+
+def test_matcher_supply_policy_beats_cidr_policy() -> None:
+    """Test that a policy for the request's supply wins over supply-agnostic ones."""
+    matcher = RateLimitPolicyMatcher(
+        [
+            make_policy("partner", cidrs=["10.1.0.0/16"]),
+            make_policy("premium", supply_ids=["premium_supply"]),
+        ]
+    )
+
+    assert matcher.resolve(parse_ip("10.1.2.3"), "premium_supply").name == "premium"
+    assert matcher.resolve(parse_ip("10.1.2.3"), "other_supply").name == "partner"
+    assert matcher.resolve(parse_ip("192.168.1.1"), "premium_supply").name == "premium"
+    # unparseable IPs can still match policies without CIDRs
+    assert matcher.resolve(None, "premium_supply").name == "premium"
+
+
+def test_get_client_id_aggregates_ipv6() -> None:
+    """Test that IPv6 clients are counted per prefix while IPv4 and invalid IPs stay as they are."""
+    assert get_client_id("2001:db8:1:2:aaaa::1", parse_ip("2001:db8:1:2:aaaa::1"), 64) == "2001:db8:1:2::/64"
+    assert get_client_id("2001:db8:1:2:bbbb::9", parse_ip("2001:db8:1:2:bbbb::9"), 64) == "2001:db8:1:2::/64"
+    assert get_client_id("2001:db8::1", parse_ip("2001:db8::1"), 128) == "2001:db8::1"
+    assert get_client_id("192.168.1.1", parse_ip("192.168.1.1"), 64) == "192.168.1.1"
+    assert get_client_id("not-an-ip", parse_ip("not-an-ip"), 64) == "not-an-ip"
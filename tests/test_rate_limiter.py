@@ -3,9 +3,20 @@ import asyncio
 import pytest
 import pytest_asyncio
 from redis.asyncio import StrictRedis
+from redis.exceptions import ConnectionError as RedisConnectionError
 
 from app.config.settings import settings
-from app.services.rate_limiter import RedisRateLimiter
+from app.models.settings import RateLimitPolicySettings, RateLimitWindowSettings
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.denied_ip_cache import DeniedIpCache
+from app.services.local_rate_limiter import LocalRateLimiter
+from app.services.rate_limit_policy import RateLimitPolicyMatcher
+from app.services.rate_limiter import (
+    GcraRateLimiter,
+    RedisRateLimiter,
+    SlidingWindowCounterRateLimiter,
+    create_rate_limiter,
+)
 
 
 @pytest_asyncio.fixture
@@ -254,3 +265,328 @@ async def test_rate_limiter_accurate_sliding_window(test_redis) -> None:
 
     # Cleanup
     await test_redis.delete(f"rate_limit:{test_ip}")
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_check_returns_remaining_and_retry_after(rate_limiter: RedisRateLimiter) -> None:
+    """Test that check reports the remaining budget and when the next slot frees up."""
+    test_ip = "192.168.1.12"
+
+    for expected_remaining in (2, 1, 0):
+        result = await rate_limiter.check(test_ip)
+        assert result.allowed is True
+        assert result.limit == 3
+        assert result.remaining == expected_remaining
+        assert result.retry_after == 0
+
+    result = await rate_limiter.check(test_ip)
+    assert result.allowed is False
+    assert result.remaining == 0
+    assert 0 < result.retry_after <= 60
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_concurrent_requests(rate_limiter: RedisRateLimiter, test_redis) -> None:
+    """Test that concurrent requests from one IP can't all slip through the check."""
+    test_ip = "192.168.1.13"
+
+    results = await asyncio.gather(*(rate_limiter.is_allowed(test_ip) for _ in range(20)))
+
+    assert results.count(True) == 3
+    # every allowed request is recorded, even if they landed in the same instant
+    assert await test_redis.zcard(f"rate_limit:{test_ip}") == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("limiter_class", [SlidingWindowCounterRateLimiter, GcraRateLimiter])
+async def test_constant_memory_limiters_enforce_limit(test_redis, limiter_class: type[RedisRateLimiter]) -> None:
+    """Test that the O(1)-memory algorithms allow a burst of max_requests and then block."""
+    limiter = limiter_class(redis_client=test_redis, max_requests=3, window_seconds=60)
+    test_ip = "192.168.2.1"
+
+    for expected_remaining in (2, 1, 0):
+        result = await limiter.check(test_ip)
+        assert result.allowed is True
+        assert result.remaining == expected_remaining
+
+    result = await limiter.check(test_ip)
+    assert result.allowed is False
+    assert 0 < result.retry_after <= 60
+
+    # other IPs are unaffected
+    assert await limiter.is_allowed("192.168.2.2") is True
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("limiter_class", [SlidingWindowCounterRateLimiter, GcraRateLimiter])
+async def test_constant_memory_limiters_single_key(test_redis, limiter_class: type[RedisRateLimiter]) -> None:
+    """Test that the state per IP doesn't grow with the number of requests."""
+    limiter = limiter_class(redis_client=test_redis, max_requests=100, window_seconds=60)
+    test_ip = "192.168.2.3"
+
+    for _ in range(50):
+        assert await limiter.is_allowed(test_ip) is True
+
+    key = f"rate_limit:{test_ip}"
+    assert await test_redis.keys("rate_limit:*") == [key]
+    if limiter_class is SlidingWindowCounterRateLimiter:
+        assert await test_redis.hlen(key) == 3
+    else:
+        assert await test_redis.hlen(key) == 1
+    assert 0 < await test_redis.pttl(key) <= 120000
+
+
+@pytest.mark.asyncio
+async def test_gcra_spaces_requests_after_burst(test_redis) -> None:
+    """Test that GCRA frees one slot per emission interval instead of waiting for the whole window."""
+    # 3 requests per 3 seconds: one slot every second
+    limiter = GcraRateLimiter(redis_client=test_redis, max_requests=3, window_seconds=3)
+    test_ip = "192.168.2.4"
+
+    for _ in range(3):
+        assert await limiter.is_allowed(test_ip) is True
+
+    result = await limiter.check(test_ip)
+    assert result.allowed is False
+    assert result.retry_after <= 1
+
+    await asyncio.sleep(1.1)
+    assert await limiter.is_allowed(test_ip) is True
+    assert await limiter.is_allowed(test_ip) is False
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_counter_weights_previous_window(test_redis) -> None:
+    """Test that requests from the previous window still count, proportionally to the overlap."""
+    limiter = SlidingWindowCounterRateLimiter(redis_client=test_redis, max_requests=3, window_seconds=60)
+    test_ip = "192.168.2.5"
+    window_ms = 60000
+    seconds, microseconds = await test_redis.time()
+    now = seconds * 1000 + microseconds // 1000
+    index = now // window_ms
+
+    # previous window was full and the current one has just started
+    await test_redis.hset(f"rate_limit:{test_ip}", mapping={"w1": index - 1, "c1": 3, "p1": 0})
+
+    elapsed = now - index * window_ms
+    estimate = 3 * (window_ms - elapsed) / window_ms
+    assert await limiter.is_allowed(test_ip) is (estimate + 1 <= 3)
+
+
+def test_create_rate_limiter_uses_settings(monkeypatch) -> None:
+    """Test that the algorithm and limits are taken from settings."""
+    monkeypatch.setattr(settings.rate_limit, "algorithm", "gcra")
+    monkeypatch.setattr(settings.rate_limit, "max_requests", 10)
+    monkeypatch.setattr(settings.rate_limit, "window_seconds", 5)
+
+    limiter = create_rate_limiter(redis_client=None)
+
+    assert isinstance(limiter, GcraRateLimiter)
+    assert limiter.max_requests == 10
+    assert limiter.window == 5
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_denied_cache_short_circuits_redis(test_redis) -> None:
+    """Test that once an IP is denied, further checks are answered without Redis."""
+    denied_cache = DeniedIpCache(max_entries=10)
+    limiter = RedisRateLimiter(redis_client=test_redis, max_requests=3, window_seconds=60, denied_cache=denied_cache)
+    test_ip = "192.168.3.1"
+
+    for _ in range(3):
+        assert await limiter.is_allowed(test_ip) is True
+    assert await limiter.is_allowed(test_ip) is False
+    assert denied_cache.metrics.entries == 1
+
+    # Redis forgetting the IP doesn't matter while the local denial is active
+    await test_redis.delete(f"rate_limit:{test_ip}")
+
+    result = await limiter.check(test_ip)
+    assert result.allowed is False
+    assert 0 < result.retry_after <= 60
+    assert denied_cache.metrics.hits == 1
+    assert not await test_redis.exists(f"rate_limit:{test_ip}")
+
+
+class UnavailableRedis:
+    """Redis client stand-in whose every call fails like a dead server."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def script_load(self, *args, **kwargs):
+        self.calls += 1
+        raise RedisConnectionError("Connection refused")
+
+    async def evalsha(self, *args, **kwargs):
+        self.calls += 1
+        raise RedisConnectionError("Connection refused")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(("failure_policy", "expected"), [("fail_open", True), ("fail_closed", False)])
+async def test_rate_limiter_failure_policy(failure_policy: str, expected: bool) -> None:
+    """Test that a Redis failure is answered according to the failure policy."""
+    limiter = RedisRateLimiter(redis_client=UnavailableRedis(), failure_policy=failure_policy)
+
+    assert await limiter.is_allowed("192.168.4.1") is expected
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_local_fallback() -> None:
+    """Test that the local fallback keeps enforcing a (per-worker) limit while Redis is down."""
+    limiter = RedisRateLimiter(
+        redis_client=UnavailableRedis(),
+        max_requests=4,
+        failure_policy="local",
+        # two workers share the limit of 4
+        fallback_limiter=LocalRateLimiter(workers=2),
+    )
+
+    assert await limiter.is_allowed("192.168.4.2") is True
+    assert await limiter.is_allowed("192.168.4.2") is True
+    result = await limiter.check("192.168.4.2")
+    assert result.allowed is False
+    assert 0 < result.retry_after <= 60
+
+    assert await limiter.is_allowed("192.168.4.3") is True
+
+
+def test_rate_limiter_local_policy_requires_fallback() -> None:
+    """Test that the local policy can't be configured without a fallback limiter."""
+    with pytest.raises(ValueError):
+        RedisRateLimiter(redis_client=UnavailableRedis(), failure_policy="local")
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_circuit_breaker_skips_redis() -> None:
+    """Test that once the breaker opens, checks stop reaching Redis."""
+    redis = UnavailableRedis()
+    limiter = RedisRateLimiter(
+        redis_client=redis,
+        failure_policy="fail_open",
+        circuit_breaker=CircuitBreaker(name="test", failure_threshold=2, cooldown_seconds=60),
+    )
+
+    for _ in range(10):
+        assert await limiter.is_allowed("192.168.4.4") is True
+
+    assert redis.calls == 2
+    assert limiter.circuit_breaker.state == "open"
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_cancelled_trial_releases_circuit_breaker() -> None:
+    """Test that a half-open trial cancelled mid-call doesn't keep the breaker from trying again."""
+    redis = UnavailableRedis()
+    breaker = CircuitBreaker(name="test", failure_threshold=1, cooldown_seconds=0)
+    limiter = RedisRateLimiter(redis_client=redis, failure_policy="fail_open", circuit_breaker=breaker)
+    assert await limiter.is_allowed("192.168.4.6") is True
+    assert breaker.state == "half_open"
+
+    async def cancelled(*args, **kwargs):
+        raise asyncio.CancelledError
+
+    redis.script_load = cancelled
+    with pytest.raises(asyncio.CancelledError):
+        await limiter.check("192.168.4.6")
+
+    assert breaker.allow_request() is True
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_circuit_breaker_closes_on_success(test_redis) -> None:
+    """Test that a healthy Redis keeps the breaker closed."""
+    breaker = CircuitBreaker(name="test", failure_threshold=1, cooldown_seconds=60)
+    limiter = RedisRateLimiter(redis_client=test_redis, circuit_breaker=breaker)
+
+    assert await limiter.is_allowed("192.168.4.5") is True
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("limiter_class", [RedisRateLimiter, SlidingWindowCounterRateLimiter, GcraRateLimiter])
+async def test_rate_limiter_multiple_windows(test_redis, limiter_class: type[RedisRateLimiter]) -> None:
+    """Test that a burst window and a longer window are enforced together by one script call."""
+    policies = RateLimitPolicyMatcher([
+        RateLimitPolicySettings(
+            name="burst",
+            windows=[
+                RateLimitWindowSettings(max_requests=2, window_seconds=1),
+                RateLimitWindowSettings(max_requests=3, window_seconds=60),
+            ],
+        )
+    ])
+    limiter = limiter_class(redis_client=test_redis, policies=policies)
+    test_ip = "192.168.5.1"
+
+    assert await limiter.is_allowed(test_ip) is True
+    assert await limiter.is_allowed(test_ip) is True
+
+    # burst window exhausted
+    result = await limiter.check(test_ip)
+    assert result.allowed is False
+    assert result.window_seconds == 1
+    assert result.retry_after <= 1
+
+    # long enough for the counter's previous burst window to drop out too
+    await asyncio.sleep(2.1)
+    assert await limiter.is_allowed(test_ip) is True
+
+    # now the minute window is exhausted, even though the burst window has room
+    result = await limiter.check(test_ip)
+    assert result.allowed is False
+    assert result.limit == 3
+    assert result.window_seconds == 60
+    assert 1 < result.retry_after <= 60
+
+    assert await test_redis.keys("rate_limit:*") == [f"rate_limit:burst:{test_ip}"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_policy_keys(test_redis) -> None:
+    """Test that CIDR and supply policies get their own limits and keys."""
+    policies = RateLimitPolicyMatcher([
+        RateLimitPolicySettings(
+            name="partner",
+            cidrs=["10.1.0.0/16"],
+            windows=[RateLimitWindowSettings(max_requests=5, window_seconds=60)],
+        ),
+        RateLimitPolicySettings(
+            name="premium",
+            supply_ids=["premium_supply"],
+            windows=[RateLimitWindowSettings(max_requests=1, window_seconds=60)],
+        ),
+    ])
+    limiter = RedisRateLimiter(redis_client=test_redis, max_requests=3, window_seconds=60, policies=policies)
+
+    # partner range: 5 per minute
+    for _ in range(5):
+        assert await limiter.is_allowed("10.1.0.1", supply_id="any_supply") is True
+    assert await limiter.is_allowed("10.1.0.1", supply_id="any_supply") is False
+
+    # premium supply: 1 per minute per supply, even for partner IPs
+    assert await limiter.is_allowed("10.1.0.1", supply_id="premium_supply") is True
+    assert await limiter.is_allowed("10.1.0.1", supply_id="premium_supply") is False
+
+    # everyone else: the defaults
+    result = await limiter.check("192.168.5.2", supply_id="any_supply")
+    assert result.allowed is True
+    assert result.limit == 3
+
+    assert sorted(await test_redis.keys("rate_limit:*")) == [
+        "rate_limit:192.168.5.2",
+        "rate_limit:partner:10.1.0.1",
+        "rate_limit:premium:premium_supply:10.1.0.1",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_aggregates_ipv6_prefix(rate_limiter: RedisRateLimiter, test_redis) -> None:
+    """Test that addresses of one IPv6 /64 share a limit."""
+    for i in range(3):
+        assert await rate_limiter.is_allowed(f"2001:db8:1:2::{i + 1}") is True
+
+    assert await rate_limiter.is_allowed("2001:db8:1:2:ffff::1") is False
+    assert await rate_limiter.is_allowed("2001:db8:1:3::1") is True
+    assert await test_redis.exists("rate_limit:2001:db8:1:2::/64") == 1
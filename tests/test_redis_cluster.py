@@ -0,0 +1,127 @@
+"""
+Integration tests against a real multi-node Redis Cluster.
+
+Start one with `docker compose --profile cluster up -d redis-cluster`; the tests are
+skipped when no cluster answers at TEST_REDIS_CLUSTER_NODES (default 127.0.0.1:7000).
+"""
+
+import os
+
+import pytest
+import pytest_asyncio
+from redis.asyncio import RedisCluster
+from redis.asyncio.cluster import ClusterNode
+from redis.exceptions import RedisClusterException, RedisError
+
+from app.models.services.catalog import SupplyLimit
+from app.redis_db.cluster import group_keys_by_node
+from app.services.rate_limiter import GcraRateLimiter, RedisRateLimiter, SlidingWindowCounterRateLimiter
+from app.services.statistics import StatisticsService
+from app.services.supply_admission import SupplyAdmission
+
+CLUSTER_NODES = os.getenv("TEST_REDIS_CLUSTER_NODES", "127.0.0.1:7000")
+
+
+@pytest_asyncio.fixture
+async def cluster_redis():
+    """Connect to the test cluster, or skip if there is none."""
+    startup_nodes = [
+        ClusterNode(host=host, port=int(port)) for host, port in (node.split(":") for node in CLUSTER_NODES.split(","))
+    ]
+    redis = RedisCluster(startup_nodes=startup_nodes, decode_responses=True)
+
+    try:
+        await redis.initialize()
+    except (RedisClusterException, RedisError) as e:
+        await redis.aclose()
+        pytest.skip(f"Redis Cluster not available at {CLUSTER_NODES}: {e}")
+
+    yield redis
+    await redis.flushall(target_nodes=RedisCluster.PRIMARIES)
+    await redis.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cluster_statistics_across_nodes(cluster_redis):
+    """Test that statistics of supplies spread over all shards are recorded and read back."""
+    statistics_service = StatisticsService(cluster_redis)
+    supply_ids = [f"supply{i}" for i in range(50)]
+
+    await statistics_service.apply_increments(
+        {supply_id: {"total_reqs": 1, "country:US": 1, "bidder:bidder1:revenue": 500000} for supply_id in supply_ids}
+    )
+
+    groups = group_keys_by_node(cluster_redis, [statistics_service._get_supply_key(s) for s in supply_ids])
+    assert len(groups) > 1, "supplies should be spread over several nodes"
+
+    result = await statistics_service.get_all_statistics()
+
+    assert sorted(result.supplies) == sorted(supply_ids)
+    assert all(data["r"] == "1" for data in result.supplies.values())
+
+
+@pytest.mark.asyncio
+async def test_cluster_sharded_supply_across_nodes(cluster_redis):
+    """Test that the shards of a hot supply land on several nodes and are merged on read."""
+    statistics_service = StatisticsService(cluster_redis, supply_shards={"hot_supply": 16})
+
+    for _ in range(100):
+        await statistics_service.apply_increments({"hot_supply": {"total_reqs": 1}})
+
+    assert len(group_keys_by_node(cluster_redis, statistics_service._get_supply_keys("hot_supply"))) > 1
+
+    result = await statistics_service.get_all_statistics()
+    assert result.supplies["hot_supply"]["r"] == "100"
+
+
+@pytest.mark.asyncio
+async def test_cluster_statistics_script_flushed_on_one_node(cluster_redis):
+    """Test that supplies of a node that lost its script cache are retried without recounting the other nodes'."""
+    statistics_service = StatisticsService(cluster_redis)
+    supply_ids = [f"supply{i}" for i in range(50)]
+    increments = {supply_id: {"total_reqs": 1} for supply_id in supply_ids}
+    await statistics_service.apply_increments(increments)
+
+    # as after a restart or failover of one primary
+    await cluster_redis.execute_command("SCRIPT FLUSH", target_nodes=cluster_redis.get_primaries()[0])
+    await statistics_service.apply_increments(increments)
+
+    result = await statistics_service.get_all_statistics()
+    assert all(result.supplies[supply_id]["r"] == "2" for supply_id in supply_ids)
+
+
+@pytest.mark.asyncio
+async def test_cluster_statistics_migration_and_registry(cluster_redis):
+    """Test that legacy keys in other slots are migrated and the registry is rebuilt from all nodes."""
+    statistics_service = StatisticsService(cluster_redis)
+    for i in range(10):
+        await cluster_redis.hset(f"stats:legacy{i}", mapping={"total_reqs": "2"})
+
+    await statistics_service.ensure_registry()
+
+    result = await statistics_service.get_all_statistics()
+    assert sorted(result.supplies) == sorted(f"legacy{i}" for i in range(10))
+    assert all(data == {"r": "2"} for data in result.supplies.values())
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("limiter_class", [RedisRateLimiter, SlidingWindowCounterRateLimiter, GcraRateLimiter])
+async def test_cluster_rate_limiter(cluster_redis, limiter_class: type[RedisRateLimiter]) -> None:
+    """Test that the rate limiting scripts run on whichever node owns the key."""
+    limiter = limiter_class(redis_client=cluster_redis, max_requests=3, window_seconds=60)
+
+    for i in range(20):
+        ip = f"10.0.0.{i}"
+        assert [await limiter.is_allowed(ip) for _ in range(4)] == [True, True, True, False]
+
+
+@pytest.mark.asyncio
+async def test_cluster_supply_admission(cluster_redis) -> None:
+    """Test that supply token buckets work on a cluster."""
+    admission = SupplyAdmission(redis_client=cluster_redis)
+    limit = SupplyLimit(qps=1, burst=2)
+
+    for supply_id in ("supply1", "supply2", "supply3"):
+        assert await admission._refill(supply_id, limit) is True
+        assert await admission._refill(supply_id, limit) is True
+        assert await admission._refill(supply_id, limit) is False
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from app.services.response_cache import ResponseCache, etag_matches, get_etag
+
+
+@pytest.mark.asyncio
+async def test_response_cache_reuses_body_until_ttl() -> None:
+    """Test that a body is built once, served from the cache while fresh and rebuilt after the TTL."""
+    cache = ResponseCache(ttl_seconds=0.05)
+    builds = 0
+
+    async def build() -> bytes:
+        nonlocal builds
+        builds += 1
+        return f'{{"builds":{builds}}}'.encode()
+
+    first = await cache.get("stat", build)
+    second = await cache.get("stat", build)
+    assert builds == 1
+    assert second.body == first.body
+    assert second.etag == first.etag == get_etag(b'{"builds":1}')
+
+    await asyncio.sleep(0.06)
+
+    third = await cache.get("stat", build)
+    assert builds == 2
+    assert third.body == b'{"builds":2}'
+    assert third.etag != first.etag
+    assert cache.metrics.hits == 1
+    assert cache.metrics.refreshes == 2
+
+
+@pytest.mark.asyncio
+async def test_response_cache_single_flight() -> None:
+    """Test that concurrent requests for a stale body share a single rebuild."""
+    cache = ResponseCache(ttl_seconds=0)
+    builds = 0
+    release = asyncio.Event()
+
+    async def build() -> bytes:
+        nonlocal builds
+        builds += 1
+        await release.wait()
+        return b"{}"
+
+    waiters = [asyncio.create_task(cache.get("stat", build)) for _ in range(10)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert builds == 1
+    assert {result.etag for result in results} == {get_etag(b"{}")}
+    assert cache.metrics.coalesced == 9
+
+
+@pytest.mark.asyncio
+async def test_response_cache_cancelled_waiter_keeps_refresh() -> None:
+    """Test that a waiter going away doesn't cancel the rebuild other requests wait for."""
+    cache = ResponseCache(ttl_seconds=1)
+    release = asyncio.Event()
+
+    async def build() -> bytes:
+        await release.wait()
+        return b"{}"
+
+    cancelled = asyncio.create_task(cache.get("stat", build))
+    waiting = asyncio.create_task(cache.get("stat", build))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    release.set()
+
+    assert (await waiting).body == b"{}"
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+
+
+@pytest.mark.asyncio
+async def test_response_cache_failed_refresh_is_retried() -> None:
+    """Test that a failing build is raised to its waiters and the next request tries again."""
+    cache = ResponseCache(ttl_seconds=1)
+    attempts = 0
+
+    async def build() -> bytes:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise ConnectionError("redis down")
+        return b"{}"
+
+    with pytest.raises(ConnectionError):
+        await cache.get("stat", build)
+
+    assert (await cache.get("stat", build)).body == b"{}"
+    assert attempts == 2
+
+
+def test_etag_matches() -> None:
+    """Test If-None-Match matching, including lists, weak tags and the wildcard."""
+    etag = get_etag(b"{}")
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
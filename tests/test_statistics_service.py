@@ -1,10 +1,16 @@
+from datetime import UTC, datetime
+from unittest.mock import MagicMock
+
 import pytest
 import pytest_asyncio
 from redis.asyncio import StrictRedis
 
+from app.builders.api.statistics import StatisticsResponseBuilder
 from app.config.settings import settings
-from app.models.services.statistics import StatisticsResult
-from app.services.statistics import StatisticsService
+from app.models.api.response.statistics import StatisticsResponse
+from app.models.services.statistics import StatisticsFilter, StatisticsResult
+from app.services import statistics as statistics_module
+from app.services.statistics import StatisticsService, StatisticsWriteError
 
 
 @pytest_asyncio.fixture
@@ -28,6 +34,16 @@ async def statistics_service(test_redis):
     yield service
 
 
+async def record_request(statistics_service: StatisticsService, supply_id: str, country: str) -> None:
+    """Helper to record an auction without eligible bidders, which only counts the request."""
+    await statistics_service.record_auction(supply_id, country, winner_id=None, winning_price=0.0, no_bid_ids=[])
+
+
+async def get_supply_stats(statistics_service: StatisticsService, supply_id: str) -> StatisticsResponse:
+    """Helper to read a supply's statistics back through the same decoding as /stat."""
+    return StatisticsResponseBuilder.build(await statistics_service.get_all_statistics())[supply_id]
+
+
 @pytest.mark.asyncio
 async def test_record_request(statistics_service, test_redis):
     """Test recording auction requests."""
@@ -35,15 +51,13 @@ async def test_record_request(statistics_service, test_redis):
     country = "US"
 
     # Record request
-    await statistics_service.record_request(supply_id, country)
+    await record_request(statistics_service, supply_id, country)
 
     # Verify data in Redis
-    key = f"stats:{supply_id}"
-    total_reqs = await test_redis.hget(key, "total_reqs")
-    country_reqs = await test_redis.hget(key, f"country:{country}")
+    stats = await get_supply_stats(statistics_service, supply_id)
 
-    assert total_reqs == "1"
-    assert country_reqs == "1"
+    assert stats.total_reqs == 1
+    assert stats.reqs_per_country == {country: 1}
 
 
 @pytest.mark.asyncio
@@ -54,15 +68,13 @@ async def test_record_multiple_requests(statistics_service, test_redis):
 
     # Record 5 requests
     for _ in range(5):
-        await statistics_service.record_request(supply_id, country)
+        await record_request(statistics_service, supply_id, country)
 
     # Verify counters
-    key = f"stats:{supply_id}"
-    total_reqs = await test_redis.hget(key, "total_reqs")
-    country_reqs = await test_redis.hget(key, f"country:{country}")
+    stats = await get_supply_stats(statistics_service, supply_id)
 
-    assert total_reqs == "5"
-    assert country_reqs == "5"
+    assert stats.total_reqs == 5
+    assert stats.reqs_per_country == {country: 5}
 
 
 @pytest.mark.asyncio
@@ -71,23 +83,17 @@ async def test_record_requests_multiple_countries(statistics_service, test_redis
     supply_id = "test_supply"
 
     # Record requests from different countries
-    await statistics_service.record_request(supply_id, "US")
-    await statistics_service.record_request(supply_id, "US")
-    await statistics_service.record_request(supply_id, "GB")
-    await statistics_service.record_request(supply_id, "FR")
-    await statistics_service.record_request(supply_id, "GB")
+    await record_request(statistics_service, supply_id, "US")
+    await record_request(statistics_service, supply_id, "US")
+    await record_request(statistics_service, supply_id, "GB")
+    await record_request(statistics_service, supply_id, "FR")
+    await record_request(statistics_service, supply_id, "GB")
 
     # Verify data
-    key = f"stats:{supply_id}"
-    total_reqs = await test_redis.hget(key, "total_reqs")
-    us_reqs = await test_redis.hget(key, "country:US")
-    gb_reqs = await test_redis.hget(key, "country:GB")
-    fr_reqs = await test_redis.hget(key, "country:FR")
+    stats = await get_supply_stats(statistics_service, supply_id)
 
-    assert total_reqs == "5"
-    assert us_reqs == "2"
-    assert gb_reqs == "2"
-    assert fr_reqs == "1"
+    assert stats.total_reqs == 5
+    assert stats.reqs_per_country == {"US": 2, "GB": 2, "FR": 1}
 
 
 @pytest.mark.asyncio
@@ -100,8 +106,9 @@ async def test_record_auction_result_with_winner(statistics_service, test_redis)
     timeout_ids = ["bidder3"]
 
     # Record auction result
-    await statistics_service.record_auction_result(
+    await statistics_service.record_auction(
         supply_id=supply_id,
+        country="US",
         winner_id=winner_id,
         winning_price=winning_price,
         no_bid_ids=no_bid_ids,
@@ -109,16 +116,12 @@ async def test_record_auction_result_with_winner(statistics_service, test_redis)
     )
 
     # Verify data in Redis
-    key = f"stats:{supply_id}"
-    wins = await test_redis.hget(key, f"bidder:{winner_id}:wins")
-    revenue = await test_redis.hget(key, f"bidder:{winner_id}:revenue")
-    no_bids = await test_redis.hget(key, f"bidder:bidder2:no_bids")
-    timeouts = await test_redis.hget(key, f"bidder:bidder3:timeouts")
+    bidders = (await get_supply_stats(statistics_service, supply_id)).bidders
 
-    assert wins == "1"
-    assert float(revenue) == 0.75
-    assert no_bids == "1"
-    assert timeouts == "1"
+    assert bidders[winner_id].wins == 1
+    assert bidders[winner_id].total_revenue == 0.75
+    assert bidders["bidder2"].no_bids == 1
+    assert bidders["bidder3"].timeouts == 1
 
 
 @pytest.mark.asyncio
@@ -129,8 +132,9 @@ async def test_record_auction_result_without_winner(statistics_service, test_red
     timeout_ids = ["bidder3"]
 
     # Record auction result with no winner
-    await statistics_service.record_auction_result(
+    await statistics_service.record_auction(
         supply_id=supply_id,
+        country="US",
         winner_id=None,
         winning_price=0.0,
         no_bid_ids=no_bid_ids,
@@ -138,14 +142,12 @@ async def test_record_auction_result_without_winner(statistics_service, test_red
     )
 
     # Verify data in Redis
-    key = f"stats:{supply_id}"
-    no_bids_1 = await test_redis.hget(key, "bidder:bidder1:no_bids")
-    no_bids_2 = await test_redis.hget(key, "bidder:bidder2:no_bids")
-    timeouts = await test_redis.hget(key, "bidder:bidder3:timeouts")
+    bidders = (await get_supply_stats(statistics_service, supply_id)).bidders
 
-    assert no_bids_1 == "1"
-    assert no_bids_2 == "1"
-    assert timeouts == "1"
+    assert bidders["bidder1"].no_bids == 1
+    assert bidders["bidder2"].no_bids == 1
+    assert bidders["bidder3"].timeouts == 1
+    assert all(bidder.wins == 0 for bidder in bidders.values())
 
 
 @pytest.mark.asyncio
@@ -154,8 +156,9 @@ async def test_record_multiple_auction_results(statistics_service, test_redis):
     supply_id = "test_supply"
 
     # Auction 1: bidder1 wins
-    await statistics_service.record_auction_result(
+    await statistics_service.record_auction(
         supply_id=supply_id,
+        country="US",
         winner_id="bidder1",
         winning_price=0.50,
         no_bid_ids=["bidder2"],
@@ -163,8 +166,9 @@ async def test_record_multiple_auction_results(statistics_service, test_redis):
     )
 
     # Auction 2: bidder1 wins again
-    await statistics_service.record_auction_result(
+    await statistics_service.record_auction(
         supply_id=supply_id,
+        country="US",
         winner_id="bidder1",
         winning_price=0.30,
         no_bid_ids=[],
@@ -172,8 +176,9 @@ async def test_record_multiple_auction_results(statistics_service, test_redis):
     )
 
     # Auction 3: bidder3 wins
-    await statistics_service.record_auction_result(
+    await statistics_service.record_auction(
         supply_id=supply_id,
+        country="US",
         winner_id="bidder3",
         winning_price=0.80,
         no_bid_ids=["bidder1"],
@@ -181,22 +186,15 @@ async def test_record_multiple_auction_results(statistics_service, test_redis):
     )
 
     # Verify accumulated statistics
-    key = f"stats:{supply_id}"
-    bidder1_wins = await test_redis.hget(key, "bidder:bidder1:wins")
-    bidder1_revenue = await test_redis.hget(key, "bidder:bidder1:revenue")
-    bidder1_no_bids = await test_redis.hget(key, "bidder:bidder1:no_bids")
-    bidder2_no_bids = await test_redis.hget(key, "bidder:bidder2:no_bids")
-    bidder2_timeouts = await test_redis.hget(key, "bidder:bidder2:timeouts")
-    bidder3_wins = await test_redis.hget(key, "bidder:bidder3:wins")
-    bidder3_revenue = await test_redis.hget(key, "bidder:bidder3:revenue")
+    bidders = (await get_supply_stats(statistics_service, supply_id)).bidders
 
-    assert bidder1_wins == "2"
-    assert float(bidder1_revenue) == 0.80  # 0.50 + 0.30
-    assert bidder1_no_bids == "1"
-    assert bidder2_no_bids == "1"
-    assert bidder2_timeouts == "1"
-    assert bidder3_wins == "1"
-    assert float(bidder3_revenue) == 0.80
+    assert bidders["bidder1"].wins == 2
+    assert bidders["bidder1"].total_revenue == 0.80  # 0.50 + 0.30
+    assert bidders["bidder1"].no_bids == 1
+    assert bidders["bidder2"].no_bids == 1
+    assert bidders["bidder2"].timeouts == 1
+    assert bidders["bidder3"].wins == 1
+    assert bidders["bidder3"].total_revenue == 0.80
 
 
 @pytest.mark.asyncio
@@ -213,10 +211,10 @@ async def test_get_all_statistics_single_supply(statistics_service, test_redis):
     supply_id = "test_supply"
 
     # Record some data
-    await statistics_service.record_request(supply_id, "US")
-    await statistics_service.record_request(supply_id, "GB")
-    await statistics_service.record_auction_result(
+    await record_request(statistics_service, supply_id, "US")
+    await statistics_service.record_auction(
         supply_id=supply_id,
+        country="GB",
         winner_id="bidder1",
         winning_price=0.75,
         no_bid_ids=["bidder2"],
@@ -229,23 +227,22 @@ async def test_get_all_statistics_single_supply(statistics_service, test_redis):
     assert isinstance(result, StatisticsResult)
     assert supply_id in result.supplies
 
-    supply_data = result.supplies[supply_id]
-    assert supply_data["total_reqs"] == "2"
-    assert supply_data["country:US"] == "1"
-    assert supply_data["country:GB"] == "1"
-    assert supply_data["bidder:bidder1:wins"] == "1"
-    assert supply_data["bidder:bidder1:revenue"] == "0.75"
-    assert supply_data["bidder:bidder2:no_bids"] == "1"
-    assert supply_data["bidder:bidder3:timeouts"] == "1"
+    stats = StatisticsResponseBuilder.build(result)[supply_id]
+    assert stats.total_reqs == 2
+    assert stats.reqs_per_country == {"US": 1, "GB": 1}
+    assert stats.bidders["bidder1"].wins == 1
+    assert stats.bidders["bidder1"].total_revenue == 0.75
+    assert stats.bidders["bidder2"].no_bids == 1
+    assert stats.bidders["bidder3"].timeouts == 1
 
 
 @pytest.mark.asyncio
 async def test_get_all_statistics_multiple_supplies(statistics_service, test_redis):
     """Test retrieving statistics for multiple supplies."""
     # Record data for supply1
-    await statistics_service.record_request("supply1", "US")
-    await statistics_service.record_auction_result(
+    await statistics_service.record_auction(
         supply_id="supply1",
+        country="US",
         winner_id="bidder1",
         winning_price=0.50,
         no_bid_ids=[],
@@ -253,10 +250,10 @@ async def test_get_all_statistics_multiple_supplies(statistics_service, test_red
     )
 
     # Record data for supply2
-    await statistics_service.record_request("supply2", "GB")
-    await statistics_service.record_request("supply2", "FR")
-    await statistics_service.record_auction_result(
+    await record_request(statistics_service, "supply2", "GB")
+    await statistics_service.record_auction(
         supply_id="supply2",
+        country="FR",
         winner_id="bidder2",
         winning_price=0.85,
         no_bid_ids=["bidder1"],
@@ -271,42 +268,44 @@ async def test_get_all_statistics_multiple_supplies(statistics_service, test_red
     assert "supply1" in result.supplies
     assert "supply2" in result.supplies
 
+    stats = StatisticsResponseBuilder.build(result)
+
     # Verify supply1 data
-    supply1_data = result.supplies["supply1"]
-    assert supply1_data["total_reqs"] == "1"
-    assert supply1_data["country:US"] == "1"
-    assert supply1_data["bidder:bidder1:wins"] == "1"
+    assert stats["supply1"].total_reqs == 1
+    assert stats["supply1"].reqs_per_country == {"US": 1}
+    assert stats["supply1"].bidders["bidder1"].wins == 1
 
     # Verify supply2 data
-    supply2_data = result.supplies["supply2"]
-    assert supply2_data["total_reqs"] == "2"
-    assert supply2_data["country:GB"] == "1"
-    assert supply2_data["country:FR"] == "1"
-    assert supply2_data["bidder:bidder2:wins"] == "1"
+    assert stats["supply2"].total_reqs == 2
+    assert stats["supply2"].reqs_per_country == {"GB": 1, "FR": 1}
+    assert stats["supply2"].bidders["bidder2"].wins == 1
 
 
 @pytest.mark.asyncio
 async def test_revenue_accumulation_precision(statistics_service, test_redis):
-    """Test that revenue accumulation maintains precision with floats."""
+    """Test that revenue is accumulated exactly in integer micro-units."""
     supply_id = "test_supply"
 
     # Record multiple small revenues
-    await statistics_service.record_auction_result(
+    await statistics_service.record_auction(
         supply_id=supply_id,
+        country="US",
         winner_id="bidder1",
         winning_price=0.33,
         no_bid_ids=[],
         timeout_ids=[],
     )
-    await statistics_service.record_auction_result(
+    await statistics_service.record_auction(
         supply_id=supply_id,
+        country="US",
         winner_id="bidder1",
         winning_price=0.27,
         no_bid_ids=[],
         timeout_ids=[],
     )
-    await statistics_service.record_auction_result(
+    await statistics_service.record_auction(
         supply_id=supply_id,
+        country="US",
         winner_id="bidder1",
         winning_price=0.15,
         no_bid_ids=[],
@@ -314,11 +313,11 @@ async def test_revenue_accumulation_precision(statistics_service, test_redis):
     )
 
     # Get revenue
-    key = f"stats:{supply_id}"
-    revenue = await test_redis.hget(key, "bidder:bidder1:revenue")
+    data = await test_redis.hgetall(f"stats:{{{supply_id}}}")
+    revenue = [value for field, value in data.items() if field.startswith("v")]
 
-    # Should be 0.75 (0.33 + 0.27 + 0.15)
-    assert float(revenue) == pytest.approx(0.75, rel=1e-5)
+    # Should be exactly 0.75 (0.33 + 0.27 + 0.15)
+    assert revenue == ["750000"]
 
 
 @pytest.mark.asyncio
@@ -326,10 +325,10 @@ async def test_statistics_key_format(statistics_service, test_redis):
     """Test that Redis keys follow the correct format."""
     supply_id = "test_supply_123"
 
-    await statistics_service.record_request(supply_id, "US")
+    await record_request(statistics_service, supply_id, "US")
 
     # Check key exists with correct format
-    expected_key = f"stats:{supply_id}"
+    expected_key = f"stats:{{{supply_id}}}"
     exists = await test_redis.exists(expected_key)
     assert exists == 1
 
@@ -340,8 +339,9 @@ async def test_timeout_tracking_only(statistics_service, test_redis):
     supply_id = "test_supply"
     timeout_ids = ["bidder1", "bidder2", "bidder3"]
 
-    await statistics_service.record_auction_result(
+    await statistics_service.record_auction(
         supply_id=supply_id,
+        country="US",
         winner_id=None,
         winning_price=0.0,
         no_bid_ids=[],
@@ -349,10 +349,9 @@ async def test_timeout_tracking_only(statistics_service, test_redis):
     )
 
     # Verify timeouts are recorded
-    key = f"stats:{supply_id}"
+    bidders = (await get_supply_stats(statistics_service, supply_id)).bidders
     for bidder_id in timeout_ids:
-        timeouts = await test_redis.hget(key, f"bidder:{bidder_id}:timeouts")
-        assert timeouts == "1"
+        assert bidders[bidder_id].timeouts == 1
 
 
 @pytest.mark.asyncio
@@ -361,8 +360,9 @@ async def test_no_bid_tracking_only(statistics_service, test_redis):
     supply_id = "test_supply"
     no_bid_ids = ["bidder1", "bidder2"]
 
-    await statistics_service.record_auction_result(
+    await statistics_service.record_auction(
         supply_id=supply_id,
+        country="US",
         winner_id=None,
         winning_price=0.0,
         no_bid_ids=no_bid_ids,
@@ -370,10 +370,9 @@ async def test_no_bid_tracking_only(statistics_service, test_redis):
     )
 
     # Verify no-bids are recorded
-    key = f"stats:{supply_id}"
+    bidders = (await get_supply_stats(statistics_service, supply_id)).bidders
     for bidder_id in no_bid_ids:
-        no_bids = await test_redis.hget(key, f"bidder:{bidder_id}:no_bids")
-        assert no_bids == "1"
+        assert bidders[bidder_id].no_bids == 1
 
 
 @pytest.mark.asyncio
@@ -382,8 +381,9 @@ async def test_pipeline_efficiency(statistics_service, test_redis):
     supply_id = "test_supply"
 
     # Record complex auction result
-    await statistics_service.record_auction_result(
+    await statistics_service.record_auction(
         supply_id=supply_id,
+        country="US",
         winner_id="winner",
         winning_price=0.75,
         no_bid_ids=["bidder1", "bidder2", "bidder3"],
@@ -391,16 +391,12 @@ async def test_pipeline_efficiency(statistics_service, test_redis):
     )
 
     # Verify all data was written (pipeline should execute all at once)
-    key = f"stats:{supply_id}"
-    data = await test_redis.hgetall(key)
+    bidders = (await get_supply_stats(statistics_service, supply_id)).bidders
 
-    assert "bidder:winner:wins" in data
-    assert "bidder:winner:revenue" in data
-    assert "bidder:bidder1:no_bids" in data
-    assert "bidder:bidder2:no_bids" in data
-    assert "bidder:bidder3:no_bids" in data
-    assert "bidder:bidder4:timeouts" in data
-    assert "bidder:bidder5:timeouts" in data
+    assert bidders["winner"].wins == 1
+    assert bidders["winner"].total_revenue == 0.75
+    assert [bidders[f"bidder{i}"].no_bids for i in range(1, 4)] == [1, 1, 1]
+    assert [bidders[f"bidder{i}"].timeouts for i in range(4, 6)] == [1, 1]
 
 
 @pytest.mark.asyncio
@@ -409,10 +405,10 @@ async def test_get_statistics_returns_all_fields(statistics_service, test_redis)
     supply_id = "complete_supply"
 
     # Create comprehensive statistics
-    await statistics_service.record_request(supply_id, "US")
-    await statistics_service.record_request(supply_id, "GB")
-    await statistics_service.record_auction_result(
+    await record_request(statistics_service, supply_id, "US")
+    await statistics_service.record_auction(
         supply_id=supply_id,
+        country="GB",
         winner_id="bidder1",
         winning_price=0.65,
         no_bid_ids=["bidder2"],
@@ -434,4 +430,624 @@ async def test_get_statistics_returns_all_fields(statistics_service, test_redis)
     # All values should be strings (Redis stores everything as strings)
     for key, value in supply_data.items():
         assert isinstance(key, str)
-        assert isinstance(value, str)
\ No newline at end of file
+        assert isinstance(value, str)
+
+@pytest.mark.asyncio
+async def test_record_auction_single_call(statistics_service, test_redis):
+    """Test that request and auction outcome are recorded together in one call."""
+    supply_id = "test_supply"
+
+    await statistics_service.record_auction(
+        supply_id=supply_id,
+        country="US",
+        winner_id="bidder1",
+        winning_price=0.75,
+        no_bid_ids=["bidder2", "bidder3"],
+        timeout_ids=["bidder4"],
+    )
+
+    stats = await get_supply_stats(statistics_service, supply_id)
+
+    assert stats.total_reqs == 1
+    assert stats.reqs_per_country == {"US": 1}
+    assert stats.bidders["bidder1"].wins == 1
+    assert stats.bidders["bidder1"].total_revenue == 0.75
+    assert stats.bidders["bidder2"].no_bids == 1
+    assert stats.bidders["bidder3"].no_bids == 1
+    assert stats.bidders["bidder4"].timeouts == 1
+
+
+@pytest.mark.asyncio
+async def test_record_auction_without_bidders(statistics_service, test_redis):
+    """Test that an auction without eligible bidders only counts the request."""
+    supply_id = "test_supply"
+
+    await statistics_service.record_auction(
+        supply_id=supply_id,
+        country="GB",
+        winner_id=None,
+        winning_price=0.0,
+        no_bid_ids=[],
+        timeout_ids=[],
+    )
+
+    stats = await get_supply_stats(statistics_service, supply_id)
+
+    assert stats == StatisticsResponse(total_reqs=1, reqs_per_country={"GB": 1}, bidders={})
+
+
+@pytest.mark.asyncio
+async def test_statistics_without_histograms_omit_null_fields(statistics_service, test_redis):
+    """Test that latency, price and unique_ips without data are left out of the body instead of sent as null."""
+    await statistics_service.record_auction("supply1", "US", None, 0.0, ["bidder1"], [])
+
+    stats = await get_supply_stats(statistics_service, "supply1")
+
+    assert stats.model_dump(exclude_unset=True) == {
+        "total_reqs": 1,
+        "reqs_per_country": {"US": 1},
+        "bidders": {"bidder1": {"wins": 0, "total_revenue": 0.0, "no_bids": 1, "timeouts": 0}},
+    }
+
+@pytest.mark.asyncio
+async def test_record_script_reloaded_after_flush(statistics_service, test_redis):
+    """Test that the recording script is reloaded when Redis lost its script cache."""
+    supply_id = "test_supply"
+
+    await record_request(statistics_service, supply_id, "US")
+    await test_redis.script_flush()
+    await record_request(statistics_service, supply_id, "US")
+
+    assert (await get_supply_stats(statistics_service, supply_id)).total_reqs == 2
+
+
+@pytest.mark.asyncio
+async def test_recording_registers_supply(statistics_service, test_redis):
+    """Test that recording statistics adds the supply to the registry."""
+    await record_request(statistics_service, "supply1", "US")
+    await statistics_service.record_auction(
+        supply_id="supply2",
+        country="US",
+        winner_id="bidder1",
+        winning_price=0.5,
+        no_bid_ids=[],
+        timeout_ids=[],
+    )
+
+    registry = await test_redis.smembers(StatisticsService.SUPPLY_REGISTRY_KEY)
+    assert registry == {"supply1", "supply2"}
+
+
+@pytest.mark.asyncio
+async def test_get_all_statistics_ignores_unregistered_keys(statistics_service, test_redis):
+    """Test that only registered supplies are read, without scanning the keyspace."""
+    await record_request(statistics_service, "supply1", "US")
+    await test_redis.hset("stats:legacy_supply", "total_reqs", "3")
+    await test_redis.set("rate_limit:192.168.1.1", "1")
+
+    result = await statistics_service.get_all_statistics()
+
+    assert list(result.supplies) == ["supply1"]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_registry_backfills_existing_hashes(statistics_service, test_redis):
+    """Test that supplies recorded before the registry existed are found by SCAN."""
+    await test_redis.hset("stats:legacy_supply", "total_reqs", "3")
+    await test_redis.hset("stats:other_supply", "total_reqs", "1")
+    await test_redis.set("rate_limit:192.168.1.1", "1")
+
+    await statistics_service.ensure_registry()
+
+    result = await statistics_service.get_all_statistics()
+    assert sorted(result.supplies) == ["legacy_supply", "other_supply"]
+    assert (await get_supply_stats(statistics_service, "legacy_supply")).total_reqs == 3
+
+
+@pytest.mark.asyncio
+async def test_migrate_legacy_keys_merges_into_tagged_layout(statistics_service, test_redis):
+    """Test that untagged stats:<supply_id> hashes are folded into the hash-tagged keys."""
+    await statistics_service.record_auction(
+        supply_id="supply1",
+        country="US",
+        winner_id="bidder1",
+        winning_price=0.5,
+        no_bid_ids=[],
+        timeout_ids=[],
+    )
+    # written by a worker still running the old layout
+    await test_redis.hset(
+        "stats:supply1",
+        mapping={"total_reqs": "2", "country:US": "2", "bidder:bidder1:wins": "1", "bidder:bidder1:revenue": "0.25"},
+    )
+
+    assert await statistics_service.migrate_legacy_keys() == 1
+    assert await statistics_service.migrate_legacy_keys() == 0
+
+    assert not await test_redis.exists("stats:supply1")
+    stats = await get_supply_stats(statistics_service, "supply1")
+    assert stats.total_reqs == 3
+    assert stats.bidders["bidder1"].wins == 2
+    assert stats.bidders["bidder1"].total_revenue == 0.75
+
+
+@pytest.mark.asyncio
+async def test_migrate_legacy_keys_can_be_rerun_after_failure(statistics_service, test_redis, monkeypatch):
+    """Test that a migration interrupted after copying is finished by the next run without counting twice."""
+    await test_redis.hset("stats:supply1", mapping={"total_reqs": "2", "bidder:bidder1:revenue": "0.25"})
+
+    async def fail(*args, **kwargs):
+        raise ConnectionError("connection lost")
+
+    delete = test_redis.delete
+    monkeypatch.setattr(test_redis, "delete", fail)
+    with pytest.raises(ConnectionError):
+        await statistics_service.migrate_legacy_keys()
+    assert not await test_redis.exists("stats:supply1")
+
+    # written by a worker still running the old layout before the rerun
+    await test_redis.hincrby("stats:supply1", "total_reqs", 1)
+    monkeypatch.setattr(test_redis, "delete", delete)
+    assert await statistics_service.migrate_legacy_keys() == 1
+
+    assert [key async for key in test_redis.scan_iter(match="stats_migrating:*")] == []
+    assert not await test_redis.exists("stats:supply1")
+    stats = await get_supply_stats(statistics_service, "supply1")
+    assert stats.total_reqs == 3
+    assert stats.bidders["bidder1"].total_revenue == 0.25
+
+
+@pytest.mark.asyncio
+async def test_migrate_legacy_keys_counts_recreated_identical_hash(statistics_service, test_redis):
+    """Test that an old-layout hash recreated with the same content as a migrated one is counted again."""
+    legacy = {"total_reqs": "1", "country:US": "1"}
+    await test_redis.hset("stats:supply1", mapping=legacy)
+    await statistics_service.migrate_legacy_keys()
+
+    # written again by a worker still running the old layout
+    await test_redis.hset("stats:supply1", mapping=legacy)
+    assert await statistics_service.migrate_legacy_keys() == 1
+
+    assert not await test_redis.exists("stats:supply1")
+    stats = await get_supply_stats(statistics_service, "supply1")
+    assert stats.total_reqs == 2
+    assert stats.reqs_per_country == {"US": 2}
+
+
+@pytest.mark.asyncio
+async def test_shard_like_supply_ids_are_not_folded(test_redis):
+    """Test that a supply id ending in #<n> is only read as a shard of a supply listed as sharded."""
+    statistics_service = StatisticsService(test_redis, supply_shards={"hot_supply": 2})
+    await statistics_service.apply_increments({
+        "a#2": {"total_reqs": 1},
+        "a": {"total_reqs": 2},
+    })
+
+    await statistics_service.migrate_legacy_keys()
+
+    result = await statistics_service.get_all_statistics()
+    assert sorted(result.supplies) == ["a", "a#2"]
+    assert (await get_supply_stats(statistics_service, "a#2")).total_reqs == 1
+    assert (await get_supply_stats(statistics_service, "a")).total_reqs == 2
+
+
+@pytest.mark.asyncio
+async def test_migrations_only_run_when_layout_changes(test_redis):
+    """Test that startup skips the migration scans once the current layout was migrated."""
+    statistics_service = StatisticsService(test_redis, supply_shards={"hot_supply": 4})
+    assert await statistics_service.migrate() is True
+    assert await statistics_service.migrate() is False
+
+    await test_redis.hset("stats:supply1", "total_reqs", "2")
+    await statistics_service.ensure_registry()
+    assert await test_redis.exists("stats:supply1")
+
+    assert await statistics_service.migrate(force=True) is True
+    assert not await test_redis.exists("stats:supply1")
+
+    # lowering a shard count leaves shards to fold back
+    assert await StatisticsService(test_redis, supply_shards={"hot_supply": 2}).migrate() is True
+
+
+@pytest.mark.asyncio
+async def test_sharded_supply_spreads_writes_and_merges_reads(test_redis):
+    """Test that a hot supply's counters are spread over its shards and summed on read."""
+    statistics_service = StatisticsService(test_redis, supply_shards={"hot_supply": 4})
+
+    for _ in range(40):
+        await statistics_service.record_auction(
+            supply_id="hot_supply",
+            country="US",
+            winner_id="bidder1",
+            winning_price=0.25,
+            no_bid_ids=["bidder2"],
+            timeout_ids=[],
+        )
+    await record_request(statistics_service, "cold_supply", "GB")
+
+    shard_keys = [key async for key in test_redis.scan_iter(match="stats:{hot_supply*")]
+    assert len(shard_keys) > 1
+    assert await test_redis.exists("stats:{cold_supply}")
+
+    stats = StatisticsResponseBuilder.build(await statistics_service.get_all_statistics())
+
+    assert sorted(stats) == ["cold_supply", "hot_supply"]
+    assert stats["hot_supply"].total_reqs == 40
+    assert stats["hot_supply"].bidders["bidder2"].no_bids == 40
+    assert stats["hot_supply"].bidders["bidder1"].total_revenue == 10
+    assert stats["cold_supply"] == StatisticsResponse(total_reqs=1, reqs_per_country={"GB": 1}, bidders={})
+
+
+@pytest.mark.asyncio
+async def test_lowering_shard_count_folds_stale_shards(test_redis):
+    """Test that shards beyond a lowered shard count are folded back into the remaining shards."""
+    await StatisticsService(test_redis, supply_shards={"hot_supply": 8}).apply_increments({
+        "hot_supply": {"total_reqs": 1},
+    })
+    await test_redis.hincrby("stats:{hot_supply#7}", "total_reqs", 5)
+    await test_redis.hincrbyfloat("stats:{hot_supply#7}", "bidder:bidder1:revenue", 1.5)
+
+    statistics_service = StatisticsService(test_redis, supply_shards={"hot_supply": 2})
+    await statistics_service.ensure_registry()
+
+    assert not await test_redis.exists("stats:{hot_supply#7}")
+    stats = await get_supply_stats(statistics_service, "hot_supply")
+    assert stats.total_reqs == 6
+    assert stats.bidders["bidder1"].total_revenue == 1.5
+
+
+@pytest.mark.asyncio
+async def test_compact_layout_uses_dictionary_ids(statistics_service, test_redis):
+    """Test that fields are stored as short codes plus dictionary ids, with revenue in integer micro-units."""
+    await statistics_service.record_auction(
+        supply_id="supply1",
+        country="US",
+        winner_id="bidder1",
+        winning_price=1.25,
+        no_bid_ids=["bidder2"],
+        timeout_ids=[],
+    )
+    await record_request(statistics_service, "supply2", "US")
+
+    ids = await test_redis.hgetall(StatisticsService.DICTIONARY_KEY)
+    us, bidder1, bidder2 = ids["c:US"], ids["b:bidder1"], ids["b:bidder2"]
+
+    assert await test_redis.hgetall("stats:{supply1}") == {
+        "r": "1",
+        f"c{us}": "1",
+        f"w{bidder1}": "1",
+        f"v{bidder1}": "1250000",
+        f"p{bidder1}.22": "1",
+        f"n{bidder2}": "1",
+    }
+    # ids are shared by all supplies and resolved by any instance
+    assert await test_redis.hgetall("stats:{supply2}") == {"r": "1", f"c{us}": "1"}
+    assert (await get_supply_stats(StatisticsService(test_redis), "supply1")).bidders["bidder1"].total_revenue == 1.25
+
+
+@pytest.mark.asyncio
+async def test_compact_layout_bidder_id_with_colon(statistics_service, test_redis):
+    """Test that a bidder id containing ':' is encoded and decoded whole, including its histograms."""
+    await statistics_service.record_auction(
+        supply_id="supply1",
+        country="US",
+        winner_id="dsp:east:1",
+        winning_price=0.5,
+        no_bid_ids=["a:price"],
+        timeout_ids=[],
+        latencies_ms={"dsp:east:1": 12.0},
+    )
+
+    ids = await test_redis.hgetall(StatisticsService.DICTIONARY_KEY)
+    assert {"b:dsp:east:1", "b:a:price"} <= ids.keys()
+
+    stats = await get_supply_stats(statistics_service, "supply1")
+    assert stats.bidders["dsp:east:1"].wins == 1
+    assert stats.bidders["dsp:east:1"].total_revenue == 0.5
+    assert stats.bidders["dsp:east:1"].latency.count == 1
+    assert stats.bidders["a:price"].no_bids == 1
+
+@pytest.mark.asyncio
+async def test_migrate_legacy_fields_converts_in_place(statistics_service, test_redis):
+    """Test that verbose fields are decoded while present and then converted to the compact layout."""
+    await statistics_service.record_auction(
+        supply_id="supply1",
+        country="US",
+        winner_id="bidder1",
+        winning_price=0.5,
+        no_bid_ids=[],
+        timeout_ids=[],
+    )
+    # written by a worker still running the verbose layout
+    await test_redis.hincrby("stats:{supply1}", "total_reqs", 2)
+    await test_redis.hincrby("stats:{supply1}", "country:GB", 2)
+    await test_redis.hincrby("stats:{supply1}", "bidder:bidder1:wins", 2)
+    await test_redis.hincrbyfloat("stats:{supply1}", "bidder:bidder1:revenue", 0.3)
+
+    # only wins recorded in the compact layout have a clearing price
+    price = {"count": 1, "median": 0.5, "p95": 0.5, "buckets": [{"le": 0.5, "count": 1}]}
+    expected = StatisticsResponse(
+        total_reqs=3,
+        reqs_per_country={"US": 1, "GB": 2},
+        bidders={"bidder1": {"wins": 3, "total_revenue": 0.8, "price": price}},
+        price=price,
+    )
+    assert await get_supply_stats(statistics_service, "supply1") == expected
+
+    assert await statistics_service.migrate_legacy_fields() == 1
+    assert await statistics_service.migrate_legacy_fields() == 0
+
+    data = await test_redis.hgetall("stats:{supply1}")
+    assert all(":" not in field and field != "total_reqs" for field in data)
+    assert await get_supply_stats(statistics_service, "supply1") == expected
+
+
+@pytest.mark.asyncio
+async def test_range_statistics_sum_time_buckets(test_redis):
+    """Test that increments land in minute and hour buckets and range queries sum the overlapping ones."""
+    statistics_service = StatisticsService(test_redis, bucket_ttls={"minute": 3600, "hour": 86400})
+    base = datetime(2026, 10, 17, 14, 0, tzinfo=UTC).timestamp()
+
+    await statistics_service.apply_increments({"supply1": {"total_reqs": 1, "country:US": 1}}, timestamp=base + 10)
+    await statistics_service.apply_increments({"supply1": {"total_reqs": 2, "country:GB": 2}}, timestamp=base + 70)
+    await statistics_service.apply_increments({"supply2": {"total_reqs": 4}}, timestamp=base + 3700)
+
+    ttl = await test_redis.ttl(f"stats_bucket:{{supply1}}:minute:{int(base)}")
+    assert 0 < ttl <= 3600
+
+    minutes = await statistics_service.get_range_statistics(
+        datetime(2026, 10, 17, 14, 0, 30, tzinfo=UTC),
+        datetime(2026, 10, 17, 14, 2, tzinfo=UTC),
+    )
+    assert minutes.start == datetime(2026, 10, 17, 14, 0, tzinfo=UTC)
+    assert minutes.end == datetime(2026, 10, 17, 14, 2, tzinfo=UTC)
+    stats = StatisticsResponseBuilder.build(minutes)
+    assert list(stats) == ["supply1"]
+    assert stats["supply1"].total_reqs == 3
+    assert stats["supply1"].reqs_per_country == {"US": 1, "GB": 2}
+
+    hours = await statistics_service.get_range_statistics(
+        datetime(2026, 10, 17, 14, 0), datetime(2026, 10, 17, 16, 0), granularity="hour"
+    )
+    stats = StatisticsResponseBuilder.build(hours)
+    assert stats["supply1"].total_reqs == 3
+    assert stats["supply2"].total_reqs == 4
+
+    # the all-time counters are unaffected
+    assert (await get_supply_stats(statistics_service, "supply1")).total_reqs == 3
+
+
+@pytest.mark.asyncio
+async def test_range_statistics_rejects_invalid_ranges(test_redis):
+    """Test that empty ranges and ranges over too many buckets are rejected."""
+    statistics_service = StatisticsService(test_redis, bucket_ttls={"minute": 3600}, range_max_buckets=60)
+    start = datetime(2026, 10, 17, 14, 0, tzinfo=UTC)
+
+    with pytest.raises(ValueError):
+        await statistics_service.get_range_statistics(start, start)
+
+    with pytest.raises(ValueError):
+        await statistics_service.get_range_statistics(start, datetime(2026, 10, 17, 15, 1, tzinfo=UTC))
+
+    result = await statistics_service.get_range_statistics(start, datetime(2026, 10, 17, 15, 0, tzinfo=UTC))
+    assert result.supplies == {}
+
+
+@pytest.mark.asyncio
+async def test_latency_histograms_expose_percentiles(statistics_service, test_redis):
+    """Test that bidder latencies are counted into log-scale buckets and reported as percentiles."""
+    for latency_ms in range(1, 101):
+        await statistics_service.record_auction(
+            supply_id="supply1",
+            country="US",
+            winner_id="bidder1",
+            winning_price=0.5,
+            no_bid_ids=["bidder2"],
+            timeout_ids=[],
+            latencies_ms={"bidder1": latency_ms, "bidder2": 4000},
+        )
+
+    bidders = (await get_supply_stats(statistics_service, "supply1")).bidders
+
+    assert bidders["bidder1"].latency.model_dump() == {"count": 100, "p50_ms": 50, "p90_ms": 100, "p99_ms": 100}
+    assert bidders["bidder2"].latency.model_dump() == {"count": 100, "p50_ms": 5000, "p90_ms": 5000, "p99_ms": 5000}
+    assert bidders["bidder1"].wins == 100
+
+    # beyond the last bucket no percentile can be given
+    await statistics_service.record_auction("supply2", "US", None, 0.0, ["bidder1"], [], {"bidder1": 60000})
+    latency = (await get_supply_stats(statistics_service, "supply2")).bidders["bidder1"].latency
+    assert latency.model_dump() == {"count": 1, "p50_ms": None, "p90_ms": None, "p99_ms": None}
+
+
+@pytest.mark.asyncio
+async def test_price_histograms_per_supply_and_bidder(statistics_service, test_redis):
+    """Test that clearing prices are bucketed per bidder and summed into the supply's distribution."""
+    prices = {"bidder1": [0.1] * 10 + [0.55] * 5, "bidder2": [2.0] * 4 + [250.0]}
+    for bidder_id, bidder_prices in prices.items():
+        for price in bidder_prices:
+            await statistics_service.record_auction("supply1", "US", bidder_id, price, [], [])
+    await statistics_service.record_auction("supply1", "US", None, 0.0, ["bidder3"], [])
+
+    stats = await get_supply_stats(statistics_service, "supply1")
+
+    assert stats.price.model_dump() == {
+        "count": 20,
+        "median": 0.1,
+        "p95": 2,
+        "buckets": [
+            {"le": 0.1, "count": 10},
+            {"le": 0.6, "count": 5},
+            {"le": 2, "count": 4},
+            {"le": None, "count": 1},
+        ],
+    }
+    assert (stats.bidders["bidder1"].price.median, stats.bidders["bidder1"].price.p95) == (0.1, 0.6)
+    assert stats.bidders["bidder2"].price.count == 5
+    assert stats.bidders["bidder3"].price is None
+
+
+@pytest.mark.asyncio
+async def test_filtered_statistics_read_only_selected_fields(statistics_service, test_redis):
+    """Test that supply, bidder, country and field filters select just the matching counters."""
+    await statistics_service.record_auction("supply1", "US", "bidder1", 1.5, ["bidder2"], [], {"bidder1": 12})
+    await statistics_service.record_auction("supply1", "GB", "bidder2", 0.5, ["bidder1"])
+    await statistics_service.record_auction("supply2", "US", "bidder1", 2.0, [])
+
+    result = await statistics_service.get_statistics(StatisticsFilter(supply_ids=["supply1"]))
+    assert list(result.supplies) == ["supply1"]
+
+    result = await statistics_service.get_statistics(
+        StatisticsFilter(bidder_ids=["bidder2", "unknown"], countries=["GB"], fields={"reqs_per_country", "wins"})
+    )
+    stats = StatisticsResponseBuilder.build(result, {"reqs_per_country", "wins"})
+    assert list(stats) == ["supply1"]
+    assert stats["supply1"].model_dump(exclude_unset=True) == {
+        "reqs_per_country": {"GB": 1},
+        "bidders": {"bidder2": {"wins": 1}},
+    }
+
+    result = await statistics_service.get_statistics(StatisticsFilter(supply_ids=["supply2"], fields={"latency"}))
+    assert result is None
+
+    # reads never assign dictionary ids to unknown names
+    assert await test_redis.hget(StatisticsService.DICTIONARY_KEY, "b:unknown") is None
+
+
+@pytest.mark.asyncio
+async def test_filtered_statistics_pick_read_command(statistics_service, test_redis, monkeypatch):
+    """Test that only narrow filters are read with HMGET, wider ones with HGETALL filtered afterwards."""
+    await statistics_service.record_auction("supply1", "US", "bidder1", 1.5, ["bidder2"], [], {"bidder1": 12})
+    await statistics_service.record_auction("supply1", "GB", "bidder2", 0.5, ["bidder1"])
+
+    commands = []
+    pipeline_by_node = statistics_module.pipeline_by_node
+
+    async def record_command(redis_client, keys, queue, *args, **kwargs):
+        pipe = MagicMock()
+        queue(pipe, keys[0])
+        commands.append(pipe.method_calls[0][0])
+        return await pipeline_by_node(redis_client, keys, queue, *args, **kwargs)
+
+    monkeypatch.setattr(statistics_module, "pipeline_by_node", record_command)
+
+    result = await statistics_service.get_statistics(StatisticsFilter(bidder_ids=["bidder1"], fields={"wins"}))
+    assert commands == ["hmget"]
+    assert StatisticsResponseBuilder.build(result, {"wins"})["supply1"].model_dump(exclude_unset=True) == {
+        "bidders": {"bidder1": {"wins": 1}},
+    }
+
+    # every dictionary bidder, or histogram buckets, would make the HMGET bigger than the hash
+    commands.clear()
+    result = await statistics_service.get_statistics(StatisticsFilter(countries=["US"]))
+    # the second read counts the unique IPs
+    assert commands[0] == "hgetall"
+    stats = StatisticsResponseBuilder.build(result)["supply1"]
+    assert stats.reqs_per_country == {"US": 1}
+    assert stats.total_reqs == 2
+    assert stats.bidders["bidder1"].wins == 1
+
+    commands.clear()
+    result = await statistics_service.get_statistics(StatisticsFilter(bidder_ids=["bidder2"], fields={"latency"}))
+    assert commands == ["hgetall"]
+    # bidder1's latency buckets are filtered out
+    assert result is None
+    result = await statistics_service.get_statistics(StatisticsFilter(bidder_ids=["bidder1"], fields={"no_bids"}))
+    assert StatisticsResponseBuilder.build(result, {"no_bids"})["supply1"].bidders["bidder1"].no_bids == 1
+
+
+@pytest.mark.asyncio
+async def test_statistics_since_returns_changed_supplies(statistics_service, test_redis):
+    """Test that a version cursor selects only supplies written after it."""
+    await record_request(statistics_service, "supply1", "US")
+    await record_request(statistics_service, "supply2", "US")
+    # recorded before versions existed, only a full read sees it
+    await test_redis.hset(statistics_service._get_supply_key("supply3"), "r", 5)
+    await test_redis.sadd(StatisticsService.SUPPLY_REGISTRY_KEY, "supply3")
+
+    result = await statistics_service.get_statistics(StatisticsFilter(since=0))
+    assert sorted(result.supplies) == ["supply1", "supply2", "supply3"]
+    version = result.version
+
+    result = await statistics_service.get_statistics(StatisticsFilter(since=version))
+    assert result.supplies == {}
+    assert result.version == version
+
+    await record_request(statistics_service, "supply2", "GB")
+
+    result = await statistics_service.get_statistics(StatisticsFilter(since=version))
+    assert list(result.supplies) == ["supply2"]
+    assert result.version > version
+    assert StatisticsResponseBuilder.build(result)["supply2"].total_reqs == 2
+
+    # a cursor from before Redis lost its data reads everything again
+    result = await statistics_service.get_statistics(StatisticsFilter(since=version + 100))
+    assert sorted(result.supplies) == ["supply1", "supply2", "supply3"]
+
+
+@pytest.mark.asyncio
+async def test_failed_version_bump_keeps_counters_and_retries(statistics_service, test_redis):
+    """Test that a failed version bump doesn't fail the write and is repeated with the next one."""
+    await test_redis.set(StatisticsService.VERSION_KEY, "not a number")
+
+    await record_request(statistics_service, "supply1", "US")
+    assert (await get_supply_stats(statistics_service, "supply1")).total_reqs == 1
+
+    await test_redis.delete(StatisticsService.VERSION_KEY)
+    await record_request(statistics_service, "supply2", "US")
+
+    result = await statistics_service.get_statistics(StatisticsFilter(since=0))
+    assert result.version == 1
+    assert await test_redis.zrange(StatisticsService.SUPPLY_VERSIONS_KEY, 0, -1) == ["supply1", "supply2"]
+
+
+@pytest.mark.asyncio
+async def test_apply_increments_reports_failed_supplies(statistics_service, test_redis):
+    """Test that a supply failing in a batch is named in the error while the others are written."""
+    await test_redis.set(statistics_service._get_supply_key("supply2"), "not a hash")
+
+    with pytest.raises(StatisticsWriteError) as exc_info:
+        await statistics_service.apply_increments({
+            "supply1": {"total_reqs": 1, "country:US": 1},
+            "supply2": {"total_reqs": 1, "country:US": 1},
+            "supply3": {"total_reqs": 2, "country:GB": 2},
+        })
+
+    assert exc_info.value.failed_supply_ids == {"supply2"}
+    await test_redis.delete(statistics_service._get_supply_key("supply2"))
+    assert (await get_supply_stats(statistics_service, "supply1")).total_reqs == 1
+    assert (await get_supply_stats(statistics_service, "supply3")).total_reqs == 2
+
+@pytest.mark.asyncio
+async def test_unique_ips_per_supply_country_and_range(test_redis):
+    """Test that requester IPs are counted approximately per supply and country, and over time ranges."""
+    statistics_service = StatisticsService(test_redis, bucket_ttls={"minute": 3600, "hour": 86400})
+    base = 1_700_000_000 // 3600 * 3600
+
+    await statistics_service.apply_increments({
+        "supply1": {
+            **StatisticsService.get_request_increments("US", "10.0.0.1"),
+            **StatisticsService.get_request_increments("GB", "2001:db8::1"),
+        },
+    }, timestamp=base + 10)
+    for i in range(200):
+        await statistics_service.apply_increments(
+            {"supply1": StatisticsService.get_request_increments("US", f"10.0.{i % 100}.1")},
+            timestamp=base + 70,
+        )
+    await record_request(statistics_service, "supply2", "US")
+
+    stats = StatisticsResponseBuilder.build(await statistics_service.get_all_statistics())
+    assert stats["supply1"].unique_ips.total == 101
+    assert stats["supply1"].unique_ips.per_country == {"GB": 1, "US": 100}
+    # recorded without an IP
+    assert stats["supply2"].unique_ips is None
+
+    first_minute = await statistics_service.get_range_statistics(
+        datetime.fromtimestamp(base, UTC), datetime.fromtimestamp(base + 60, UTC)
+    )
+    assert first_minute.unique_ips == {"supply1": 2}
+    # the buckets of a range are counted as a union, 10.0.0.1 is in both minutes
+    both_minutes = await statistics_service.get_range_statistics(
+        datetime.fromtimestamp(base, UTC), datetime.fromtimestamp(base + 120, UTC)
+    )
+    assert both_minutes.unique_ips == {"supply1": 101}
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+from redis.asyncio import StrictRedis
+
+from app.config.settings import settings
+from app.services.statistics_stream import StatisticsStream
+
+
+@pytest_asyncio.fixture
+async def test_redis():
+    """Create a fresh Redis client for each test."""
+    redis = StrictRedis(
+        host=settings.redis.startup_nodes[0].get("host"),
+        port=settings.redis.startup_nodes[0].get("port"),
+        decode_responses=True,
+    )
+    yield redis
+    await redis.flushdb()
+    await redis.aclose()
+
+
+async def next_event(events) -> str:
+    return await asyncio.wait_for(anext(events), timeout=2)
+
+
+@pytest.mark.asyncio
+async def test_stream_merges_deltas_of_all_workers(test_redis):
+    """Test that increments published by several workers reach a subscriber as one delta event."""
+    worker1 = StatisticsStream(test_redis, interval_ms=100)
+    worker2 = StatisticsStream(test_redis, interval_ms=100)
+
+    events = worker1.subscribe()
+    assert (await next_event(events)).startswith("retry:")
+    # let the fan-out task subscribe before anything is published
+    await asyncio.sleep(0.05)
+
+    # requester IPs are never streamed
+    worker1.add({"supply1": {"total_reqs": 1, "bidder:bidder1:wins": 1, "ip:US:10.0.0.1": 1}})
+    worker1.add({"supply1": {"total_reqs": 1}})
+    worker2.add({"supply1": {"total_reqs": 2}, "supply2": {"country:US": 1}})
+    await worker1._publish()
+    await worker2._publish()
+
+    event = await next_event(events)
+    assert event.startswith("event: delta\ndata: ")
+    assert json.loads(event.removeprefix("event: delta\ndata: ")) == {
+        "supply1": {"total_reqs": 4, "bidder:bidder1:wins": 1},
+        "supply2": {"country:US": 1},
+    }
+    assert worker1.metrics.subscribers == 1
+
+    await events.aclose()
+    assert worker1.metrics.subscribers == 0
+    await worker1.stop()
+    await worker2.stop()
+
+
+@pytest.mark.asyncio
+async def test_stream_disconnects_lagging_subscriber(test_redis):
+    """Test that a subscriber whose buffer is full gets what was buffered, then a lagged event."""
+    stream = StatisticsStream(test_redis, interval_ms=100, buffer_size=1)
+
+    events = stream.subscribe()
+    await next_event(events)
+
+    stream._broadcast("event: delta\ndata: {}\n\n")
+    stream._broadcast("event: delta\ndata: {}\n\n")
+
+    assert await next_event(events) == "event: delta\ndata: {}\n\n"
+    assert (await next_event(events)).startswith("event: lagged")
+    with pytest.raises(StopAsyncIteration):
+        await next_event(events)
+    assert stream.metrics.lagged == 1
+    assert stream.metrics.subscribers == 0
+
+    await stream.stop()
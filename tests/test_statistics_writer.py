@@ -0,0 +1,258 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock
+
+from redis.asyncio import StrictRedis
+
+from app.builders.api.statistics import StatisticsResponseBuilder
+from app.config.settings import settings
+from app.services.statistics import StatisticsService
+from app.services.statistics_stream import StatisticsStream
+from app.services.statistics_writer import StatisticsWriter
+
+
+@pytest_asyncio.fixture
+def mock_statistics_service():
+    """Create a StatisticsService with a mocked Redis write path."""
+    service = StatisticsService(redis_client=AsyncMock())
+    service.apply_increments = AsyncMock()
+    return service
+
+
+@pytest_asyncio.fixture
+async def test_redis():
+    """Create a fresh Redis client for each test."""
+    redis = StrictRedis(
+        host=settings.redis.startup_nodes[0].get("host"),
+        port=settings.redis.startup_nodes[0].get("port"),
+        decode_responses=True,
+    )
+    yield redis
+    await redis.flushdb()
+    await redis.aclose()
+
+
+def create_writer(statistics_service, **kwargs) -> StatisticsWriter:
+    """Helper to create a writer with test-friendly defaults."""
+    kwargs.setdefault("flush_interval_ms", 10)
+    return StatisticsWriter(statistics_service, **kwargs)
+
+
+async def record_request(writer: StatisticsWriter, supply_id: str, country: str, ip: str | None = None) -> None:
+    """Helper to record an auction without eligible bidders, which only counts the request."""
+    await writer.record_auction(supply_id, country, winner_id=None, winning_price=0.0, no_bid_ids=[], ip=ip)
+
+
+def get_written_increments(statistics_service, failed_calls: int = 1) -> dict[str, dict[str, int]]:
+    """Helper to sum the increments of the apply_increments calls after the failed first ones."""
+    written: dict[str, dict[str, int]] = {}
+    for call in statistics_service.apply_increments.await_args_list[failed_calls:]:
+        for supply_id, fields in call.args[0].items():
+            for field, amount in fields.items():
+                written.setdefault(supply_id, {})[field] = written.get(supply_id, {}).get(field, 0) + amount
+    return written
+
+
+@pytest.mark.asyncio
+async def test_writer_coalesces_events_into_one_flush(mock_statistics_service):
+    """Test that a burst of events is merged per (supply, field) and flushed once."""
+    writer = create_writer(mock_statistics_service, flush_interval_ms=50)
+    writer.start()
+
+    await writer.record_auction("supply1", "US", "bidder1", 0.5, ["bidder2"], ["bidder3"])
+    await writer.record_auction("supply1", "US", "bidder1", 0.25, ["bidder2"], [])
+    await record_request(writer, "supply1", "GB")
+    await record_request(writer, "supply2", "FR")
+
+    await writer.stop()
+
+    mock_statistics_service.apply_increments.assert_awaited_once_with(
+        {
+            "supply1": {
+                "total_reqs": 3,
+                "country:US": 2,
+                "country:GB": 1,
+                "bidder:bidder1:wins": 2,
+                "bidder:bidder1:revenue": 750000,
+                "bidder:bidder1:price:17": 1,
+                "bidder:bidder1:price:14": 1,
+                "bidder:bidder2:no_bids": 2,
+                "bidder:bidder3:timeouts": 1,
+            },
+            "supply2": {"total_reqs": 1, "country:FR": 1},
+        }
+    )
+    assert writer.metrics.flushed_events == 4
+    assert writer.metrics.flushes == 1
+
+
+@pytest.mark.asyncio
+async def test_writer_flushes_when_batch_is_full(mock_statistics_service):
+    """Test that reaching flush_max_events flushes without waiting for the interval."""
+    writer = create_writer(mock_statistics_service, flush_interval_ms=10000, flush_max_events=2)
+    writer.start()
+
+    await record_request(writer, "supply1", "US")
+    await record_request(writer, "supply1", "US")
+    await asyncio.sleep(0.05)
+
+    mock_statistics_service.apply_increments.assert_awaited_once_with({"supply1": {"total_reqs": 2, "country:US": 2}})
+
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_writer_drop_policy(mock_statistics_service):
+    """Test that events are dropped and counted while the queue is full."""
+    writer = create_writer(mock_statistics_service, max_queue_size=2, overflow_policy="drop")
+
+    for _ in range(5):
+        await record_request(writer, "supply1", "US")
+
+    assert writer.metrics.enqueued == 2
+    assert writer.metrics.dropped == 3
+    assert writer.metrics.queue_size == 2
+
+
+@pytest.mark.asyncio
+async def test_writer_block_policy(mock_statistics_service):
+    """Test that the block policy waits for free space instead of dropping."""
+    writer = create_writer(mock_statistics_service, max_queue_size=1, overflow_policy="block")
+
+    await record_request(writer, "supply1", "US")
+    blocked = asyncio.create_task(record_request(writer, "supply1", "GB"))
+    await asyncio.sleep(0.01)
+
+    assert not blocked.done()
+    assert writer.metrics.blocked == 1
+
+    writer.start()
+    await asyncio.wait_for(blocked, timeout=1)
+    await writer.stop()
+
+    assert writer.metrics.dropped == 0
+    assert writer.metrics.flushed_events == 2
+
+
+@pytest.mark.asyncio
+async def test_writer_retries_failed_flush(mock_statistics_service):
+    """Test that increments of a failed flush are kept and written by a later one."""
+    mock_statistics_service.apply_increments.side_effect = [ConnectionError("redis down"), None, None]
+    writer = create_writer(mock_statistics_service)
+    writer.start()
+
+    await record_request(writer, "supply1", "US")
+    await asyncio.sleep(0.05)
+    await record_request(writer, "supply1", "US")
+    await writer.stop()
+
+    assert get_written_increments(mock_statistics_service) == {"supply1": {"total_reqs": 2, "country:US": 2}}
+    assert writer.metrics.failed_flushes == 1
+
+
+@pytest.mark.asyncio
+async def test_writer_retries_failed_flush_without_new_events(mock_statistics_service):
+    """Test that increments of a failed flush are retried on an idle worker, not only with the next event."""
+    mock_statistics_service.apply_increments.side_effect = [ConnectionError("redis down"), None]
+    writer = create_writer(mock_statistics_service)
+    writer.start()
+
+    await record_request(writer, "supply1", "US")
+    await asyncio.sleep(0.1)
+
+    assert mock_statistics_service.apply_increments.await_count == 2
+    assert writer.metrics.flushes == 1
+    assert writer._pending == {}
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_writer_discards_increments_failing_for_other_reasons(mock_statistics_service):
+    """Test that a flush failing with a non-Redis error isn't retried, so it can't block later flushes."""
+    mock_statistics_service.apply_increments.side_effect = [KeyError("metric"), None]
+    writer = create_writer(mock_statistics_service)
+    writer.start()
+
+    await record_request(writer, "supply1", "US")
+    await asyncio.sleep(0.05)
+    await record_request(writer, "supply2", "GB")
+    await writer.stop()
+
+    assert mock_statistics_service.apply_increments.await_args_list[-1].args[0] == {
+        "supply2": {"total_reqs": 1, "country:GB": 1}
+    }
+    assert writer.metrics.discarded_increments == 2
+    assert writer.metrics.failed_flushes == 1
+
+
+@pytest.mark.asyncio
+async def test_writer_drops_events_after_stop(mock_statistics_service):
+    """Test that events recorded after shutdown are counted as dropped."""
+    writer = create_writer(mock_statistics_service)
+    writer.start()
+    await writer.stop()
+
+    await record_request(writer, "supply1", "US")
+
+    assert writer.metrics.dropped == 1
+    mock_statistics_service.apply_increments.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_writer_feeds_flushed_increments_to_stream(mock_statistics_service):
+    """Test that only successfully flushed increments are handed to the statistics stream."""
+    statistics_stream = StatisticsStream(redis_client=AsyncMock())
+    writer = create_writer(mock_statistics_service, statistics_stream=statistics_stream)
+    mock_statistics_service.apply_increments.side_effect = [ConnectionError("redis down"), None]
+    writer.start()
+
+    await record_request(writer, "supply1", "US")
+    await writer.stop()
+
+    # the failed flush isn't streamed, only its retry
+    assert statistics_stream._delta == {"supply1": {"total_reqs": 1, "country:US": 1}}
+
+
+@pytest.mark.asyncio
+async def test_writer_does_not_retry_unique_ips(mock_statistics_service):
+    """Test that requester IPs of a failed flush are dropped, so the retry buffer stays bounded."""
+    mock_statistics_service.apply_increments.side_effect = [ConnectionError("redis down"), None, None]
+    writer = create_writer(mock_statistics_service)
+    writer.start()
+
+    await record_request(writer, "supply1", "US", ip="10.0.0.1")
+    await record_request(writer, "supply1", "US", ip="10.0.0.2")
+    await asyncio.sleep(0.05)
+    await record_request(writer, "supply1", "US", ip="10.0.0.3")
+    await writer.stop()
+
+    assert get_written_increments(mock_statistics_service) == {
+        "supply1": {"total_reqs": 3, "country:US": 3, "ip:US:10.0.0.3": 1}
+    }
+    assert writer.metrics.dropped_unique_ips == 2
+
+
+@pytest.mark.asyncio
+async def test_writer_retries_only_failed_supplies(test_redis):
+    """Test that supplies written alongside a failing one are counted once, however often it is retried."""
+    statistics_service = StatisticsService(test_redis)
+    await test_redis.set(statistics_service._get_supply_key("supply2"), "not a hash")
+    writer = create_writer(statistics_service)
+    writer.start()
+
+    for _ in range(3):
+        await record_request(writer, "supply1", "US")
+        await record_request(writer, "supply2", "US")
+        await record_request(writer, "supply3", "GB")
+        await asyncio.sleep(0.05)
+    await writer.stop()
+
+    assert writer._pending == {"supply2": {"total_reqs": 3, "country:US": 3}}
+
+    await test_redis.delete(statistics_service._get_supply_key("supply2"))
+    stats = StatisticsResponseBuilder.build(await statistics_service.get_all_statistics())
+    assert stats["supply1"].total_reqs == 3
+    assert stats["supply3"].total_reqs == 3
+    assert stats["supply3"].reqs_per_country == {"GB": 3}
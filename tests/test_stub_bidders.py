@@ -0,0 +1,74 @@
+import json
+import random
+
+import httpx
+import pytest
+
+from app.commands.stub_bidders import create_stub_bidder_app, write_stub_fleet_data
+from app.models.commands.stub_bidders import StubBidderConfig
+
+
+async def post_bid(config: StubBidderConfig, seed: int = 1) -> httpx.Response:
+    """Helper to send one bid request to an in-process stub bidder."""
+    transport = httpx.ASGITransport(app=create_stub_bidder_app(config, seed=seed))
+    async with httpx.AsyncClient(transport=transport, base_url="http://stub") as client:
+        return await client.post("/bid", json={"supply_id": "supply1", "country": "US", "tmax": 200})
+
+
+@pytest.mark.asyncio
+async def test_stub_bidder_returns_price_in_range():
+    """Test that the stub answers with a price inside the configured range."""
+    config = StubBidderConfig(
+        latency_distribution="fixed", latency_mean_ms=0, no_bid_rate=0, min_price=0.5, max_price=0.6
+    )
+
+    response = await post_bid(config)
+
+    assert response.status_code == 200
+    assert 0.5 <= response.json()["price"] <= 0.6
+
+
+@pytest.mark.asyncio
+async def test_stub_bidder_no_bid():
+    """Test that the stub answers 204 for a no-bid."""
+    config = StubBidderConfig(latency_distribution="fixed", latency_mean_ms=0, no_bid_rate=1)
+
+    response = await post_bid(config)
+
+    assert response.status_code == 204
+
+
+@pytest.mark.parametrize("distribution", ["fixed", "uniform", "normal", "exponential", "lognormal"])
+def test_latency_sampling_respects_bounds(distribution):
+    """Test that sampled latencies are never negative or above the cap."""
+    config = StubBidderConfig(
+        latency_distribution=distribution,
+        latency_mean_ms=50,
+        latency_stddev_ms=40,
+        latency_max_ms=120,
+    )
+    rng = random.Random(42)
+
+    samples = [config.sample_latency_ms(rng) for _ in range(2000)]
+
+    assert all(0 <= sample <= 120 for sample in samples)
+    if distribution != "fixed":
+        assert 30 < sum(samples) / len(samples) < 70
+
+
+def test_write_stub_fleet_data(tmp_path):
+    """Test that the generated data file points every bidder at a stub endpoint."""
+    output = tmp_path / "data.json"
+    ports = list(range(9001, 9031))
+
+    result = write_stub_fleet_data(
+        output, host="127.0.0.1", ports=ports, num_supplies=3, timeout_ms=150, countries=["US"]
+    )
+
+    data = json.loads(output.read_text())
+    assert result["bidders_count"] == 30
+    assert sorted(bidder["endpoint"] for bidder in data["bidders"].values()) == sorted(
+        f"http://127.0.0.1:{port}/bid" for port in ports
+    )
+    assert all(bidder["country"] == "US" for bidder in data["bidders"].values())
+    assert all(bidder["timeout_ms"] == 150 for bidder in data["bidders"].values())
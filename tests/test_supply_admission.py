@@ -0,0 +1,156 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import pytest_asyncio
+from redis.asyncio import StrictRedis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.config.settings import settings
+from app.models.services.catalog import SupplyLimit
+from app.services.bidding import BiddingService
+from app.services.catalog import CatalogService
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.statistics import StatisticsService
+from app.services.supply_admission import SupplyAdmission, SupplyRateLimitExceededError
+
+
+@pytest_asyncio.fixture
+async def test_redis():
+    """Create a fresh Redis client for each test."""
+    redis = StrictRedis(
+        host=settings.redis.startup_nodes[0].get("host"),
+        port=settings.redis.startup_nodes[0].get("port"),
+        decode_responses=True,
+    )
+    yield redis
+    await redis.flushdb()
+    await redis.aclose()
+
+
+@pytest_asyncio.fixture
+async def supply_admission(test_redis):
+    """Create an admission layer leasing 100ms worth of tokens at a time."""
+    yield SupplyAdmission(redis_client=test_redis, lease_seconds=0.1, lease_ttl_seconds=1.0)
+
+
+async def admit_count(admission: SupplyAdmission, supply_id: str, limit: SupplyLimit, attempts: int) -> int:
+    admitted = 0
+    for _ in range(attempts):
+        try:
+            await admission.admit(supply_id, limit)
+            admitted += 1
+        except SupplyRateLimitExceededError:
+            pass
+    return admitted
+
+
+@pytest.mark.asyncio
+async def test_supply_admission_caps_burst(supply_admission: SupplyAdmission) -> None:
+    """Test that no more than the bucket capacity is admitted at once."""
+    limit = SupplyLimit(qps=10, burst=5)
+
+    assert await admit_count(supply_admission, "supply1", limit, attempts=20) == 5
+
+    with pytest.raises(SupplyRateLimitExceededError) as exc_info:
+        await supply_admission.admit("supply1", limit)
+    assert 0 < exc_info.value.retry_after <= 0.1
+
+
+@pytest.mark.asyncio
+async def test_supply_admission_leases_tokens_in_batches(supply_admission: SupplyAdmission, test_redis) -> None:
+    """Test that most admissions are served from the local lease without touching Redis."""
+    limit = SupplyLimit(qps=1000, burst=1000)
+    assert supply_admission.get_batch_size(limit) == 100
+
+    with patch.object(supply_admission, "_script", wraps=supply_admission._script) as script:
+        assert await admit_count(supply_admission, "supply1", limit, attempts=250) == 250
+
+    assert script.call_count == 3
+    # 3 batches taken from the shared bucket
+    assert float(await test_redis.hget("supply_qps:supply1", "tokens")) == pytest.approx(700, abs=5)
+
+
+@pytest.mark.asyncio
+async def test_supply_admission_coalesces_concurrent_refills(supply_admission: SupplyAdmission) -> None:
+    """Test that concurrent requests for a drained lease trigger a single refill."""
+    limit = SupplyLimit(qps=500, burst=500)
+
+    with patch.object(supply_admission, "_script", wraps=supply_admission._script) as script:
+        await asyncio.gather(*(supply_admission.admit("supply1", limit) for _ in range(50)))
+
+    assert script.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_supply_admission_refills_over_time(supply_admission: SupplyAdmission) -> None:
+    """Test that the bucket refills at the configured rate."""
+    limit = SupplyLimit(qps=20, burst=2)
+
+    assert await admit_count(supply_admission, "supply1", limit, attempts=5) == 2
+
+    await asyncio.sleep(0.15)
+    assert await admit_count(supply_admission, "supply1", limit, attempts=5) == 2
+
+
+@pytest.mark.asyncio
+async def test_supply_admission_supplies_are_independent(supply_admission: SupplyAdmission) -> None:
+    """Test that one supply spiking doesn't affect another."""
+    limit = SupplyLimit(qps=1, burst=1)
+
+    assert await admit_count(supply_admission, "supply1", limit, attempts=3) == 1
+    assert await admit_count(supply_admission, "supply2", limit, attempts=3) == 1
+
+
+@pytest.mark.asyncio
+async def test_supply_admission_admits_when_redis_fails() -> None:
+    """Test that the caps don't take the exchange down with Redis."""
+    redis = AsyncMock()
+    redis.script_load.side_effect = RedisConnectionError("Connection refused")
+    admission = SupplyAdmission(redis_client=redis)
+
+    await admission.admit("supply1", SupplyLimit(qps=1, burst=1))
+
+
+@pytest.mark.asyncio
+async def test_supply_admission_cancelled_trial_releases_circuit_breaker() -> None:
+    """Test that a half-open trial cancelled mid-call doesn't keep the breaker from trying again."""
+    redis = AsyncMock()
+    redis.script_load.side_effect = RedisConnectionError("Connection refused")
+    breaker = CircuitBreaker(name="test", failure_threshold=1, cooldown_seconds=0)
+    admission = SupplyAdmission(redis_client=redis, circuit_breaker=breaker)
+    await admission.admit("supply1", SupplyLimit(qps=1, burst=1))
+    assert breaker.state == "half_open"
+
+    redis.script_load.side_effect = asyncio.CancelledError
+    with pytest.raises(asyncio.CancelledError):
+        await admission.admit("supply1", SupplyLimit(qps=1, burst=1))
+
+    assert breaker.allow_request() is True
+
+
+@pytest.mark.asyncio
+async def test_run_auction_rejects_capped_supply(supply_admission: SupplyAdmission) -> None:
+    """Test that an over-cap supply is rejected before any bidder is asked or stats are recorded."""
+    catalog_service = CatalogService()
+    catalog_service._snapshot = CatalogService.build_snapshot(
+        supply_bidders={"supply1": ()},
+        bidders={},
+        supply_limits={"supply1": SupplyLimit(qps=1, burst=1)},
+    )
+    statistics_service = AsyncMock(spec=StatisticsService)
+    bidding_service = BiddingService(
+        AsyncMock(),
+        statistics_service,
+        catalog_service=catalog_service,
+        supply_admission=supply_admission,
+    )
+
+    # the first auction is admitted, then fails for lack of bidders
+    with pytest.raises(ValueError):
+        await bidding_service.run_auction("supply1", "US")
+    statistics_service.record_auction.reset_mock()
+
+    with pytest.raises(SupplyRateLimitExceededError):
+        await bidding_service.run_auction("supply1", "US")
+    statistics_service.record_auction.assert_not_awaited()